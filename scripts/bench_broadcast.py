@@ -0,0 +1,71 @@
+"""Simulates the socket traffic of a busy coop room.
+
+Sixteen players guess in bursts, every message is delivered to every member
+of the room. Counts the frames and bytes written with and without batching
+for a few batch intervals. Run from the repository root:
+
+    python scripts/bench_broadcast.py
+"""
+import json
+import random
+
+from wiki_reveal.broadcast import RoomBroadcaster
+
+MEMBERS = 16
+SECONDS = 60
+
+
+def guess_times(seed: int = 1) -> list[float]:
+    rng = random.Random(seed)
+    times: list[float] = []
+    t = 0.0
+    while t < SECONDS:
+        # A burst of quick guesses from everyone, then a pause
+        burst = rng.randint(5, 40)
+        times.extend(t + rng.random() * 0.5 for _ in range(burst))
+        t += rng.expovariate(1)
+    return sorted(t for t in times if t < SECONDS)
+
+
+def simulate(interval: float, times: list[float]) -> tuple[int, int]:
+    frames = 0
+    size = 0
+
+    def send(message: dict, room: str) -> None:
+        nonlocal frames, size
+        # Socket.IO frame: 42["message",{...}]
+        frame = f'42["message",{json.dumps(message)}]'
+        frames += MEMBERS
+        size += MEMBERS * len(frame)
+
+    broadcaster = RoomBroadcaster(send, interval)
+    tick = interval
+    for index, t in enumerate(times):
+        while broadcaster.enabled and tick <= t:
+            broadcaster.flush()
+            tick += interval
+        broadcaster.broadcast(
+            {
+                'type': 'GUESS',
+                'username': f'player{index % MEMBERS}',
+                'lex': f'word{index}',
+                'index': index,
+                'isHint': False,
+            },
+            'room',
+        )
+    broadcaster.flush()
+    return frames, size
+
+
+if __name__ == '__main__':
+    times = guess_times()
+    print(f'{len(times)} guesses to {MEMBERS} members over {SECONDS}s')
+    direct_frames, direct_size = simulate(0, times)
+    for interval in (0, 0.025, 0.05, 0.1, 0.2):
+        frames, size = simulate(interval, times)
+        print(
+            f'{interval * 1000:5.0f} ms  {frames:>7} frames'
+            f' ({frames / direct_frames:6.1%})'
+            f'  {size / 1024:8.1f} KiB ({size / direct_size:6.1%})',
+        )
@@ -0,0 +1,84 @@
+"""Compares the size and encoding time of coop messages per codec.
+
+Each message is encoded to the Socket.IO frames a client receives, as JSON
+text or as a MessagePack attachment, and the frames are then compressed
+like permessage-deflate does with context takeover. Run from the
+repository root:
+
+    python scripts/bench_codec.py
+"""
+from time import perf_counter
+from typing import Any
+import zlib
+
+from socketio import packet  # type: ignore
+
+from wiki_reveal.codec import CODECS, JSON, MSGPACK, encode_message
+
+ROUNDS = 200
+
+
+def guess(index: int) -> dict[str, Any]:
+    return {
+        'type': 'GUESS',
+        'username': f'Player {index % 16}',
+        'lex': f'word{index}',
+        'index': index,
+        'isHint': index % 7 == 0,
+    }
+
+
+def join_me(guesses: int) -> dict[str, Any]:
+    return {
+        'type': 'JOIN-ME',
+        'room': 'a' * 32,
+        'users': [f'Player {i}' for i in range(16)],
+        'backlog': [
+            [f'word{i}', f'Player {i % 16}', i % 7 == 0]
+            for i in range(guesses)
+        ],
+        'settings': {'allowHints': True},
+        'epoch': 'deadbeef',
+        'sinceIndex': 0,
+    }
+
+
+def frames(message: dict[str, Any], codec: str) -> list[bytes]:
+    encoded = packet.Packet(
+        packet.EVENT,
+        data=['message', encode_message(message, codec)],
+    ).encode()
+    if isinstance(encoded, str):
+        return [encoded.encode()]
+    return [encoded[0].encode(), *encoded[1:]]
+
+
+def deflated(stream: list[list[bytes]]) -> int:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return sum(
+        len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH))
+        - 4
+        for message in stream
+        for frame in message
+    )
+
+
+def bench(name: str, messages: list[dict[str, Any]]) -> None:
+    for codec in CODECS:
+        t0 = perf_counter()
+        for _ in range(ROUNDS):
+            stream = [frames(message, codec) for message in messages]
+        elapsed = (perf_counter() - t0) / ROUNDS / len(messages)
+        size = sum(len(frame) for message in stream for frame in message)
+        print(
+            f'{name:<18} {codec:<8} {size:>9} B  deflated'
+            f' {deflated(stream):>8} B  {elapsed * 1e6:8.1f} us/msg',
+        )
+
+
+if __name__ == '__main__':
+    if MSGPACK not in CODECS:
+        print('msgpack is not installed, only showing', JSON)
+    bench('1000 GUESS', [guess(i) for i in range(1000)])
+    bench('JOIN-ME 100', [join_me(100)])
+    bench('JOIN-ME 2000', [join_me(2000)])
@@ -0,0 +1,105 @@
+"""Micro-benchmark of clean_lines on a synthetic equation-heavy extract.
+
+Compares the current scanner with the original slicing implementation.
+Run from the repository root:
+
+    python scripts/bench_parser.py
+"""
+from collections.abc import Iterator
+from timeit import repeat
+
+from wiki_reveal.parser import EQUATION_TAG, clean_lines, in_tag
+
+BLOCK = """The population standard deviation is
+σ
+=
+1
+N
+∑
+i
+=
+1
+N
+(
+x
+i
+−
+μ
+)
+2
+{\\displaystyle \\sigma ={\\sqrt {{\\frac {1}{N}}\\sum _{i=1}^{N}\
+\\left(x_{i}-\\mu \\right)^{2}}}}
+ where
+μ
+{\\displaystyle \\mu }
+ is the mean.
+"""
+
+
+def legacy_find_tags(text: str) -> Iterator[tuple[str, int]]:
+    offset = 0
+    while (idx := text.find('{\\')) >= 0:
+        depth = 1
+        start = idx
+        idx += 1
+
+        while depth > 0:
+            if idx >= len(text):
+                break
+
+            if text[idx] == '{':
+                depth += 1
+            elif text[idx] == '}':
+                depth -= 1
+            idx += 1
+
+        yield text[start: idx + 1], start + offset
+        offset += idx + 1
+
+        if idx + 1 >= len(text):
+            break
+
+        text = text[idx + 1:]
+
+
+def legacy_clean_lines(text: str) -> str:
+    prev_idx = 0
+    out = ''
+    for tag, idx in legacy_find_tags(text):
+        def removable(line) -> bool:
+            return line == '' or in_tag(line, tag)
+
+        rev_lines = [
+            line.strip() for line in text[prev_idx: idx].split('\n')
+        ][::-1]
+        line_idx = 0
+        while line_idx < len(rev_lines) and removable(rev_lines[line_idx]):
+            line_idx += 1
+
+        out += '\n'.join(rev_lines[line_idx:][::-1]) + EQUATION_TAG
+
+        prev_idx = idx + len(tag) + 1
+
+    out += text[prev_idx:]
+    return out
+
+
+def bench(blocks: int, number: int = 5) -> None:
+    text = BLOCK * blocks
+    assert clean_lines(text) == legacy_clean_lines(text)
+
+    legacy = min(repeat(
+        lambda: legacy_clean_lines(text), number=number, repeat=3,
+    )) / number
+    current = min(repeat(
+        lambda: clean_lines(text), number=number, repeat=3,
+    )) / number
+    print(
+        f'{len(text):>9} chars  legacy {legacy * 1000:9.2f} ms'
+        f'  current {current * 1000:8.2f} ms  x{legacy / current:6.1f}',
+    )
+
+
+if __name__ == '__main__':
+    for blocks in (10, 100, 1000, 5000):
+        bench(blocks)
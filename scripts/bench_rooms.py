@@ -0,0 +1,52 @@
+"""Micro-benchmark of guessing in a busy coop room.
+
+Compares the current set-indexed duplicate check with the original scan
+of the guess list. Run from the repository root:
+
+    python scripts/bench_rooms.py
+"""
+from datetime import datetime, timezone
+from time import perf_counter
+
+from wiki_reveal.rooms import GUESS, add_coop_game, add_coop_guess
+
+
+def legacy_add_guess(
+    guesses: list[GUESS], username: str, lex: str, is_hint: bool,
+) -> int:
+    if any(guess == lex for guess, _, __ in guesses):
+        return -1
+
+    guesses.append([lex, username, is_hint])
+    return len(guesses) - 1
+
+
+def lexes(n: int) -> list[str]:
+    # Every fourth guess repeats an earlier one
+    return [f'word{i if i % 4 else i // 2}' for i in range(n)]
+
+
+def bench(n: int) -> None:
+    words = lexes(n)
+    start = datetime.now(tz=timezone.utc)
+
+    guesses: list[GUESS] = []
+    t0 = perf_counter()
+    expected = [legacy_add_guess(guesses, 'Alice', w, False) for w in words]
+    legacy = perf_counter() - t0
+
+    add_coop_game('bench', 0, 'sid', 'Alice', start, 1)
+    t0 = perf_counter()
+    result = [add_coop_guess('bench', 'Alice', w, False) for w in words]
+    current = perf_counter() - t0
+
+    assert result == expected
+    print(
+        f'{n:>7} guesses  legacy {legacy * 1000:9.2f} ms'
+        f'  current {current * 1000:8.2f} ms  x{legacy / current:7.1f}',
+    )
+
+
+if __name__ == '__main__':
+    for n in (100, 1000, 5000, 20000):
+        bench(n)
@@ -0,0 +1,50 @@
+"""Load test of page fetching under a monkey-patched eventlet hub.
+
+Fetches pages from a delayed local stub while a heartbeat greenlet, standing
+in for Socket.IO traffic, measures how long the hub is blocked. Prints the
+worst heartbeat lag with the work offloaded and with it run inline as JSON.
+
+    python -m tests.eventlet_load
+"""
+import eventlet  # type: ignore
+eventlet.monkey_patch()
+
+import json  # noqa: E402
+from time import monotonic  # noqa: E402
+
+from wiki_reveal import wiki, wiki_clients  # noqa: E402
+
+from .wiki_stub import WikiStubServer  # noqa: E402
+
+HEARTBEAT = 0.01
+FETCHES = 4
+
+
+def max_heartbeat_lag(fetch) -> float:
+    threads = [eventlet.spawn(fetch, f'Page_{i}') for i in range(FETCHES)]
+    worst = 0.0
+    while any(not thread.dead for thread in threads):
+        t0 = monotonic()
+        eventlet.sleep(HEARTBEAT)
+        worst = max(worst, monotonic() - t0 - HEARTBEAT)
+    for thread in threads:
+        thread.wait()
+    return worst
+
+
+def main() -> None:
+    with WikiStubServer() as stub:
+        stub.delay = 0.2
+        stub.extract_repeat = 4000
+        wiki_clients.WIKI_API_URL = stub.api_url
+        wiki_clients.reset_clients()
+
+        offloaded = max_heartbeat_lag(wiki.get_page)
+        inline = max_heartbeat_lag(lambda name: wiki.load_page(name, 'en'))
+        wiki_clients.reset_clients()
+
+    print(json.dumps({'offloaded': offloaded, 'inline': inline}))
+
+
+if __name__ == '__main__':
+    main()
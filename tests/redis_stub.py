@@ -0,0 +1,269 @@
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from threading import Lock, Thread
+from typing import Any, Callable, Optional
+
+
+class RedisStubServer(ThreadingTCPServer):
+    """A local stand-in for the few Redis commands the rooms use"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.data: dict[bytes, Any] = {}
+        self.lock = Lock()
+        self.commands = 0
+        self.subscribers: dict[bytes, list['_Handler']] = {}
+        # Runs this command once and then hangs up instead of replying
+        self.hang_up_after: Optional[str] = None
+        self._thread = Thread(
+            target=self.serve_forever,
+            kwargs={'poll_interval': 0.01},
+            daemon=True,
+        )
+
+    @property
+    def url(self) -> str:
+        return f'redis://127.0.0.1:{self.server_address[1]}/0'
+
+    def __enter__(self) -> 'RedisStubServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def run(self, args: list[bytes]) -> Any:
+        name = args[0].decode().upper()
+        command = COMMANDS.get(name)
+        if command is None:
+            return ValueError(f"unknown command '{name}'")
+        with self.lock:
+            self.commands += 1
+            try:
+                return command(self.data, *args[1:])
+            except (TypeError, ValueError, KeyError, IndexError) as error:
+                return ValueError(str(error))
+
+
+def _encode(reply: Any) -> bytes:
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Exception):
+        return f'-ERR {reply}\r\n'.encode()
+    if isinstance(reply, bool) or isinstance(reply, int):
+        return f':{int(reply)}\r\n'.encode()
+    if isinstance(reply, str):
+        return f'+{reply}\r\n'.encode()
+    if isinstance(reply, bytes):
+        return f'${len(reply)}\r\n'.encode() + reply + b'\r\n'
+    return f'*{len(reply)}\r\n'.encode() + b''.join(
+        _encode(item) for item in reply
+    )
+
+
+def _list_slice(items: list[bytes], start: bytes, stop: bytes) -> list[bytes]:
+    first, last = int(start), int(stop)
+    if last < 0:
+        last += len(items)
+    return items[first:last + 1]
+
+
+def _delete(data, *keys):
+    return sum(data.pop(key, None) is not None for key in keys)
+
+
+def _hset(data, key, *pairs):
+    values = data.setdefault(key, {})
+    added = 0
+    for field, value in zip(pairs[::2], pairs[1::2]):
+        added += field not in values
+        values[field] = value
+    return added
+
+
+def _hsetnx(data, key, field, value):
+    values = data.setdefault(key, {})
+    if field in values:
+        return 0
+    values[field] = value
+    return 1
+
+
+def _hdel(data, key, *fields):
+    values = data.get(key, {})
+    removed = sum(values.pop(field, None) is not None for field in fields)
+    if not values:
+        data.pop(key, None)
+    return removed
+
+
+def _hincrby(data, key, field, increment):
+    values = data.setdefault(key, {})
+    value = int(values.get(field, 0)) + int(increment)
+    values[field] = str(value).encode()
+    return value
+
+
+def _hgetall(data, key):
+    return [item for pair in data.get(key, {}).items() for item in pair]
+
+
+def _rpush(data, key, *values):
+    items = data.setdefault(key, [])
+    items.extend(values)
+    return len(items)
+
+
+def _lset(data, key, index, value):
+    data[key][int(index)] = value
+    return 'OK'
+
+
+def _lindex(data, key, index):
+    items = data.get(key, [])
+    try:
+        return items[int(index)]
+    except IndexError:
+        return None
+
+
+def _sadd(data, key, *members):
+    values = data.setdefault(key, set())
+    added = len(set(members) - values)
+    values.update(members)
+    return added
+
+
+def _zadd(data, key, *pairs):
+    scores = data.setdefault(key, {})
+    added = 0
+    for score, member in zip(pairs[::2], pairs[1::2]):
+        added += member not in scores
+        scores[member] = float(score)
+    return added
+
+
+def _zrange(data, key, start, stop):
+    scores = data.get(key, {})
+    members = sorted(scores, key=lambda m: (scores[m], m))
+    return _list_slice(members, start, stop)
+
+
+def _zrangebyscore(data, key, low, high):
+    scores = data.get(key, {})
+    return [
+        member for member in sorted(scores, key=lambda m: (scores[m], m))
+        if float(low) <= scores[member] <= float(high)
+    ]
+
+
+def _zrem(data, key, *members):
+    scores = data.get(key, {})
+    removed = sum(scores.pop(member, None) is not None for member in members)
+    if not scores:
+        data.pop(key, None)
+    return removed
+
+
+COMMANDS: dict[str, Callable[..., Any]] = {
+    'PING': lambda data: 'PONG',
+    'AUTH': lambda data, password: 'OK',
+    'SELECT': lambda data, db: 'OK',
+    'DEL': _delete,
+    'EXISTS': lambda data, *keys: sum(key in data for key in keys),
+    'EXPIREAT': lambda data, key, when: int(key in data),
+    'HSET': _hset,
+    'HSETNX': _hsetnx,
+    'HGET': lambda data, key, field: data.get(key, {}).get(field),
+    'HMGET': lambda data, key, *fields: [
+        data.get(key, {}).get(field) for field in fields
+    ],
+    'HINCRBY': _hincrby,
+    'HGETALL': _hgetall,
+    'HVALS': lambda data, key: list(data.get(key, {}).values()),
+    'HDEL': _hdel,
+    'HLEN': lambda data, key: len(data.get(key, {})),
+    'RPUSH': _rpush,
+    'LRANGE': lambda data, key, start, stop: _list_slice(
+        data.get(key, []), start, stop,
+    ),
+    'LLEN': lambda data, key: len(data.get(key, [])),
+    'LINDEX': _lindex,
+    'LSET': _lset,
+    'SADD': _sadd,
+    'ZADD': _zadd,
+    'ZRANGE': _zrange,
+    'ZRANGEBYSCORE': _zrangebyscore,
+    'ZREM': _zrem,
+}
+
+
+class _Handler(StreamRequestHandler):
+    server: RedisStubServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.write_lock = Lock()
+        self.queued: Optional[list[list[bytes]]] = None
+
+    def send(self, reply: Any) -> None:
+        with self.write_lock:
+            self.wfile.write(_encode(reply))
+            self.wfile.flush()
+
+    def read_command(self) -> Optional[list[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self) -> None:
+        while (args := self.read_command()) is not None:
+            name = args[0].decode().upper()
+            if name == 'MULTI':
+                self.queued = []
+                self.send('OK')
+            elif name == 'EXEC':
+                queued, self.queued = self.queued or [], None
+                with self.server.lock:
+                    replies = [
+                        COMMANDS[c[0].decode().upper()](
+                            self.server.data, *c[1:],
+                        )
+                        for c in queued
+                    ]
+                self.send(replies)
+            elif self.queued is not None:
+                self.queued.append(args)
+                self.send('QUEUED')
+            elif name == 'SUBSCRIBE':
+                for channel in args[1:]:
+                    self.server.subscribers.setdefault(channel, []).append(
+                        self,
+                    )
+                    self.send([b'subscribe', channel, 1])
+            elif name == 'PUBLISH':
+                _, channel, message = args
+                subscribers = self.server.subscribers.get(channel, [])
+                for subscriber in subscribers:
+                    subscriber.send([b'message', channel, message])
+                self.send(len(subscribers))
+            else:
+                reply = self.server.run(args)
+                if name == self.server.hang_up_after:
+                    self.server.hang_up_after = None
+                    return
+                self.send(reply)
+
+    def finish(self) -> None:
+        for subscribers in self.server.subscribers.values():
+            if self in subscribers:
+                subscribers.remove(self)
+        super().finish()
@@ -0,0 +1,123 @@
+import gzip
+import json
+import os
+
+import pytest  # type: ignore
+from requests.exceptions import ConnectionError
+
+from wiki_reveal import archive
+from wiki_reveal.exceptions import ArchiveError, NoSuchPageError
+from wiki_reveal.nicer_random import get_order_key
+from wiki_reveal.wiki import Page, parse_extract
+
+EXTRACT = {
+    'title': 'Qom',
+    'summary': 'Qom is a city in Iran.',
+    'sections': [],
+}
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    def load_page(page_name, language):
+        if page_name == 'Missing':
+            raise NoSuchPageError
+        if page_name == 'Unreachable':
+            raise ConnectionError('Connection refused')
+        return parse_extract({**EXTRACT, 'title': page_name})
+
+    names = {
+        0: 'Washing_machine', 1: 'Qom', 2: 'Missing', 3: 'Qom',
+        4: 'Unreachable',
+    }
+    monkeypatch.setattr(archive, 'load_page', load_page)
+    monkeypatch.setattr(archive, 'get_game_page_name', names.__getitem__)
+
+
+def test_build_archive(tmp_path, pages):
+    root = str(tmp_path)
+    built = archive.build_archive(root, 'en', range(3))
+
+    assert [game.error for game in built] == [None, None, 'NoSuchPageError']
+    reader = archive.Archive(root, 'en', get_order_key())
+    assert (reader.first, reader.count) == (0, 3)
+    assert reader.get(2) is None
+    assert reader.get(3) is None
+
+    game = reader.get(1)
+    assert game is not None
+    assert game.etag == built[1].digest.hex()
+    assert game.variant_etag(None) == game.etag
+    assert game.variant_etag('gzip') == f'{game.etag}-gzip'
+    payload = json.loads(gzip.decompress(game.gzip))
+    assert payload['gameId'] == 1
+    assert payload['pageName'] == 'Qom'
+    assert Page.from_json(payload['page']) == parse_extract(EXTRACT)
+
+    with open(tmp_path / 'manifest.json') as fh:
+        manifest = json.load(fh)
+    games = manifest['languages']['en']['games']
+    assert games['1']['bundle'] == game.etag
+    assert games['2'] == {
+        'pageName': 'Missing', 'bundle': None, 'size': 0,
+        'error': 'NoSuchPageError',
+    }
+
+
+def test_build_archive_continues_after_failed_fetch(tmp_path, pages):
+    root = str(tmp_path)
+    built = archive.build_archive(root, 'en', [3, 4, 0])
+
+    assert [game.error for game in built] == [None, 'ConnectionError', None]
+    reader = archive.Archive(root, 'en', get_order_key())
+    assert (reader.first, reader.count) == (0, 5)
+    assert reader.get(0) is not None
+    assert reader.get(3) is not None
+    assert reader.get(4) is None
+
+    with open(tmp_path / 'manifest.json') as fh:
+        manifest = json.load(fh)
+    games = manifest['languages']['en']['games']
+    assert games['4']['error'] == 'ConnectionError'
+    assert games['0']['bundle'] == built[2].digest.hex()
+
+
+def test_build_archive_extends_index(tmp_path, pages):
+    root = str(tmp_path)
+    archive.build_archive(root, 'en', [0])
+    archive.build_archive(root, 'en', [3])
+
+    reader = archive.Archive(root, 'en', get_order_key())
+    assert (reader.first, reader.count) == (0, 4)
+    assert reader.get(0) is not None
+    assert reader.get(1) is None
+    assert reader.get(3) is not None
+    assert len(os.listdir(tmp_path / 'bundles')) >= 1
+
+
+def test_archive_of_other_order(tmp_path, pages):
+    root = str(tmp_path)
+    archive.build_archive(root, 'en', [0])
+
+    with pytest.raises(ArchiveError):
+        archive.Archive(root, 'en', 'another-order-16')
+
+
+def test_get_archive_reopens_rebuilt_index(tmp_path, pages, monkeypatch):
+    monkeypatch.setenv('WR_ARCHIVE', str(tmp_path))
+    monkeypatch.setattr(archive, '_archives', {})
+    assert archive.get_archive('en') is None
+
+    archive.build_archive(str(tmp_path), 'en', [0])
+    first = archive.get_archive('en')
+    assert first is not None and first.count == 1
+    assert archive.get_archive('en') is first
+
+    os.utime(
+        archive.index_path(str(tmp_path), 'en'),
+        ns=(0, 1),
+    )
+    archive.build_archive(str(tmp_path), 'en', [1])
+    reopened = archive.get_archive('en')
+    assert reopened is not first
+    assert reopened is not None and reopened.count == 2
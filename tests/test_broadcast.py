@@ -0,0 +1,123 @@
+import pytest  # type: ignore
+
+from wiki_reveal.broadcast import RoomBroadcaster, coalesce
+
+
+class StopLoop(Exception):
+    pass
+
+
+def guess(lex: str) -> dict:
+    return {'type': 'GUESS', 'lex': lex}
+
+
+def make_broadcaster(interval: float, max_messages: int = 64):
+    sent: list[tuple[dict, str]] = []
+    broadcaster = RoomBroadcaster(
+        lambda message, room: sent.append((message, room)),
+        interval,
+        max_messages,
+    )
+    return broadcaster, sent
+
+
+def test_coalesce_single_message_is_unchanged():
+    assert coalesce([guess('qom')]) == guess('qom')
+
+
+def test_coalesce_keeps_only_last_users():
+    assert coalesce([
+        {'type': 'JOIN', 'name': 'Bob', 'users': ['Alice', 'Bob']},
+        guess('qom'),
+        {'type': 'LEAVE', 'name': 'Alice', 'users': ['Bob']},
+        guess('iran'),
+    ]) == {
+        'type': 'BATCH',
+        'messages': [
+            {'type': 'JOIN', 'name': 'Bob'},
+            guess('qom'),
+            {'type': 'LEAVE', 'name': 'Alice', 'users': ['Bob']},
+            guess('iran'),
+        ],
+    }
+
+
+def test_disabled_broadcaster_sends_directly():
+    broadcaster, sent = make_broadcaster(0)
+    assert not broadcaster.enabled
+    broadcaster.broadcast(guess('qom'), 'room')
+    assert sent == [(guess('qom'), 'room')]
+
+
+def test_flush_sends_one_message_per_room():
+    broadcaster, sent = make_broadcaster(0.05)
+    broadcaster.broadcast(guess('qom'), 'room')
+    broadcaster.broadcast(guess('iran'), 'room')
+    broadcaster.broadcast(guess('city'), 'other')
+    assert sent == []
+
+    broadcaster.flush()
+    assert sent == [
+        ({'type': 'BATCH', 'messages': [guess('qom'), guess('iran')]}, 'room'),
+        (guess('city'), 'other'),
+    ]
+    broadcaster.flush()
+    assert len(sent) == 2
+    assert broadcaster.stats() == {
+        'intervalMs': 50,
+        'messages': 3,
+        'sent': 2,
+    }
+
+
+def test_flush_room_sends_only_that_room():
+    broadcaster, sent = make_broadcaster(0.05)
+    broadcaster.broadcast(guess('qom'), 'room')
+    broadcaster.broadcast(guess('city'), 'other')
+
+    broadcaster.flush_room('room')
+    broadcaster.flush_room('empty')
+    assert sent == [(guess('qom'), 'room')]
+    broadcaster.flush()
+    assert sent[1:] == [(guess('city'), 'other')]
+
+
+def test_full_queue_is_sent_right_away():
+    broadcaster, sent = make_broadcaster(0.05, max_messages=2)
+    broadcaster.broadcast(guess('qom'), 'room')
+    broadcaster.broadcast(guess('iran'), 'room')
+    assert sent == [
+        ({'type': 'BATCH', 'messages': [guess('qom'), guess('iran')]}, 'room'),
+    ]
+
+
+def test_failing_send_does_not_stop_others():
+    def send(message, room):
+        if room == 'broken':
+            raise ValueError
+        sent.append(room)
+
+    sent: list[str] = []
+    broadcaster = RoomBroadcaster(send, 0.05)
+    broadcaster.broadcast(guess('qom'), 'broken')
+    broadcaster.broadcast(guess('qom'), 'room')
+    broadcaster.flush()
+    assert sent == ['room']
+
+
+def test_run_flushes_every_interval():
+    broadcaster, sent = make_broadcaster(0.05)
+    sleeps: list[float] = []
+
+    def sleep(seconds: float):
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+            broadcaster.broadcast(guess('qom'), 'room')
+        else:
+            raise StopLoop
+
+    with pytest.raises(StopLoop):
+        broadcaster.run(sleep)
+
+    assert sleeps == [0.05, 0.05]
+    assert sent == [(guess('qom'), 'room')]
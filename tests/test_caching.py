@@ -0,0 +1,206 @@
+from threading import Event, Thread
+from time import sleep
+
+import pytest  # type: ignore
+
+from wiki_reveal.caching import (
+    PinSet, SingleFlight, pinnable_lru_cache, single_flight,
+    single_flight_stats,
+)
+from wiki_reveal.exceptions import NoSuchPageError, SingleFlightTimeoutError
+
+
+def test_pinned_entries_survive_eviction():
+    calls = []
+
+    @pinnable_lru_cache(maxsize=1)
+    def double(value: int) -> int:
+        calls.append(value)
+        return value * 2
+
+    assert double.pin(1) == 2
+    assert double(2) == 4
+    assert double(3) == 6
+    assert double(1) == 2
+    assert calls == [1, 2, 3]
+    assert double.pinned() == 1
+
+    double.unpin_all()
+    assert double(2) == 4
+    assert calls == [1, 2, 3, 2]
+
+
+def test_pin_keys_on_keyword_arguments():
+    calls = []
+
+    @pinnable_lru_cache(maxsize=1)
+    def greet(name: str, *, language: str = 'en') -> str:
+        calls.append((name, language))
+        return f'{language}:{name}'
+
+    greet.pin('Qom', language='sv')
+    greet('Qom', language='en')
+    assert greet('Qom', language='sv') == 'sv:Qom'
+    assert calls == [('Qom', 'sv'), ('Qom', 'en')]
+
+
+def test_is_pinned():
+    @pinnable_lru_cache(maxsize=1)
+    def double(x: int) -> int:
+        return 2 * x
+
+    double(1)
+    double.pin(2)
+    assert not double.is_pinned(1)
+    assert double.is_pinned(2)
+    double.unpin_all()
+    assert not double.is_pinned(2)
+
+
+def test_is_cached_without_computing():
+    calls = []
+
+    @pinnable_lru_cache(maxsize=1)
+    def double(x: int) -> int:
+        calls.append(x)
+        return 2 * x
+
+    assert not double.is_cached(1)
+    double(1)
+    assert double.is_cached(1)
+    double.pin(2)
+    assert not double.is_cached(1)
+    assert double.is_cached(2)
+    assert calls == [1, 2]
+    assert double.cache_info() == (0, 2, 1, 1)
+
+
+def test_pin_set_swaps_pins_together():
+    calls = []
+
+    @pinnable_lru_cache(maxsize=1)
+    def double(x: int) -> int:
+        calls.append(x)
+        if x < 0:
+            raise ValueError
+        return 2 * x
+
+    double.pin(1)
+    double.pin(2)
+
+    failed = PinSet([double])
+    failed.pin(double, 2)
+    with pytest.raises(ValueError):
+        failed.pin(double, -1)
+    assert double.is_pinned(1) and double.is_pinned(2)
+
+    pins = PinSet([double])
+    assert pins.pin(double, 2) == 4
+    pins.pin(double, 3)
+    assert double.is_pinned(1)
+    pins.swap()
+
+    assert not double.is_pinned(1)
+    assert double.is_pinned(2) and double.is_pinned(3)
+    assert calls == [1, 2, -1, 3]
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    started = Event()
+    release = Event()
+    calls = []
+
+    def slow(value: int) -> int:
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return value * 2
+
+    flight: SingleFlight[int] = SingleFlight(timeout=5)
+    results: list[int] = []
+
+    def call():
+        results.append(flight.do('key', slow, 21))
+
+    leader = Thread(target=call)
+    leader.start()
+    started.wait(5)
+    waiters = [Thread(target=call) for _ in range(5)]
+    for waiter in waiters:
+        waiter.start()
+    while flight.coalesced < 5:
+        sleep(0.001)
+    release.set()
+    for thread in [leader, *waiters]:
+        thread.join(5)
+
+    assert calls == [21]
+    assert results == [42] * 6
+    assert flight.stats() == {
+        'executions': 1, 'coalesced': 5, 'timeouts': 0, 'inFlight': 0,
+    }
+
+
+def test_single_flight_shares_exceptions():
+    started = Event()
+    release = Event()
+
+    def fail() -> int:
+        started.set()
+        release.wait(5)
+        raise NoSuchPageError
+
+    flight: SingleFlight[int] = SingleFlight(timeout=5)
+    errors: list[Exception] = []
+
+    def call():
+        try:
+            flight.do('key', fail)
+        except NoSuchPageError as error:
+            errors.append(error)
+
+    threads = [Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(Thread(target=call))
+    threads[1].start()
+    while flight.coalesced < 1:
+        sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 2
+    assert flight.in_flight() == 0
+
+
+def test_single_flight_waiter_times_out():
+    started = Event()
+    release = Event()
+
+    def slow() -> int:
+        started.set()
+        release.wait(5)
+        return 1
+
+    flight: SingleFlight[int] = SingleFlight(timeout=0.01)
+    leader = Thread(target=flight.do, args=('key', slow))
+    leader.start()
+    started.wait(5)
+
+    with pytest.raises(SingleFlightTimeoutError):
+        flight.do('key', slow)
+    release.set()
+    leader.join(5)
+
+    assert flight.timeouts == 1
+
+
+def test_single_flight_decorator_separates_keys():
+    @single_flight()
+    def add(a: int, b: int = 0) -> int:
+        return a + b
+
+    assert add(1, b=2) == 3
+    assert add(2) == 2
+    assert single_flight_stats()['add']['executions'] == 2
@@ -0,0 +1,51 @@
+import pytest  # type: ignore
+
+from wiki_reveal import codec
+from wiki_reveal.codec import (
+    JSON, MSGPACK, base_room, client_codec, codec_room, compact_message,
+    encode_message,
+)
+
+GUESS = {
+    'type': 'GUESS', 'username': 'Alice', 'lex': 'qom', 'index': 3,
+    'isHint': False,
+}
+
+
+@pytest.mark.parametrize('auth,expected', [
+    (None, JSON),
+    ({}, JSON),
+    ({'codec': 'xml'}, JSON),
+    ({'codec': 'msgpack'}, MSGPACK if codec.msgpack else JSON),
+])
+def test_client_codec(auth, expected):
+    assert client_codec(auth) == expected
+
+
+def test_codec_rooms():
+    assert codec_room('abc', JSON) == 'abc'
+    assert codec_room('abc', MSGPACK) == 'abc~msgpack'
+    assert base_room('abc~msgpack') == 'abc'
+    assert base_room('abc') == 'abc'
+
+
+def test_compact_message():
+    assert compact_message(GUESS) == ['G', 3, 'qom', 'Alice', False]
+    assert compact_message({'type': 'BATCH', 'messages': [
+        GUESS, {'type': 'JOIN', 'name': 'Bob'},
+    ]}) == {'type': 'BATCH', 'messages': [
+        ['G', 3, 'qom', 'Alice', False], {'type': 'JOIN', 'name': 'Bob'},
+    ]}
+    assert compact_message({'type': 'LEAVE-ME'}) == {'type': 'LEAVE-ME'}
+
+
+def test_encode_message_json_is_unchanged():
+    assert encode_message(GUESS, JSON) is GUESS
+    assert encode_message(GUESS, None) is GUESS
+
+
+@pytest.mark.skipif(codec.msgpack is None, reason='msgpack not installed')
+def test_encode_message_msgpack():
+    data = encode_message(GUESS, MSGPACK)
+    assert isinstance(data, bytes)
+    assert codec.msgpack.unpackb(data) == ['G', 3, 'qom', 'Alice', False]
@@ -0,0 +1,75 @@
+import json
+
+from wiki_reveal.compact import (
+    COMMON_SEPARATORS, COMPACT_FORMAT, NULL_TOKEN, decode_bitmap, decode_page,
+    encode_bitmap, encode_page,
+)
+from wiki_reveal.parser import EQUATION_TAG
+from wiki_reveal.wiki import Page, Section, tokenize
+
+
+def make_page() -> Page:
+    return Page(
+        title=tuple(tokenize('Washing machine')),
+        summary=tuple(tokenize(
+            'A washing machine (laundry machine, clothes washer, washer, or'
+            ' simply wash) is a home appliance used to wash laundry.\n\n'
+            f'It spins {EQUATION_TAG} fast.',
+        )),
+        sections=(
+            Section(
+                title=tuple(tokenize('History')),
+                depth=0,
+                paragraphs=tuple(tokenize('Washing by hand. Then machines.')),
+                sections=(
+                    Section(
+                        title=tuple(tokenize('Early machines')),
+                        depth=1,
+                        paragraphs=tuple(tokenize('Wooden, then metal.')),
+                        sections=(),
+                    ),
+                ),
+            ),
+        ),
+    )
+
+
+def test_bitmap_roundtrip():
+    flags = [True, False, False, True, True, False, True, False, True, True]
+    assert decode_bitmap(encode_bitmap(flags), len(flags)) == flags
+
+
+def test_encode_page_roundtrip():
+    page = make_page()
+    assert decode_page(encode_page(page)) == page
+
+
+def test_encode_page_roundtrips_through_json():
+    page = make_page()
+    assert decode_page(json.loads(json.dumps(encode_page(page)))) == page
+
+
+def test_encode_page_dictionary_codes_separators():
+    encoded = encode_page(make_page())
+    assert encoded['format'] == COMPACT_FORMAT
+    assert encoded['strings'][:len(COMMON_SEPARATORS)] == list(
+        COMMON_SEPARATORS,
+    )
+    assert encoded['title']['tokens'] == [
+        len(COMMON_SEPARATORS), COMMON_SEPARATORS.index(' '),
+        len(COMMON_SEPARATORS) + 1,
+    ]
+    assert NULL_TOKEN in encoded['summary']['tokens']
+
+
+def test_encode_page_reuses_strings():
+    encoded = encode_page(make_page())
+    assert len(encoded['strings']) == len(set(encoded['strings']))
+
+
+def test_encode_page_is_smaller():
+    page = make_page()
+    assert (
+        len(json.dumps(encode_page(page)))
+        < len(json.dumps(page.to_json()))
+    )
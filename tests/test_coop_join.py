@@ -0,0 +1,84 @@
+import pytest  # type: ignore
+
+from wiki_reveal import wiki_clients
+from wiki_reveal.broadcast import RoomBroadcaster
+
+from .wiki_stub import WikiStubServer
+
+
+def _server_works() -> bool:
+    # Flask-SocketIO runs on eventlet whenever it can be imported
+    try:
+        import eventlet  # type: ignore # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+@pytest.fixture(scope='module')
+def server():
+    with WikiStubServer() as stub:
+        wiki_clients.WIKI_API_URL = stub.api_url
+        wiki_clients.reset_clients()
+        from wiki_reveal import server
+
+        yield server
+        wiki_clients.reset_clients()
+
+
+@pytest.fixture
+def batching(server, monkeypatch):
+    # Only flushed by the test, never by the interval
+    broadcaster = RoomBroadcaster(server.send_to_room, 3600)
+    monkeypatch.setattr(server, 'broadcaster', broadcaster)
+    return broadcaster
+
+
+def messages(client) -> list[dict]:
+    return [received['args'] for received in client.get_received()]
+
+
+def guess(client, room: str, username: str, lex: str) -> None:
+    client.emit('guess', {
+        'room': room, 'username': username, 'lex': lex, 'isHint': False,
+    })
+
+
+@pytest.mark.skipif(not _server_works(), reason='eventlet not usable')
+def test_joiner_gets_only_what_is_not_in_its_backlog(server, batching):
+    alice = server.socketio.test_client(server.app)
+    alice.emit('create game', {
+        'username': 'Alice', 'gameType': 'today', 'expireType': 'today',
+    })
+    room = messages(alice)[-1]['room']
+    guess(alice, room, 'Alice', 'qom')
+
+    bob = server.socketio.test_client(server.app)
+    bob.emit('join', {'username': 'Bob', 'room': room})
+
+    received = messages(bob)
+    assert [message['type'] for message in received] == ['JOIN-ME']
+    assert [lex for lex, *_ in received[0]['backlog']] == ['qom']
+    assert received[0]['users'] == ['Alice', 'Bob']
+    assert messages(alice) == [{
+        'type': 'BATCH',
+        'messages': [
+            {
+                'type': 'GUESS', 'username': 'Alice', 'lex': 'qom',
+                'index': 0, 'isHint': False,
+            },
+            {'type': 'JOIN', 'name': 'Bob', 'users': ['Alice', 'Bob']},
+        ],
+    }]
+
+    guess(alice, room, 'Alice', 'iran')
+    batching.flush()
+    expected = {
+        'type': 'GUESS', 'username': 'Alice', 'lex': 'iran',
+        'index': 1, 'isHint': False,
+    }
+    assert messages(bob) == [expected]
+    assert messages(alice) == [expected]
+
+    bob.disconnect()
+    alice.disconnect()
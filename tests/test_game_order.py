@@ -0,0 +1,57 @@
+import os
+
+import pytest  # type: ignore
+
+from wiki_reveal import game_order
+from wiki_reveal.nicer_random import get_order_key, randomize_titles
+
+
+@pytest.fixture
+def order_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('WR_ORDER_INDEX', str(tmp_path))
+    game_order.get_game_order.cache_clear()
+    yield tmp_path
+    game_order.get_game_order.cache_clear()
+
+
+def test_encoded_order_is_the_shuffled_order():
+    titles = randomize_titles()
+    order = game_order.GameOrder(
+        game_order.encode_order(get_order_key(), titles),
+        get_order_key(),
+    )
+    assert len(order) == len(titles)
+    assert [order[i] for i in range(len(order))] == titles
+    with pytest.raises(IndexError):
+        order[len(titles)]
+
+
+def test_encoded_order_of_other_key():
+    with pytest.raises(ValueError):
+        game_order.GameOrder(
+            game_order.encode_order('another-order-16', ['Qom']),
+            get_order_key(),
+        )
+
+
+def test_game_order_is_stored_once(order_dir, monkeypatch):
+    first = game_order.get_game_order()
+    assert os.listdir(order_dir) == [
+        f'game-order-{get_order_key()}.index',
+    ]
+
+    def randomize_titles():
+        raise AssertionError('Should not shuffle again')
+
+    monkeypatch.setattr(game_order, 'randomize_titles', randomize_titles)
+    game_order.get_game_order.cache_clear()
+    stored = game_order.get_game_order()
+    assert stored is not first
+    assert stored[1] == first[1] == 'Qom'
+
+
+def test_game_order_without_writable_directory(order_dir, monkeypatch):
+    monkeypatch.setenv('WR_ORDER_INDEX', str(order_dir / 'file'))
+    (order_dir / 'file').write_text('')
+
+    assert game_order.get_game_title(0) == 'Washing machine'
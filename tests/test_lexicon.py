@@ -0,0 +1,42 @@
+from wiki_reveal.lexicon import PageLexicon
+from wiki_reveal.wiki import Page, Section, tokenize
+
+
+def make_page() -> Page:
+    return Page(
+        title=tuple(tokenize('Qom')),
+        summary=tuple(tokenize('Qom is a city in Iran. It has a shrine.')),
+        sections=(
+            Section(
+                title=tuple(tokenize('History')),
+                depth=0,
+                paragraphs=tuple(tokenize('The city of Qóm has grown.')),
+                sections=(),
+            ),
+            Section(
+                title=tuple(tokenize('References')),
+                depth=0,
+                paragraphs=tuple(tokenize('Iran Iran Iran')),
+                sections=(),
+            ),
+        ),
+    )
+
+
+def test_counts_hidden_words_of_trimmed_page():
+    assert PageLexicon(make_page()).counts == {
+        'qom': 3, 'is': 1, 'a': 2, 'city': 2, 'in': 1, 'iran': 1, 'it': 1,
+        'has': 2, 'shrine': 1, 'history': 1, 'the': 1, 'of': 1, 'grown': 1,
+    }
+
+
+def test_hints_are_ranked_without_free_words():
+    assert PageLexicon(make_page()).to_json()['hints'] == [
+        ('qom', 3, False),
+        ('city', 2, False),
+        ('has', 2, True),
+        ('grown', 1, False),
+        ('history', 1, False),
+        ('iran', 1, False),
+        ('shrine', 1, False),
+    ]
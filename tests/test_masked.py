@@ -0,0 +1,80 @@
+import json
+
+import pytest  # type: ignore
+
+from wiki_reveal.compact import decode_bitmap
+from wiki_reveal.lexical import word_as_lexical_entry
+from wiki_reveal.masked import MASKED_FORMAT, MaskedPage, trim_sections
+from wiki_reveal.wiki import Page, Section, tokenize
+
+
+def section(title: str, text: str, *sections: Section) -> Section:
+    return Section(
+        title=tuple(tokenize(title)),
+        depth=0,
+        paragraphs=tuple(tokenize(text)),
+        sections=sections,
+    )
+
+
+def make_page() -> Page:
+    return Page(
+        title=tuple(tokenize('Qom')),
+        summary=tuple(tokenize('Qom is a city in Iran.')),
+        sections=(
+            section(
+                'History', 'The city of Qom grew.',
+                section('Early Qom', 'Qom, Qóm.'),
+            ),
+            section('See also', 'Tehran'),
+            section('Trivia', 'Never shown'),
+        ),
+    )
+
+
+@pytest.mark.parametrize('word,expected', [
+    (None, None),
+    ('Qóm', 'qom'),
+    ('Æther ', 'ather'),
+    ('Łódź', 'lodz'),
+    ('straße', 'strase'),
+])
+def test_word_as_lexical_entry(word, expected):
+    assert word_as_lexical_entry(word) == expected
+
+
+def test_trim_sections():
+    assert [
+        s.title for s in trim_sections(make_page().sections)
+    ] == [tuple(tokenize('History'))]
+
+
+def test_masked_page_hides_words():
+    masked = MaskedPage(make_page())
+    data = masked.json
+    assert data['format'] == MASKED_FORMAT
+    assert [s['title'] for s in data['sections']] == [
+        {'tokens': [7], 'hidden': 'AQ=='},
+    ]
+
+    summary = data['summary']
+    hidden = decode_bitmap(summary['hidden'], len(summary['tokens']))
+    shown = [
+        data['strings'][token] if not is_hidden else '_' * token
+        for token, is_hidden in zip(summary['tokens'], hidden)
+    ]
+    assert ''.join(shown) == '___ is a ____ in ____.'
+    assert 'Qom' not in json.dumps(data)
+    assert data['hiddenCount'] == len(masked.words) == 12
+
+
+def test_reveal_uses_index():
+    masked = MaskedPage(make_page())
+    assert masked.reveal(['QOM', 'qom', 'tehran', 'city', '']) == {
+        'qom': {
+            'positions': [0, 1, 6, 9, 10, 11],
+            'words': ['Qom', 'Qom', 'Qom', 'Qom', 'Qom', 'Qóm'],
+        },
+        'tehran': {'positions': [], 'words': []},
+        'city': {'positions': [2, 5], 'words': ['city', 'city']},
+    }
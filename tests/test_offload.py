@@ -0,0 +1,95 @@
+import json
+import subprocess
+import sys
+from threading import Event, Thread
+from time import sleep
+
+import pytest  # type: ignore
+
+from wiki_reveal.exceptions import OffloadQueueFullError, OffloadTimeoutError
+from wiki_reveal.offload import Offloader
+
+
+def test_offloader_returns_result():
+    offloader = Offloader(workers=1, max_queue=0)
+
+    assert offloader.run(pow, 2, 10) == 1024
+    assert offloader.stats()['completed'] == 1
+
+
+def test_offloader_rejects_when_queue_is_full():
+    release = Event()
+    offloader = Offloader(workers=1, max_queue=1, timeout=5)
+    threads = [
+        Thread(target=offloader.run, args=(release.wait, 5))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    while offloader.pending < 2:
+        sleep(0.001)
+
+    with pytest.raises(OffloadQueueFullError):
+        offloader.run(pow, 2, 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert offloader.stats()['rejected'] == 1
+    assert offloader.run(pow, 2, 2) == 4
+
+
+def test_offloader_times_out():
+    release = Event()
+    offloader = Offloader(workers=1, max_queue=0, timeout=0.01)
+
+    with pytest.raises(OffloadTimeoutError):
+        offloader.run(release.wait, 5)
+    release.set()
+
+    assert offloader.stats()['timeouts'] == 1
+    assert offloader.pending == 0
+
+
+def _eventlet_works() -> bool:
+    try:
+        import eventlet  # type: ignore # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+@pytest.mark.skipif(not _eventlet_works(), reason='eventlet not usable')
+def test_heartbeat_keeps_running_while_fetching():
+    result = subprocess.run(
+        [sys.executable, '-m', 'tests.eventlet_load'],
+        capture_output=True,
+        check=True,
+        timeout=120,
+    )
+    lag = json.loads(result.stdout.splitlines()[-1])
+
+    assert lag['offloaded'] * 3 < lag['inline']
+
+
+@pytest.mark.skipif(not _eventlet_works(), reason='eventlet not usable')
+def test_native_lock_is_shared_with_offloaded_threads():
+    script = (
+        'import eventlet; eventlet.monkey_patch()\n'
+        'from eventlet import tpool\n'
+        'from wiki_reveal.offload import native_lock\n'
+        'lock = native_lock()\n'
+        'lock.acquire()\n'
+        'print(tpool.execute(lock.acquire, timeout=0.1))\n'
+        'lock.release()\n'
+        'print(tpool.execute(lock.acquire, timeout=0.1))\n'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script],
+        capture_output=True,
+        check=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.stdout.split() == ['False', 'True']
@@ -0,0 +1,145 @@
+import pytest  # type: ignore
+
+from wiki_reveal import wiki
+from wiki_reveal.page_store import PageStore, get_page_store, main
+
+EXTRACT = {
+    'title': 'Washing machine',
+    'summary': 'A washing machine is a home appliance.',
+    'sections': [
+        {
+            'title': 'History',
+            'text': 'Washing by hand.',
+            'sections': [
+                {'title': 'Early', 'text': 'Wooden drums.', 'sections': []},
+            ],
+        },
+    ],
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PageStore(str(tmp_path / 'pages.sqlite'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def env_store(tmp_path, monkeypatch):
+    monkeypatch.setenv('WR_PAGE_STORE', str(tmp_path / 'env.sqlite'))
+    get_page_store.cache_clear()
+    wiki.get_page.cache_clear()
+    yield get_page_store()
+    get_page_store.cache_clear()
+    wiki.get_page.cache_clear()
+
+
+def test_store_returns_newest_revision(store):
+    store.put('Qom', 'en', 1, {'old': True}, None, 1)
+    store.put('Qom', 'en', 5, {'new': True}, {'page': 1}, 1)
+    store.put('Qom', 'sv', 9, {'other': True}, None, 1)
+
+    stored = store.get('Qom', 'en')
+    assert stored is not None
+    assert stored.revision == 5
+    assert stored.extract == {'new': True}
+    assert stored.page == {'page': 1}
+    assert store.get('Qom', 'de') is None
+
+
+def test_store_evicts_least_recently_accessed(store):
+    store.put('A', 'en', 1, {'text': 'a' * 100}, None, 1)
+    store.put('B', 'en', 1, {'text': 'b' * 100}, None, 1)
+    store.get('A', 'en')
+    store.max_bytes = store.size() - 1
+
+    assert store.evict() == 1
+    assert store.get('A', 'en') is not None
+    assert store.get('B', 'en') is None
+
+
+def test_store_evict_keeps_given_page(store):
+    store.put('A', 'en', 1, {'text': 'a' * 100}, None, 1)
+    store.put('B', 'en', 1, {'text': 'b' * 100}, None, 1)
+    store.get('B', 'en')
+    store.max_bytes = store.size() - 1
+
+    assert store.evict(keep=('A', 'en', 1)) == 1
+    assert store.get('A', 'en') is not None
+    assert store.get('B', 'en') is None
+
+
+def test_store_skips_page_larger_than_store(store):
+    store.put('A', 'en', 1, {'text': 'a'}, None, 1)
+    store.max_bytes = store.size() + 10
+
+    text = ' '.join(str(i * 7919 % 10007) for i in range(100))
+    store.put('Huge', 'en', 1, {'text': text}, None, 1)
+    assert store.get('Huge', 'en') is None
+    assert store.get('A', 'en') is not None
+
+
+def test_store_purge(store):
+    store.put('A', 'en', 1, {}, None, 1)
+    store.put('A', 'sv', 1, {}, None, 1)
+    store.put('B', 'en', 1, {}, None, 1)
+
+    assert store.purge('A', 'sv') == 1
+    assert [e.page_name for e in store.entries()] == ['B', 'A']
+    assert store.purge() == 2
+    assert store.entries() == []
+
+
+def test_get_page_reads_through_store(env_store, monkeypatch):
+    fetches = []
+
+    def fetch_extract(page_name, language):
+        fetches.append(page_name)
+        return EXTRACT, 42
+
+    monkeypatch.setattr(wiki, 'fetch_extract', fetch_extract)
+    page = wiki.get_page('Washing_machine')
+    assert fetches == ['Washing_machine']
+    assert page == wiki.parse_extract(EXTRACT)
+
+    wiki.get_page.cache_clear()
+    assert wiki.get_page('Washing_machine') == page
+    assert fetches == ['Washing_machine']
+
+    stored = env_store.get('Washing_machine', 'en')
+    assert stored.revision == 42
+    assert stored.extract == EXTRACT
+
+
+def test_get_page_retokenizes_outdated_store_entry(env_store, monkeypatch):
+    def fetch_extract(page_name, language):
+        raise AssertionError('Should not fetch')
+
+    monkeypatch.setattr(wiki, 'fetch_extract', fetch_extract)
+    env_store.put(
+        'Washing_machine', 'en', 3, EXTRACT, {'stale': True},
+        wiki.TOKENIZER_VERSION - 1,
+    )
+
+    assert wiki.get_page('Washing_machine') == wiki.parse_extract(EXTRACT)
+    stored = env_store.get('Washing_machine', 'en')
+    assert stored.tokenizer_version == wiki.TOKENIZER_VERSION
+    assert stored.revision == 3
+
+
+def test_page_from_json_roundtrip():
+    page = wiki.parse_extract(EXTRACT)
+    assert wiki.Page.from_json(page.to_json()) == page
+
+
+def test_cli_list_and_purge(store, capsys):
+    store.put('Qom', 'en', 7, {}, None, 1)
+
+    main(['--path', store.path, 'list'])
+    assert capsys.readouterr().out == 'Qom\ten\t7\tv1\t' + str(
+        store.size(),
+    ) + '\n'
+
+    main(['--path', store.path, 'purge', '--page', 'Qom'])
+    assert capsys.readouterr().out == 'Purged 1 pages\n'
@@ -0,0 +1,184 @@
+from collections.abc import Iterator
+
+import pytest  # type: ignore
+
+from wiki_reveal.parser import EQUATION_TAG, clean_lines, find_tags, in_tag
+
+
+def legacy_find_tags(text: str) -> Iterator[tuple[str, int]]:
+    """The original slicing scanner, kept as the reference output"""
+    offset = 0
+    while (idx := text.find('{\\')) >= 0:
+        depth = 1
+        start = idx
+        idx += 1
+
+        while depth > 0:
+            if idx >= len(text):
+                break
+
+            if text[idx] == '{':
+                depth += 1
+            elif text[idx] == '}':
+                depth -= 1
+            idx += 1
+
+        yield text[start: idx + 1], start + offset
+        offset += idx + 1
+
+        if idx + 1 >= len(text):
+            break
+
+        text = text[idx + 1:]
+
+
+def legacy_clean_lines(text: str) -> str:
+    prev_idx = 0
+    out = ''
+    for tag, idx in legacy_find_tags(text):
+        def removable(line) -> bool:
+            return line == '' or in_tag(line, tag)
+
+        rev_lines = [
+            line.strip() for line in text[prev_idx: idx].split('\n')
+        ][::-1]
+        line_idx = 0
+        while line_idx < len(rev_lines) and removable(rev_lines[line_idx]):
+            line_idx += 1
+
+        out += '\n'.join(rev_lines[line_idx:][::-1]) + EQUATION_TAG
+
+        prev_idx = idx + len(tag) + 1
+
+    out += text[prev_idx:]
+    return out
+
+
+NEWTON = """In the absence of a net force, a body either is at rest or \
+moves in a straight line with constant speed. The second law states
+F
+=
+m
+a
+{\\displaystyle \\mathbf {F} =m\\mathbf {a} }
+ where the force
+F
+{\\displaystyle \\mathbf {F} }
+ and acceleration
+a
+{\\displaystyle \\mathbf {a} }
+ are vectors. The momentum
+p
+=
+m
+v
+{\\displaystyle \\mathbf {p} =m\\mathbf {v} }
+ is conserved."""
+
+STANDARD_DEVIATION = """The population standard deviation is
+σ
+=
+1
+N
+∑
+i
+=
+1
+N
+(
+x
+i
+−
+μ
+)
+2
+{\\displaystyle \\sigma ={\\sqrt {{\\frac {1}{N}}\\sum _{i=1}^{N}\
+\\left(x_{i}-\\mu \\right)^{2}}}}
+ where
+μ
+{\\displaystyle \\mu }
+ is the mean and
+N
+{\\displaystyle N}
+ the population size.
+The sample variance
+s
+2
+{\\displaystyle s^{2}}
+ uses
+n
+−
+1
+{\\displaystyle n-1}
+ degrees of freedom."""
+
+QUADRATIC = """The solutions of
+a
+x
+2
++
+b
+x
++
+c
+=
+0
+{\\displaystyle ax^{2}+bx+c=0}
+ are
+x
+=
+−
+b
+±
+b
+2
+−
+4
+a
+c
+2
+a
+{\\displaystyle x={\\frac {-b\\pm {\\sqrt {b^{2}-4ac}}}{2a}}}
+.
+The discriminant
+Δ
+{\\displaystyle \\Delta }
+ decides.{\\displaystyle \\Delta >0}{\\displaystyle \\Delta =0}"""
+
+EDGE_CASES = [
+    '',
+    'No equations at all.\nJust lines.',
+    '{\\displaystyle x}',
+    '{\\displaystyle x}a',
+    '{\\displaystyle x}ab',
+    '{\\displaystyle {x}',
+    'Unclosed {\\displaystyle {\\frac {a}{b}',
+    '  x  \n{\\displaystyle x}\n  y\n',
+    '{\\a}{\\b}{\\c}',
+    'a{\\b}}c{\\d{\\e}}f',
+]
+
+FIXTURES = [NEWTON, STANDARD_DEVIATION, QUADRATIC, *EDGE_CASES]
+
+
+@pytest.mark.parametrize('text', FIXTURES)
+def test_find_tags_matches_legacy(text: str):
+    assert list(find_tags(text)) == list(legacy_find_tags(text))
+
+
+@pytest.mark.parametrize('text', FIXTURES)
+def test_clean_lines_matches_legacy(text: str):
+    assert clean_lines(text) == legacy_clean_lines(text)
+
+
+def test_clean_lines_long_extract_matches_legacy():
+    text = '\n'.join([NEWTON, STANDARD_DEVIATION, QUADRATIC] * 100)
+    assert clean_lines(text) == legacy_clean_lines(text)
+
+
+def test_clean_lines_removes_equation_lines():
+    assert clean_lines(NEWTON).startswith(
+        'In the absence of a net force, a body either is at rest or moves in'
+        ' a straight line with constant speed. The second law states'
+        f'{EQUATION_TAG}where the force{EQUATION_TAG}',
+    )
@@ -0,0 +1,147 @@
+from datetime import datetime, timezone
+import gzip
+import json
+
+import brotli  # type: ignore
+from freezegun import freeze_time  # type: ignore
+import pytest  # type: ignore
+from flask import Flask, request
+
+from wiki_reveal.payload import PageBody, PreparedPayload
+
+app = Flask(__name__)
+DATA = {'page': {'title': [['Qom', True]]}, 'language': 'en'}
+OVERLAY = {'start': '2023-01-01T05:00:00', 'isYesterday': True}
+
+
+def test_prepared_payload_serves_identity():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY)
+    with app.test_request_context():
+        response = payload.response(request)
+
+    assert response.status_code == 200
+    assert json.loads(response.get_data()) == {**DATA, **OVERLAY}
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag'] == f'"{payload.etag}"'
+
+
+def test_prepared_payload_without_overlay():
+    payload = PreparedPayload(PageBody(DATA))
+    with app.test_request_context():
+        response = payload.response(request)
+
+    assert json.loads(response.get_data()) == DATA
+
+
+def test_prepared_payload_serves_gzip():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY)
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = payload.response(request)
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data())) == {
+        **DATA, **OVERLAY,
+    }
+    assert response.headers['ETag'] == f'"{payload.etag}-gzip"'
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_prepared_payload_serves_brotli():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY)
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip, br'}):
+        response = payload.response(request)
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.get_data())) == {
+        **DATA, **OVERLAY,
+    }
+    assert response.headers['ETag'] == f'"{payload.etag}-br"'
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_prepared_payload_without_brotli_offers_gzip():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY, offer_brotli=False)
+    with app.test_request_context(headers={'Accept-Encoding': 'br, gzip'}):
+        response = payload.response(request)
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_prepared_payload_not_modified():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY)
+    with app.test_request_context(
+        headers={'If-None-Match': f'"{payload.etag}-gzip"'},
+    ):
+        response = payload.response(request)
+
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == f'"{payload.etag}"'
+
+
+def test_prepared_payload_compresses_once():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY)
+    payload.precompress()
+    assert payload.gzip is payload.chunks('gzip')
+
+
+def test_overlays_share_body():
+    body = PageBody(DATA)
+    today = PreparedPayload(body, {'start': 'a'})
+    coop = PreparedPayload(body, {'start': 'b'})
+
+    assert today.chunks(None)[0] is coop.chunks(None)[0]
+    assert today.etag != coop.etag
+    assert today.etag[:32] == coop.etag[:32] == body.etag
+
+
+@pytest.mark.parametrize('overlay', [{}, {'start': 'a'}, {'end': 'ö' * 500}])
+def test_overlay_gzip_matches_full_compression(overlay):
+    body = PageBody(DATA)
+    chunks = body.gzip_chunks(PreparedPayload(body, overlay).tail)
+    assert json.loads(gzip.decompress(b''.join(chunks))) == {
+        **DATA, **overlay,
+    }
+
+
+def test_page_body_needs_fields():
+    with pytest.raises(ValueError):
+        PageBody({})
+
+
+@freeze_time('2023-01-01T12:00:00+00:00')
+def test_prepared_payload_cached_until_expires():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY)
+    expires = datetime(2023, 1, 2, 5, tzinfo=timezone.utc)
+    with app.test_request_context():
+        response = payload.response(request, expires)
+
+    assert response.cache_control.public
+    assert response.cache_control.no_cache
+    assert response.cache_control.max_age is None
+    assert response.expires is None
+    assert response.headers['X-Accel-Expires'] == (
+        f'@{int(expires.timestamp())}'
+    )
+
+
+@freeze_time('2023-01-02T05:00:01+00:00')
+def test_prepared_payload_expired_is_not_cached():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY)
+    expires = datetime(2023, 1, 2, 5, tzinfo=timezone.utc)
+    with app.test_request_context(
+        headers={'If-None-Match': f'"{payload.etag}"'},
+    ):
+        response = payload.response(request, expires)
+
+    assert response.status_code == 304
+    assert response.headers['X-Accel-Expires'] == '0'
+
+
+def test_prepared_payload_not_cached_without_expires():
+    payload = PreparedPayload(PageBody(DATA), OVERLAY)
+    with app.test_request_context():
+        response = payload.response(request)
+
+    assert 'Cache-Control' not in response.headers
+    assert 'Expires' not in response.headers
@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from freezegun import freeze_time  # type: ignore
+import pytest  # type: ignore
+
+from wiki_reveal.prefetch import RETRY_INTERVAL, RolloverPrefetcher
+
+
+class StopLoop(Exception):
+    pass
+
+
+def make_sleep(sleeps: list[float], limit: int):
+    def sleep(seconds: float):
+        sleeps.append(seconds)
+        if len(sleeps) >= limit:
+            raise StopLoop
+
+    return sleep
+
+
+@freeze_time('2022-08-02T12:00:00+00:00')
+def test_warm_game_pins_yesterday_today_and_next():
+    warmed: list[list[int]] = []
+    prefetcher = RolloverPrefetcher(warmed.append, timedelta(minutes=15), id)
+
+    status = prefetcher.warm_game(5)
+
+    assert warmed == [[3, 4, 5]]
+    assert status.game_id == 5
+    assert status.success is True
+    assert status.to_json()['lastWarm'] == '2022-08-02T12:00:00+00:00'
+
+
+@freeze_time('2022-08-02T12:00:00+00:00')
+def test_warm_game_records_failure():
+    def warm(game_ids: list[int]):
+        raise ValueError
+
+    prefetcher = RolloverPrefetcher(warm, timedelta(minutes=15), id)
+
+    assert prefetcher.warm_game(5).success is False
+
+
+@freeze_time('2022-08-02T12:00:00+00:00')
+def test_seconds_to_next_warm():
+    prefetcher = RolloverPrefetcher(
+        lambda game_ids: None, timedelta(minutes=15), id,
+    )
+
+    assert prefetcher.seconds_to_next_warm() == (
+        17 * 60 * 60 - 15 * 60
+    )
+
+
+@freeze_time('2022-08-02T12:00:00+00:00')
+def test_run_warms_today_then_sleeps_until_window():
+    warmed: list[list[int]] = []
+    sleeps: list[float] = []
+    prefetcher = RolloverPrefetcher(
+        warmed.append, timedelta(minutes=15), make_sleep(sleeps, 1),
+    )
+
+    with pytest.raises(StopLoop):
+        prefetcher.run()
+
+    assert warmed == [[3, 4]]
+    assert sleeps == [60 * 60]
+
+
+@freeze_time('2022-08-03T04:50:00+00:00')
+def test_run_warms_next_game_inside_window():
+    warmed: list[list[int]] = []
+    sleeps: list[float] = []
+    prefetcher = RolloverPrefetcher(
+        warmed.append, timedelta(minutes=15), make_sleep(sleeps, 1),
+    )
+
+    with pytest.raises(StopLoop):
+        prefetcher.run()
+
+    assert warmed == [[3, 4], [3, 4, 5]]
+    assert prefetcher.status.game_id == 5
+    assert sleeps == [15 * 60 + 1]
+
+
+def fail_first(warmed: list[list[int]], failures: int):
+    def warm(game_ids: list[int]):
+        warmed.append(game_ids)
+        if len(warmed) <= failures:
+            raise ValueError
+
+    return warm
+
+
+@freeze_time('2022-08-02T12:00:00+00:00')
+def test_run_retries_today_after_failed_boot_warm():
+    warmed: list[list[int]] = []
+    sleeps: list[float] = []
+    readies: list[int] = []
+    prefetcher = RolloverPrefetcher(
+        fail_first(warmed, 1),
+        timedelta(minutes=15),
+        make_sleep(sleeps, 2),
+        lambda: readies.append(len(warmed)),
+    )
+
+    with pytest.raises(StopLoop):
+        prefetcher.run()
+
+    assert warmed == [[3, 4], [3, 4]]
+    assert sleeps == [RETRY_INTERVAL, 60 * 60]
+    assert readies == [2]
+    assert prefetcher.warmed == {3, 4}
+
+
+def test_run_retries_today_when_next_game_failed_before_reset():
+    warmed: list[list[int]] = []
+    sleeps: list[float] = []
+    with freeze_time('2022-08-03T04:50:00+00:00') as frozen:
+        def sleep(seconds: float):
+            sleeps.append(seconds)
+            frozen.tick(timedelta(minutes=15))
+            if len(sleeps) >= 2:
+                raise StopLoop
+
+        prefetcher = RolloverPrefetcher(
+            fail_first(warmed, 1), timedelta(minutes=15), sleep,
+        )
+        prefetcher.warmed = frozenset((3, 4))
+        with pytest.raises(StopLoop):
+            prefetcher.run()
+
+    # The reset passed while waiting to retry, so today is warmed instead
+    assert warmed == [[3, 4, 5], [4, 5]]
+    assert sleeps[0] == RETRY_INTERVAL
+    assert prefetcher.warmed == {4, 5}
@@ -0,0 +1,148 @@
+import pickle
+from datetime import datetime, timedelta, timezone
+from threading import Thread
+from time import sleep
+
+import pytest  # type: ignore
+
+from wiki_reveal.exceptions import RespError
+from wiki_reveal.pubsub import RespManager
+from wiki_reveal.resp import RespClient, encode_command
+from wiki_reveal.room_store import RedisRoomStore
+
+from .redis_stub import RedisStubServer
+
+START = datetime(2023, 1, 1, 5, tzinfo=timezone.utc)
+
+
+def wait_for_subscriber(server: RedisStubServer, channel: bytes):
+    for _ in range(200):
+        if server.subscribers.get(channel):
+            return
+        sleep(0.01)
+    raise AssertionError('Nobody subscribed')
+
+
+def test_encode_command():
+    assert encode_command('HSET', b'k', 1, 'ö') == (
+        b'*4\r\n$4\r\nHSET\r\n$1\r\nk\r\n$1\r\n1\r\n$2\r\n\xc3\xb6\r\n'
+    )
+
+
+def test_pipeline_returns_replies_in_order():
+    with RedisStubServer() as server:
+        client = RespClient(server.url)
+        assert client.pipeline(
+            ('RPUSH', 'list', 'a', 'b'),
+            ('LRANGE', 'list', 0, -1),
+            ('HGET', 'missing', 'field'),
+            ('PING',),
+        ) == [2, [b'a', b'b'], None, 'PONG']
+        client.close()
+
+
+def test_error_reply_raises():
+    with RedisStubServer() as server:
+        client = RespClient(server.url)
+        with pytest.raises(RespError):
+            client.execute('NOPE')
+        assert client.execute('PING') == 'PONG'
+        client.close()
+
+
+def test_transaction():
+    with RedisStubServer() as server:
+        client = RespClient(server.url)
+        assert client.transaction(
+            ('SADD', 'set', 'a'),
+            ('SADD', 'set', 'a'),
+        ) == [1, 0]
+        client.close()
+
+
+def test_client_reconnects():
+    with RedisStubServer() as server:
+        client = RespClient(server.url)
+        assert client.execute('PING') == 'PONG'
+        assert client._connection is not None
+        client._connection._sock.close()
+        assert client.execute('PING') == 'PONG'
+        client.close()
+
+
+def test_client_does_not_resend_after_sending():
+    with RedisStubServer() as server:
+        client = RespClient(server.url)
+        assert client.execute('PING') == 'PONG'
+        server.hang_up_after = 'PING'
+        with pytest.raises(ConnectionError):
+            client.execute('PING')
+        assert client._connection is None
+
+        other = RespClient(server.url)
+        assert other.execute('PING') == 'PONG'
+        server.hang_up_after = 'RPUSH'
+        with pytest.raises(ConnectionError):
+            other.execute('RPUSH', 'list', 'a')
+        assert client.execute('LRANGE', 'list', 0, -1) == [b'a']
+        client.close()
+        other.close()
+
+
+def test_client_drops_connection_closed_while_idle():
+    with RedisStubServer() as server:
+        client = RespClient(server.url)
+        assert client.execute('PING') == 'PONG'
+        connection = client._connection
+        assert connection is not None
+        assert not connection.is_stale()
+
+        server.hang_up_after = 'PING'
+        connection.send(('PING',))
+        for _ in range(200):
+            if connection.is_stale():
+                break
+            sleep(0.01)
+        assert client.execute('PING') == 'PONG'
+        assert client._connection is not connection
+        client.close()
+
+
+def test_stores_share_rooms():
+    with RedisStubServer() as server:
+        one = RedisRoomStore(RespClient(server.url))
+        other = RedisRoomStore(RespClient(server.url))
+
+        one.create('room', START, START + timedelta(hours=1), 3, 'sid1',
+                   'Alice', [('qom', False)], {})
+        assert other.exists('room')
+        assert other.add_guess('room', 'Bob', 'qom', True) == -1
+        assert other.add_guess('room', 'Bob', 'iran', True) == 1
+        assert one.add_user('room', 'sid2', 'Bob')[:2] == (
+            ['Alice', 'Bob'], [['qom', 'Alice', False], ['iran', 'Bob', True]],
+        )
+
+        now = START + timedelta(hours=2)
+        assert one.pop_expired(now) == ['room']
+        assert other.pop_expired(now) == []
+        assert not other.exists('room')
+
+
+def test_resp_manager_fans_out():
+    with RedisStubServer() as server:
+        sender = RespManager(server.url, channel='test')
+        receiver = RespManager(server.url, channel='test')
+        received = []
+        listener = Thread(
+            target=lambda: received.append(next(receiver._listen())),
+            daemon=True,
+        )
+        listener.start()
+        wait_for_subscriber(server, b'test')
+
+        sender._publish({'method': 'emit', 'event': 'message'})
+        listener.join(2)
+
+        assert [pickle.loads(m) for m in received] == [
+            {'method': 'emit', 'event': 'message'},
+        ]
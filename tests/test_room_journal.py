@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+import os
+
+import pytest  # type: ignore
+
+from wiki_reveal.room_journal import JournaledRoomStore, RoomJournal
+
+START = datetime(2023, 1, 1, 5, tzinfo=timezone.utc)
+NOW = START + timedelta(hours=1)
+
+
+class StopLoop(Exception):
+    pass
+
+
+def inline(func, *args):
+    return func(*args)
+
+
+def make_store(tmp_path) -> JournaledRoomStore:
+    return JournaledRoomStore(
+        RoomJournal(str(tmp_path / 'rooms.journal'), offload=inline),
+    )
+
+
+def play(store: JournaledRoomStore) -> None:
+    end = START + timedelta(hours=3)
+    store.create('room', START, end, 4, 'sid1', 'Alice', [('qom', False)], {
+        'hints': 2,
+    })
+    store.add_user('room', 'sid2', 'Bob')
+    store.add_guess('room', 'Bob', 'iran', True)
+    store.add_guess('room', 'Bob', 'qom', False)
+    store.rename_user('room', 'sid1', 'Eve')
+    store.remove_user('room', 'sid2')
+
+
+def test_recover_from_journal(tmp_path):
+    store = make_store(tmp_path)
+    play(store)
+    store.journal.flush()
+
+    recovered = make_store(tmp_path)
+    assert recovered.recover(NOW) == 1
+    assert recovered.room_data('room') == (
+        START, START + timedelta(hours=3), 4,
+    )
+    assert recovered.add_user('room', 'sid3', 'Bob')[:3] == (
+        ['Bob'],
+        [['qom', 'Eve', False], ['iran', 'Bob', True]],
+        {'hints': 2},
+    )
+    assert recovered.add_guess('room', 'Bob', 'city', False) == 2
+    assert recovered.journal.seq == store.journal.seq + 2
+
+
+def test_recover_invalidates_cursors(tmp_path):
+    store = make_store(tmp_path)
+    play(store)
+    epoch = store.epoch('room')
+    store.compact()
+
+    recovered = make_store(tmp_path)
+    recovered.recover(NOW)
+    assert recovered.epoch('room') != epoch
+    assert recovered.add_user('room', 'sid3', 'Bob', 2, epoch)[4] == 0
+
+
+def test_recover_drops_expired_rooms(tmp_path):
+    store = make_store(tmp_path)
+    play(store)
+    store.create('old', START, START + timedelta(minutes=30), 4, 'sid', 'A',
+                 [], {})
+    store.journal.flush()
+
+    recovered = make_store(tmp_path)
+    assert recovered.recover(NOW) == 1
+    assert not recovered.exists('old')
+    assert recovered.pop_expired(START + timedelta(hours=3)) == ['room']
+
+
+def test_recover_from_snapshot_and_journal(tmp_path):
+    store = make_store(tmp_path)
+    play(store)
+    store.compact()
+    assert os.path.getsize(store.journal.path) == 0
+
+    store.add_guess('room', 'Eve', 'city', False)
+    store.journal.flush()
+
+    recovered = make_store(tmp_path)
+    rooms, records = recovered.journal.read()
+    assert list(rooms) == ['room']
+    assert [r['op'] for r in records] == ['guess']
+
+    assert recovered.recover(NOW) == 1
+    assert recovered.add_user('room', 'sid3', 'Bob')[1] == [
+        ['qom', 'Eve', False], ['iran', 'Bob', True], ['city', 'Eve', False],
+    ]
+
+
+def test_replay_skips_repeated_and_torn_records(tmp_path):
+    store = make_store(tmp_path)
+    play(store)
+    pending = store.journal._take()
+    store.journal._write(pending)
+    store.journal._write(pending)
+    with open(store.journal.path, 'ab') as journal:
+        journal.write(b'{"seq":99,"op":"gue')
+
+    recovered = make_store(tmp_path)
+    _, records = recovered.journal.read()
+    assert [r['seq'] for r in records] == list(range(1, 6))
+    assert recovered.recover(NOW) == 1
+
+
+def test_run_journal_flushes_in_groups(tmp_path):
+    store = make_store(tmp_path)
+    sleeps: list[float] = []
+
+    def sleep(seconds: float):
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+            play(store)
+        else:
+            raise StopLoop
+
+    with pytest.raises(StopLoop):
+        store.run_journal(sleep, 0.1)
+
+    assert store.journal.flushes == 1
+    with open(store.journal.path, 'rb') as journal:
+        assert len(journal.readlines()) == 5
@@ -0,0 +1,246 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest  # type: ignore
+
+from wiki_reveal import rooms
+from wiki_reveal.exceptions import CoopGameDoesNotExistError
+from wiki_reveal.resp import RespClient
+from wiki_reveal.room_store import (
+    MemoryRoomStore, RedisRoomStore, RoomData, RoomStore,
+)
+from wiki_reveal.rooms import (
+    active_rooms, add_coop_game, add_coop_guess, add_coop_user,
+    coop_game_exists, coop_game_is_full, get_room_data, get_room_epoch,
+    pop_expired_rooms, remove_coop_user, rename_user, sweep_rooms,
+)
+
+from .redis_stub import RedisStubServer
+
+START = datetime(2023, 1, 1, 5, tzinfo=timezone.utc)
+
+
+class StopLoop(Exception):
+    pass
+
+
+def room_backlog(room: str):
+    return add_coop_user(room, 'observer', 'Observer')[1]
+
+
+@pytest.fixture(autouse=True, params=['memory', 'redis'])
+def store(request, monkeypatch):
+    room_store: RoomStore
+    if request.param == 'memory':
+        room_store = MemoryRoomStore()
+        monkeypatch.setattr(rooms, 'get_room_store', lambda: room_store)
+        yield room_store
+    else:
+        with RedisStubServer() as server:
+            client = RespClient(server.url)
+            room_store = RedisRoomStore(client)
+            monkeypatch.setattr(rooms, 'get_room_store', lambda: room_store)
+            yield room_store
+            client.close()
+
+
+def test_pop_expired_rooms_only_pops_expired():
+    add_coop_game('short', 1, 'sid1', 'Alice', START, 1)
+    add_coop_game('long', 1, 'sid2', 'Bob', START, 5)
+    add_coop_game('mid', 1, 'sid3', 'Eve', START, 2)
+
+    assert pop_expired_rooms(START + timedelta(hours=2)) == ['short', 'mid']
+    assert not coop_game_exists('short')
+    assert coop_game_exists('long')
+    assert active_rooms() == [1]
+
+
+def test_pop_expired_rooms_skips_replaced_rooms():
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1)
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 3)
+
+    assert pop_expired_rooms(START + timedelta(hours=2)) == []
+    assert coop_game_exists('room')
+    assert pop_expired_rooms(START + timedelta(hours=3)) == ['room']
+
+
+def test_sweep_rooms_closes_expired():
+    add_coop_game('old', 1, 'sid1', 'Alice', START, 1)
+    add_coop_game('new', 1, 'sid2', 'Bob', datetime.now(tz=timezone.utc), 1)
+    closed: list[str] = []
+
+    def sleep(seconds: float):
+        raise StopLoop
+
+    with pytest.raises(StopLoop):
+        sweep_rooms(closed.append, sleep)
+
+    assert closed == ['old']
+    assert active_rooms() == [1]
+
+
+def test_add_coop_guess_rejects_duplicates():
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1)
+
+    assert add_coop_guess('room', 'Alice', 'qom', False) == 0
+    assert add_coop_guess('room', 'Bob', 'city', True) == 1
+    assert add_coop_guess('room', 'Bob', 'qom', False) == -1
+    assert room_backlog('room') == [
+        ['qom', 'Alice', False], ['city', 'Bob', True],
+    ]
+
+
+def test_add_coop_guess_knows_seeded_lexes():
+    add_coop_game(
+        'room', 1, 'sid1', 'Alice', START, 1, [('qom', False), ('iran', True)],
+    )
+
+    assert add_coop_guess('room', 'Alice', 'iran', False) == -1
+    assert add_coop_guess('room', 'Alice', 'city', False) == 2
+
+
+def test_add_coop_guess_after_rename():
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1, [('qom', False)])
+    rename_user('room', 'sid1', 'Eve')
+
+    assert add_coop_guess('room', 'Eve', 'qom', False) == -1
+    assert room_backlog('room') == [['qom', 'Eve', False]]
+
+
+def test_add_coop_game_keeps_seeded_backlog():
+    backlog = add_coop_game(
+        'room', 1, 'sid1', 'Alice', START, 1,
+        [('qom', False), ('qom', True), ('iran', True)],
+    )
+
+    assert backlog == [
+        ['qom', 'Alice', False],
+        ['qom', 'Alice', True],
+        ['iran', 'Alice', True],
+    ]
+
+
+def test_rename_user_renames_guesses():
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1, [('qom', False)])
+    add_coop_user('room', 'sid2', 'Bob')
+    add_coop_guess('room', 'Bob', 'city', False)
+    add_coop_guess('room', 'Alice', 'iran', True)
+
+    rename_user('room', 'sid1', 'Eve')
+
+    users, backlog, *_ = add_coop_user('room', 'sid3', 'Mallory')
+    assert users == ['Eve', 'Bob', 'Mallory']
+    assert backlog == [
+        ['qom', 'Eve', False], ['city', 'Bob', False], ['iran', 'Eve', True],
+    ]
+    assert add_coop_guess('room', 'Eve', 'persia', False) == 3
+    assert room_backlog('room')[3] == ['persia', 'Eve', False]
+
+
+def test_add_coop_user_replaces_same_name():
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1)
+    add_coop_user('room', 'sid2', 'Bob')
+
+    users, *_ = add_coop_user('room', 'sid3', 'Alice')
+
+    assert users == ['Bob', 'Alice']
+    assert remove_coop_user('room', 'sid1') == (None, ['Bob', 'Alice'])
+    assert remove_coop_user('room', 'sid3') == ('Alice', ['Bob'])
+
+
+def test_add_coop_user_resumes_from_cursor():
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1, [('qom', False)])
+    add_coop_guess('room', 'Alice', 'iran', True)
+    epoch = get_room_epoch('room')
+
+    add_coop_guess('room', 'Alice', 'city', False)
+    _, backlog, _, room_epoch, since = add_coop_user(
+        'room', 'sid2', 'Bob', 2, epoch,
+    )
+    assert backlog == [['city', 'Alice', False]]
+    assert (room_epoch, since) == (epoch, 2)
+    assert add_coop_user('room', 'sid2', 'Bob', 3, epoch)[1:] == (
+        [], {}, epoch, 3,
+    )
+    # Without an epoch the cursor is trusted if it fits
+    assert add_coop_user('room', 'sid2', 'Bob', 1)[1] == [
+        ['iran', 'Alice', True], ['city', 'Alice', False],
+    ]
+
+
+@pytest.mark.parametrize('since,epoch', [
+    (4, None), (-1, None), (2, 'stale'),
+])
+def test_add_coop_user_sends_all_for_bad_cursor(since, epoch):
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1, [('qom', False)])
+    add_coop_guess('room', 'Alice', 'iran', True)
+
+    _, backlog, _, _, start = add_coop_user('room', 'sid2', 'Bob', since, epoch)
+    assert start == 0
+    assert backlog == [['qom', 'Alice', False], ['iran', 'Alice', True]]
+
+
+def test_rename_of_guesser_changes_epoch():
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1, [('qom', False)])
+    epoch = get_room_epoch('room')
+
+    add_coop_user('room', 'sid2', 'Bob')
+    assert get_room_epoch('room') == epoch
+
+    rename_user('room', 'sid1', 'Eve')
+    assert get_room_epoch('room') != epoch
+    _, backlog, _, _, since = add_coop_user('room', 'sid3', 'Carol', 1, epoch)
+    assert (backlog, since) == ([['qom', 'Eve', False]], 0)
+
+
+def test_rename_changes_epoch_only_for_new_names_of_guessers():
+    def renamed(sid: str, username: str) -> bool:
+        epoch = get_room_epoch('room')
+        rename_user('room', sid, username)
+        return get_room_epoch('room') != epoch
+
+    add_coop_game('room', 1, 'sid1', 'Alice', START, 1, [('qom', False)])
+    add_coop_user('room', 'sid2', 'Bob')
+
+    assert not renamed('sid2', 'Carol')
+    assert not renamed('sid1', 'Alice')
+    assert renamed('sid1', 'Eve')
+    add_coop_guess('room', 'Carol', 'iran', False)
+    assert not renamed('sid2', 'Carol')
+    assert renamed('sid2', 'Frank')
+    assert room_backlog('room') == [
+        ['qom', 'Eve', False], ['iran', 'Frank', False],
+    ]
+
+
+def test_restored_room_data_counts_guesses_per_user():
+    room_data = RoomData(START, START + timedelta(hours=1), 1, {})
+    room_data.append_guess('qom', 'Alice', False)
+    room_data.user_id('Bob')
+
+    restored = RoomData.from_json(room_data.to_json())
+    epoch = restored.epoch
+    restored.rename(restored.user_id('Bob'), 'Carol')
+    assert restored.epoch == epoch
+    restored.rename(restored.user_id('Alice'), 'Eve')
+    assert restored.epoch != epoch
+
+
+def test_room_data_round_trips():
+    add_coop_game('room', 7, 'sid1', 'Alice', START, 2, [], {'hints': 3})
+
+    assert get_room_data('room') == (START, START + timedelta(hours=2), 7)
+    assert add_coop_user('room', 'sid2', 'Bob')[:3] == (
+        ['Alice', 'Bob'], [], {'hints': 3},
+    )
+    assert not coop_game_is_full('room')
+
+
+def test_missing_room():
+    assert not coop_game_exists('nope')
+    assert add_coop_user('nope', 'sid1', 'Alice') == ([], [], {}, None, 0)
+    assert get_room_epoch('nope') is None
+    assert remove_coop_user('nope', 'sid1') == (None, [])
+    with pytest.raises(CoopGameDoesNotExistError):
+        get_room_data('nope')
+    with pytest.raises(CoopGameDoesNotExistError):
+        add_coop_guess('nope', 'Alice', 'qom', False)
@@ -0,0 +1,52 @@
+import logging
+
+from wiki_reveal.startup import ImportTime, Startup, parse_import_times
+
+IMPORT_TIMES = """import time: self [us] | cumulative | imported package
+import time:       196 |        196 |   wiki_reveal
+import time:       405 |     117983 |     flask
+import time:      2636 |       2844 |     wiki_reveal.payload
+import time:     32009 |     351834 | wiki_reveal.server
+"""
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_startup_warns_over_budget(caplog):
+    clock = Clock()
+    startup = Startup(budget=1, started=0, clock=clock)
+    clock.now = 1.5
+
+    with caplog.at_level(logging.INFO):
+        assert startup.imported() == 1.5
+    assert caplog.records[-1].levelno == logging.WARNING
+
+
+def test_startup_is_ready_once():
+    clock = Clock()
+    startup = Startup(budget=1, started=0, clock=clock)
+    clock.now = 0.5
+    startup.imported()
+    clock.now = 2
+    startup.ready()
+    clock.now = 3
+    startup.ready()
+
+    assert startup.to_json() == {
+        'budget': 1, 'imported': 0.5, 'readyAfter': 2,
+    }
+
+
+def test_parse_import_times():
+    assert parse_import_times(IMPORT_TIMES) == [
+        ImportTime('wiki_reveal', 1, 196, 196),
+        ImportTime('flask', 2, 405, 117983),
+        ImportTime('wiki_reveal.payload', 2, 2636, 2844),
+        ImportTime('wiki_reveal.server', 0, 32009, 351834),
+    ]
@@ -0,0 +1,108 @@
+from collections.abc import Iterator
+from random import Random
+
+import pytest  # type: ignore
+
+from wiki_reveal.parser import EQUATION_TAG, clean_lines
+from wiki_reveal.wiki import Token, tokenize, tokenizer
+
+
+def legacy_tokenize(data: str) -> Iterator[Token]:
+    """The original slicing tokenizer, kept as the reference output"""
+    data = clean_lines(data)
+    non_words = tokenizer.findall(data)
+    i = 0
+    non_words_count = len(non_words)
+
+    while data and i < non_words_count:
+        non_word = non_words[i]
+        nw_idx = data.index(non_word)
+
+        if nw_idx == 0:
+            yield (non_word, False)
+            data = data[len(non_word):]
+        else:
+            token = data[: nw_idx]
+            if EQUATION_TAG == token:
+                yield (None, False)
+            elif EQUATION_TAG in token:
+                for part in token.split(EQUATION_TAG):
+                    if part:
+                        yield (part, True)
+                    else:
+                        yield (None, False)
+            else:
+                yield (token, True)
+            yield (non_word, False)
+            data = data[nw_idx + len(non_word):]
+        i += 1
+
+    if data:
+        if EQUATION_TAG == data:
+            yield (None, False)
+        elif EQUATION_TAG in data:
+            for part in data.split(EQUATION_TAG):
+                if part:
+                    yield (part, True)
+                else:
+                    yield (None, False)
+        else:
+            yield (data, True)
+
+
+CORPUS = [
+    '',
+    ' ',
+    'Qom',
+    'Washing machine',
+    'Hello, world!',
+    '  leading and trailing  ',
+    'A washing machine (laundry machine, clothes washer, washer, or simply'
+    ' wash) is a home appliance used to wash laundry.',
+    'The term is mostly applied to machines that use water.\n\nDry cleaning'
+    ' uses alternative cleaning fluids.',
+    'Qom (Persian: قم‎ [ɢom] (listen)) is the seventh largest metropolis.',
+    'It lies 140 km (87 mi) by road southwest of Tehran — the capital.',
+    'x−y … z⋯w → v ˈstress "quoted" \'single\' `tick` 100°C 50%',
+    'The mean is\n{\\displaystyle \\mu ={\\frac {1}{n}}\\sum x_{i}}\nwhere n'
+    ' is the count.',
+    'Energy\nE\n=\nm\nc\n2\n{\\displaystyle E=mc^{2}}\n is famous.',
+    'Two {\\displaystyle a} and {\\displaystyle b} inline.',
+    'Unclosed {\\displaystyle {x',
+    'Ends with a block {\\displaystyle x}',
+    f'{EQUATION_TAG}',
+    f'pre{EQUATION_TAG}post',
+    f'{EQUATION_TAG}{EQUATION_TAG}',
+    f'word {EQUATION_TAG}tail, more{EQUATION_TAG}',
+    'Œuvre naïve café São Paulo Zürich Ærø',
+    'hyphen-ated en–dash em—dash non‑breaking',
+]
+
+
+def _fuzz_corpus(size: int = 200) -> list[str]:
+    rng = Random(42)
+    alphabet = [
+        'a', 'bc', 'Def', 'é', 'ø', '1', ' ', ', ', '. ', '\n', '\n\n', '(',
+        ')', '-', '—', '"', '\'', '/', '{', '}', '{\\displaystyle ',
+        '{\\frac ', 'x', '=', EQUATION_TAG, '∑', 'α', '\t', '…',
+    ]
+    return [
+        ''.join(rng.choices(alphabet, k=rng.randint(0, 60)))
+        for _ in range(size)
+    ]
+
+
+@pytest.mark.parametrize('text', CORPUS + _fuzz_corpus())
+def test_tokenize_matches_legacy(text: str):
+    assert list(tokenize(text)) == list(legacy_tokenize(text))
+
+
+def test_tokenize_long_article_matches_legacy():
+    text = '\n\n'.join(CORPUS) * 200
+    assert list(tokenize(text)) == list(legacy_tokenize(text))
+
+
+def test_tokenize_equation_tag():
+    assert list(tokenize(f'a {EQUATION_TAG} b')) == [
+        ('a', True), (' ', False), (None, False), (' ', False), ('b', True),
+    ]
@@ -0,0 +1,57 @@
+import pytest  # type: ignore
+
+from wiki_reveal.visitors import HyperLogLog, VisitorCounter, precision_for
+
+
+@pytest.mark.parametrize('error,precision', [
+    (0.5, 4),
+    (0.05, 9),
+    (0.01, 14),
+    (0.001, 16),
+])
+def test_precision_for(error, precision):
+    assert precision_for(error) == precision
+
+
+def test_hyperloglog_rejects_bad_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(3)
+
+
+@pytest.mark.parametrize('visitors', [0, 1, 10, 1000, 50000])
+def test_hyperloglog_estimate_within_error(visitors):
+    sketch = HyperLogLog(precision_for(0.01))
+    for i in range(visitors):
+        sketch.add(f'192.168.{i // 256}.{i % 256}')
+
+    assert abs(sketch.count() - visitors) <= max(1, 3 * sketch.error * visitors)
+
+
+def test_hyperloglog_ignores_repeats():
+    sketch = HyperLogLog(10)
+    for _ in range(100):
+        sketch.add('127.0.0.1')
+        sketch.add('10.0.0.1')
+
+    assert sketch.count() == 2
+
+
+def test_visitor_counter_separates_coop_and_games():
+    counter = VisitorCounter(error=0.05)
+    counter.add('a', False, 1)
+    counter.add('b', False, 1)
+    counter.add('a', False, 2)
+    counter.add('c', True)
+
+    assert counter.solo_counts() == {1: 2, 2: 1}
+    assert counter.coop_count() == 1
+
+
+def test_visitor_counter_rotates_old_games():
+    counter = VisitorCounter(error=0.05, keep_games=3)
+    for game_id in range(10):
+        counter.add('a', False, game_id)
+    counter.add('a', False, 2)
+
+    assert list(counter.solo_counts()) == [7, 8, 9]
+    assert counter.memory() == 4 * 2 ** 9
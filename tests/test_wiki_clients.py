@@ -0,0 +1,57 @@
+import pytest  # type: ignore
+
+from wiki_reveal import wiki, wiki_clients
+from wiki_reveal.wiki_clients import PooledWikipedia, client_stats, get_wiki
+
+from .wiki_stub import WikiStubServer
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with WikiStubServer() as server:
+        monkeypatch.setattr(wiki_clients, 'WIKI_API_URL', server.api_url)
+        wiki_clients.reset_clients()
+        yield server
+    wiki_clients.reset_clients()
+
+
+def test_get_wiki_shares_client_per_language(stub):
+    assert get_wiki('en') is get_wiki('en')
+    assert get_wiki('en') is not get_wiki('sv')
+
+
+def test_fetch_extract_reuses_connection(stub):
+    extract, revision = wiki.fetch_extract('Qom', 'en')
+    wiki.fetch_extract('Qom', 'en')
+
+    assert revision == 1234
+    assert extract['summary'] == 'Qom is the seventh largest city of Iran.'
+    assert extract['sections'][0]['title'] == 'History'
+    assert extract['sections'][0]['sections'][0]['text'] == (
+        'It was a settlement.'
+    )
+    assert stub.requests == 4
+    assert client_stats()['en'] == {
+        'requests': 4,
+        'connections': 1,
+        'reused': 3,
+        'replacedSessions': 0,
+    }
+
+
+def test_client_replaces_broken_session(stub):
+    stub.broken_responses = 1
+    client = PooledWikipedia('en', api_url=stub.api_url)
+
+    assert client.page('Qom').exists()
+    stats = client.stats()
+    assert stats.replaced_sessions == 1
+    assert stats.requests == 2
+    assert stats.connections == 2
+
+
+def test_fetch_extract_gives_up_after_replaced_session(stub):
+    stub.broken_responses = 2
+
+    with pytest.raises(wiki.NoSuchPageError):
+        wiki.fetch_extract('Qom', 'en')
@@ -0,0 +1,75 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+from time import sleep
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+EXTRACT = (
+    'Qom is the seventh largest city of Iran.\n\n'
+    '== History ==\nQom is an old city.\n\n'
+    '=== Early ===\nIt was a settlement.'
+)
+
+
+class WikiStubServer(ThreadingHTTPServer):
+    """A local stand-in for the MediaWiki query API"""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.requests = 0
+        self.broken_responses = 0
+        self.delay = 0.0
+        self.extract_repeat = 1
+        self._thread = Thread(
+            target=self.serve_forever,
+            kwargs={'poll_interval': 0.01},
+            daemon=True,
+        )
+
+    @property
+    def api_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/w/api.php'
+
+    def __enter__(self) -> 'WikiStubServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: WikiStubServer
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.server.requests += 1
+        if self.server.delay:
+            sleep(self.server.delay)
+
+        params = parse_qs(urlparse(self.path).query)
+        title = params['titles'][0]
+        page: dict[str, Any] = {'pageid': 7, 'ns': 0, 'title': title}
+        if params['prop'] == ['info']:
+            page['lastrevid'] = 1234
+        else:
+            page['extract'] = EXTRACT * self.server.extract_repeat
+
+        if self.server.broken_responses > 0:
+            self.server.broken_responses -= 1
+            body = b'<html>Bad gateway</html>'
+        else:
+            body = json.dumps({'query': {'pages': {'7': page}}}).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -1,5 +1,6 @@
 import { allowedWords } from '../data/allowedWords';
 import { LexicalizedToken, Page, Section } from '../types/wiki';
+import { HintCandidate, rankHints } from '../utils/hints';
 import { createLexicon } from '../utils/lexicon';
 import {
   splitParagraphs, trimSections, unmaskPage, unmaskTokens, wordAsLexicalEntry,
@@ -20,17 +21,75 @@ interface ResponsePage {
   sections: ResponseSection[];
 }
 
+interface CompactParagraph {
+  tokens: number[];
+  hidden: string;
+}
+
+interface CompactSection {
+  title: CompactParagraph;
+  depth: number;
+  paragraphs: CompactParagraph;
+  sections: CompactSection[];
+}
+
+interface CompactPage {
+  format: string;
+  strings: string[];
+  title: CompactParagraph;
+  summary: CompactParagraph;
+  sections: CompactSection[];
+}
+
+const NULL_TOKEN = -1;
+
+function decodeParagraph({ tokens, hidden }: CompactParagraph, strings: string[]): Token[] {
+  const bitmap = atob(hidden);
+  return tokens.map((idx, i) => [
+    idx === NULL_TOKEN ? null : strings[idx],
+    // eslint-disable-next-line no-bitwise
+    (bitmap.charCodeAt(i >> 3) & (1 << (i & 7))) !== 0,
+  ]);
+}
+
+function decodeSection({
+  title, depth, paragraphs, sections,
+}: CompactSection, strings: string[]): ResponseSection {
+  return {
+    title: decodeParagraph(title, strings),
+    depth,
+    paragraphs: decodeParagraph(paragraphs, strings),
+    sections: sections.map((section) => decodeSection(section, strings)),
+  };
+}
+
+function decodePage({
+  strings, title, summary, sections,
+}: CompactPage): ResponsePage {
+  return {
+    title: decodeParagraph(title, strings),
+    summary: decodeParagraph(summary, strings),
+    sections: sections.map((section) => decodeSection(section, strings)),
+  };
+}
+
 interface ResponseJSON {
   language: string;
   gameId: number;
   pageName: string;
-  page: ResponsePage;
+  page: CompactPage;
   start: string;
   end: string;
   yesterdaysTitle: Token[] | undefined;
   yesterdaysPage: string | undefined;
 }
 
+interface LexiconJSON {
+  gameId: number;
+  lexicon: Record<string, number>;
+  hints: HintCandidate[];
+}
+
 function lexicalizeToken([word, isHidden]: Token): LexicalizedToken {
   return [word, isHidden, isHidden ? wordAsLexicalEntry(word) : word];
 }
@@ -66,22 +125,35 @@ function gameModeToPath(gameMode: GameMode, room: null | string): string {
   throw new Error('Game mode not implemented');
 }
 
+// The server builds the lexicon once per game, without it we walk the page
+function getLexicon(gameMode: GameMode, room: string | null): Promise<LexiconJSON | null> {
+  return fetch(`${gameModeToPath(gameMode, room)}/lexicon`)
+    .then((result): Promise<LexiconJSON> | null => (result.ok ? result.json() : null))
+    .catch(() => null);
+}
+
 export function getPage(gameMode: GameMode, room: string | null) {
-  return fetch(gameModeToPath(gameMode, room))
+  const lexiconRequest = getLexicon(gameMode, room);
+  return fetch(`${gameModeToPath(gameMode, room)}?format=compact`)
     .then(((result): Promise<ResponseJSON> => {
       if (result.ok) return result.json();
       throw new Error('Failed to download page');
     }))
-    .then((data) => {
-      const page = transformPage(data.page);
+    .then((data) => Promise.all([data, lexiconRequest]))
+    .then(([data, lexiconData]) => {
+      const page = transformPage(decodePage(data.page));
       page.sections = trimSections(page.sections);
-      const lexicon = createLexicon(page);
       const freeWords = allowedWords[data.language] ?? [];
+      // Around the daily reset the two requests could be for different games
+      const known = lexiconData?.gameId === data.gameId ? lexiconData : null;
+      const lexicon = known?.lexicon ?? createLexicon(page);
+      const hintCandidates = known?.hints ?? rankHints(lexicon, freeWords);
       const freeWordsLookup: Record<string, true> = Object
         .fromEntries(freeWords.map((lex) => [lex, true]));
       return {
         page: unmaskPage(page, freeWordsLookup),
         lexicon,
+        hintCandidates,
         freeWords,
         gameId: data.gameId,
         pageName: data.pageName,
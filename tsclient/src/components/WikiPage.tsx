@@ -25,7 +25,7 @@ import RedactedPage from './RedactedPage';
 import { VictoryType } from './VictoryType';
 import useRevealedPage from '../hooks/useRevealedPage';
 import { UserSettings } from './menu/UserOptions';
-import { BORING_HINTS } from '../utils/hints';
+import { BORING_HINTS, HintCandidate } from '../utils/hints';
 import { CoopRoomSettings } from '../hooks/useCoop';
 import usePrevious from '../hooks/usePrevious';
 import GuessCloud from './GuessCloud';
@@ -46,6 +46,7 @@ interface WikiPageProps {
   isError: boolean;
   freeWords: string[] | undefined;
   lexicon: Record<string, number>,
+  hintCandidates: HintCandidate[],
   rankings: Record<string, number>,
   gameId: number | undefined;
   language: string | undefined;
@@ -153,7 +154,7 @@ function createVictory(
 }
 
 function WikiPage({
-  isLoading, isError, freeWords, lexicon, gameId, language, pageName, page,
+  isLoading, isError, freeWords, lexicon, hintCandidates, gameId, language, pageName, page,
   titleLexes, headingLexes, start, end, gameMode,
   rankings, summaryToReveal, username,
   coopUsers, coopGuesses, onCoopGuess, unmasked, coopRoom, coopRoomSettings,
@@ -512,9 +513,9 @@ function WikiPage({
     const maxCount = activeGuesses
       .filter(([word, isHint]) => !isHint && !BORING_HINTS.includes(word))
       .reduce((count, [word]) => Math.max(count, lexicon[word] ?? 0), 0);
-    const options = [...Object.keys(lexicon)]
-      .filter((word) => !activeGuesses.some(([w]) => w === word)
-        && !freeWords?.includes(word)
+    // Hints come ranked most common first
+    const options = hintCandidates
+      .filter(([word]) => !activeGuesses.some(([w]) => w === word)
         && !title.some(
           ([_, isHidden, lex]) => isHidden && (lex === word || wordDistance(lex, word) < 3),
         ));
@@ -525,13 +526,11 @@ function WikiPage({
     }
 
     const worthy = options
-      .filter(
-        (word) => (boringHints || !BORING_HINTS.includes(word)) && lexicon[word] >= maxCount,
-      )
-      .sort((a, b) => (lexicon[a] > lexicon[b] ? 1 : -1));
+      .filter(([, count, isBoring]) => (boringHints || !isBoring) && count >= maxCount)
+      .reverse();
 
     if (worthy.length > 0) {
-      const word = randomEntry(worthy.slice(0, 10));
+      const [word] = randomEntry(worthy.slice(0, 10));
       if (gameMode === 'coop') {
         onCoopGuess(word, true);
       } else {
@@ -541,12 +540,10 @@ function WikiPage({
       return;
     }
 
-    const remainingGood = options
-      .filter((word) => (boringHints || !BORING_HINTS.includes(word)))
-      .sort((a, b) => (lexicon[a] > lexicon[b] ? -1 : 1));
+    const remainingGood = options.filter(([, , isBoring]) => boringHints || !isBoring);
 
     if (remainingGood.length > 0) {
-      const word = randomEntry(remainingGood.slice(0, 10));
+      const [word] = randomEntry(remainingGood.slice(0, 10));
       if (gameMode === 'coop') {
         onCoopGuess(word, true);
       } else {
@@ -557,7 +554,7 @@ function WikiPage({
       return;
     }
 
-    const [boring] = options.sort((a, b) => (lexicon[a] > lexicon[b] ? -1 : 1));
+    const [[boring]] = options;
     if (gameMode === 'coop') {
       onCoopGuess(boring, true);
     } else {
@@ -565,8 +562,8 @@ function WikiPage({
     }
     enqueueSnackbar(`Boring hint: ${boring}`, { variant: 'info' });
   }, [
-    activeGuesses, lexicon, gameMode, freeWords, title, boringHints, onCoopGuess, onSetSoloGuesses,
-    enqueueSnackbar,
+    activeGuesses, lexicon, hintCandidates, gameMode, title, boringHints, onCoopGuess,
+    onSetSoloGuesses, enqueueSnackbar,
   ]);
 
   const progress = useMemo(
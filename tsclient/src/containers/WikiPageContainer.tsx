@@ -6,6 +6,7 @@ import { GameMode, getPage } from '../api/page';
 import WikiPage from '../components/WikiPage';
 import { Section } from '../types/wiki';
 import uniq from '../utils/uniq';
+import { HintCandidate } from '../utils/hints';
 import useStoredValue from '../hooks/useStoredValue';
 import useCoop, { CoopGameType, CoopRoomSettings, ExpireType } from '../hooks/useCoop';
 import { VictoryType } from '../components/VictoryType';
@@ -114,9 +115,9 @@ function WikiPageContainer(): JSX.Element {
   }, [enqueueSnackbar, gameMode]);
 
   const {
-    page, freeWords, lexicon, gameId, language, pageName, yesterdaysTitle,
+    page, freeWords, lexicon, hintCandidates, gameId, language, pageName, yesterdaysTitle,
     yesterdaysPage, start, end,
-  } = data ?? { lexicon: {} as Record<string, number> };
+  } = data ?? { lexicon: {} as Record<string, number>, hintCandidates: [] as HintCandidate[] };
 
   const rankings = React.useMemo(() => {
     const sorted: Array<[string, number]> = [...Object.entries(lexicon)]
@@ -306,6 +307,7 @@ function WikiPageContainer(): JSX.Element {
         isError={isError}
         freeWords={freeWords}
         lexicon={lexicon}
+        hintCandidates={hintCandidates}
         rankings={rankings}
         gameId={gameId}
         language={language}
@@ -1,3 +1,4 @@
+import { decode } from '@msgpack/msgpack';
 import { useSnackbar } from 'notistack';
 import {
   useCallback, useEffect, useRef, useState,
@@ -20,6 +21,7 @@ interface MessageRename {
   type: 'RENAME';
   from: string | null;
   to: string;
+  epoch?: string;
 }
 
 interface MessageRenameMe {
@@ -33,12 +35,14 @@ interface MessageCreate {
   username: string;
   backlog: Array<[string, string, boolean]>,
   settings: CoopRoomSettings,
+  epoch?: string;
 }
 
 interface MessageJoinLeave {
   type: 'JOIN' | 'LEAVE';
   name: string | null;
-  users: string[];
+  // Left out of all but the last join or leave in a batch
+  users?: string[];
 }
 
 interface MessageLeaveMe {
@@ -49,8 +53,11 @@ interface MessageJoinMe {
   type: 'JOIN-ME';
   room: string;
   users: string[];
+  // Starts at sinceIndex, the guesses before it the client already has
   backlog: Array<[string, string, boolean]>,
   settings: CoopRoomSettings,
+  epoch?: string;
+  sinceIndex?: number;
 }
 
 interface MessageJoinFail {
@@ -66,6 +73,15 @@ interface MessageGuess {
   isHint: boolean;
 }
 
+// Binary clients get guesses as [type, index, lex, username, isHint]
+type CompactGuess = ['G', number, string, string, boolean];
+
+interface MessageBatch {
+  type: 'BATCH',
+  // eslint-disable-next-line no-use-before-define
+  messages: Array<Message | CompactGuess>;
+}
+
 type Message = MessageCreate
   | MessageJoinLeave
   | MessageJoinFail
@@ -73,7 +89,20 @@ type Message = MessageCreate
   | MessageJoinMe
   | MessageRename
   | MessageRenameMe
-  | MessageGuess;
+  | MessageGuess
+  | MessageBatch;
+
+type WireMessage = Message | CompactGuess | ArrayBuffer;
+
+function fromWire(data: WireMessage): Message {
+  const message = data instanceof ArrayBuffer ? decode(data) as Message | CompactGuess : data;
+  if (!Array.isArray(message)) return message;
+
+  const [, index, lex, username, isHint] = message;
+  return {
+    type: 'GUESS', index, lex, username, isHint,
+  };
+}
 
 interface Coop {
   connected: boolean;
@@ -98,6 +127,12 @@ interface Coop {
   roomSettings: CoopRoomSettings | null,
 }
 
+// Number of guesses known without gaps, where a resumed backlog can start
+function resumeIndex(guesses: Guess[]): number {
+  const gap = guesses.findIndex(([lex]) => lex === '');
+  return gap < 0 ? guesses.length : gap;
+}
+
 function useCoop(gameMode: GameMode): Coop {
   const { endTransaction } = useTransaction();
   const { enqueueSnackbar } = useSnackbar();
@@ -105,6 +140,7 @@ function useCoop(gameMode: GameMode): Coop {
   const inRoomRef = useRef(false);
   const usersRef = useRef<string[] | null>(null);
   const guessesRef = useRef<Guess[]>([]);
+  const epochRef = useRef<string | null>(null);
   const connectedRef = useRef<boolean>(false);
   const roomSettingsRef = useRef<CoopRoomSettings | null>(null);
   const [usernameRef, setUsername] = useStoredRef<string | null>('coop-name', null);
@@ -175,6 +211,7 @@ function useCoop(gameMode: GameMode): Coop {
     usersRef.current = null;
     setRoom(newRoom);
     guessesRef.current = [];
+    epochRef.current = null;
     socket?.emit(
       'join',
       { username: usernameRef.current, room: newRoom },
@@ -227,7 +264,8 @@ function useCoop(gameMode: GameMode): Coop {
     const path = fullPath.slice(host.length);
     // eslint-disable-next-line no-console
     console.log('Attempting WS at', host, path);
-    const newSocket = io(host, { path });
+    // The server answers in MessagePack if it can, else in JSON
+    const newSocket = io(host, { path, auth: { codec: 'msgpack' } });
     setSocket(newSocket);
 
     newSocket.on('connect', () => {
@@ -236,7 +274,12 @@ function useCoop(gameMode: GameMode): Coop {
       if (roomRef.current !== null && reconnect) {
         newSocket.emit(
           'join',
-          { username: usernameRef.current, room: roomRef.current },
+          {
+            username: usernameRef.current,
+            room: roomRef.current,
+            sinceIndex: resumeIndex(guessesRef.current),
+            epoch: epochRef.current,
+          },
         );
       }
       endTransaction();
@@ -255,7 +298,8 @@ function useCoop(gameMode: GameMode): Coop {
   useEffect((): void => {
     if (socket === null) return;
 
-    const messageHandler = (message: Message) => {
+    const messageHandler = (data: WireMessage) => {
+      const message = fromWire(data);
       switch (message.type) {
         case 'CREATE':
           enqueueSnackbar('Created new COOP game', { variant: 'info' });
@@ -270,12 +314,13 @@ function useCoop(gameMode: GameMode): Coop {
           }
           inRoomRef.current = true;
           guessesRef.current = message.backlog.map(([lex, user, isHint]) => [lex, isHint, user]);
+          epochRef.current = message.epoch ?? null;
           roomSettingsRef.current = message.settings;
           endTransaction();
           break;
 
         case 'LEAVE':
-          usersRef.current = message.users;
+          if (message.users !== undefined) usersRef.current = message.users;
           enqueueSnackbar(
             `${message.name} left the COOP game`,
             { variant: 'info' },
@@ -286,6 +331,7 @@ function useCoop(gameMode: GameMode): Coop {
         case 'LEAVE-ME':
           setRoom(null);
           usersRef.current = null;
+          epochRef.current = null;
           enqueueSnackbar(
             'You left the COOP game',
             { variant: 'info' },
@@ -299,7 +345,7 @@ function useCoop(gameMode: GameMode): Coop {
             `${message.name} joined the COOP game`,
             { variant: 'info' },
           );
-          usersRef.current = message.users;
+          if (message.users !== undefined) usersRef.current = message.users;
           endTransaction();
           break;
 
@@ -311,7 +357,11 @@ function useCoop(gameMode: GameMode): Coop {
           setRoom(message.room);
           usersRef.current = message.users;
           inRoomRef.current = true;
-          guessesRef.current = message.backlog.map(([lex, user, isHint]) => [lex, isHint, user]);
+          guessesRef.current = [
+            ...guessesRef.current.slice(0, message.sinceIndex ?? 0),
+            ...message.backlog.map(([lex, user, isHint]): Guess => [lex, isHint, user]),
+          ];
+          epochRef.current = message.epoch ?? null;
           roomSettingsRef.current = message.settings;
           endTransaction();
           break;
@@ -327,6 +377,7 @@ function useCoop(gameMode: GameMode): Coop {
             `User "${message.from}" is now known as "${message.to}"`,
             { variant: 'info' },
           );
+          if (message.epoch !== undefined) epochRef.current = message.epoch;
           if (message.from !== null && message.to !== null) {
             guessesRef.current = guessesRef.current.map(([lex, isHint, user]) => [
               lex,
@@ -353,6 +404,10 @@ function useCoop(gameMode: GameMode): Coop {
           endTransaction();
           break;
 
+        case 'BATCH':
+          message.messages.forEach(messageHandler);
+          break;
+
         default:
           // eslint-disable-next-line no-console
           console.warn('unhandled coop-message', message);
@@ -1,3 +1,6 @@
+// Lexical entry, number of times hidden on page and if it is boring
+export type HintCandidate = [lex: string, count: number, isBoring: boolean];
+
 export const BORING_HINTS: string[] = [
   's',
 
@@ -49,3 +52,14 @@ export const BORING_HINTS: string[] = [
   'would',
   'however',
 ];
+
+// Same ranking as the server's lexicon: most common first, free words left out
+export function rankHints(
+  lexicon: Record<string, number>,
+  freeWords: string[],
+): HintCandidate[] {
+  return Object.entries(lexicon)
+    .filter(([word]) => !freeWords.includes(word))
+    .sort(([a, aCount], [b, bCount]) => bCount - aCount || (a < b ? -1 : 1))
+    .map(([word, count]) => [word, count, BORING_HINTS.includes(word)]);
+}
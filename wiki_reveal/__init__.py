@@ -0,0 +1,4 @@
+from time import monotonic
+
+# Taken before any module of the app so startup can be timed from here
+IMPORT_STARTED = monotonic()
@@ -0,0 +1,296 @@
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import gzip
+from hashlib import sha256
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Iterable, Optional
+
+from wiki_reveal.exceptions import ArchiveError, WikiError
+from wiki_reveal.game_id import get_start_and_end
+from wiki_reveal.nicer_random import get_order_key
+from wiki_reveal.payload import encode_json
+from wiki_reveal.wiki import get_game_page_name, load_page
+
+# Bump when the bundle contents change so old archives are rebuilt
+ARCHIVE_VERSION = 1
+ARCHIVE_GZIP_LEVEL = 9
+
+# magic, version, order key, first game id, number of games
+_HEADER = struct.Struct('<4sH16sII')
+_MAGIC = b'WRAR'
+# The first bytes of the bundle's sha256, all zero for a missing game
+_DIGEST_SIZE = 16
+_MISSING = bytes(_DIGEST_SIZE)
+
+
+def bundle_path(root: str, digest: bytes) -> str:
+    name = digest.hex()
+    return os.path.join(root, 'bundles', name[:2], f'{name}.json.gz')
+
+
+def index_path(root: str, language: str) -> str:
+    return os.path.join(root, f'{language}.index')
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+@dataclass
+class BuiltGame:
+    game_id: int
+    page_name: Optional[str]
+    digest: bytes
+    size: int
+    error: Optional[str] = None
+
+
+def build_game(root: str, language: str, game_id: int) -> BuiltGame:
+    """Writes one game's payload as a gzipped bundle named by its content"""
+    page_name = None
+    try:
+        page_name = get_game_page_name(game_id)
+        page = load_page(page_name, language)
+
+        start, end = get_start_and_end(game_id)
+        body = encode_json({
+            'language': language,
+            'gameId': game_id,
+            'pageName': page_name,
+            'page': page.to_json(),
+            'start': start,
+            'end': end,
+            'archiveVersion': ARCHIVE_VERSION,
+        })
+        digest = sha256(body).digest()[:_DIGEST_SIZE]
+        path = bundle_path(root, digest)
+        if not os.path.exists(path):
+            _write_atomic(
+                path, gzip.compress(body, ARCHIVE_GZIP_LEVEL, mtime=0),
+            )
+    # Failed requests are OSErrors too, a game failing must not stop the
+    # rest of the range from being indexed
+    except (WikiError, OSError) as error:
+        logging.warning(f'Could not archive game {game_id}: {error!r}')
+        return BuiltGame(
+            game_id, page_name, _MISSING, 0, error.__class__.__name__,
+        )
+    return BuiltGame(game_id, page_name, digest, len(body))
+
+
+def _build_one(job: tuple[str, str, int]) -> BuiltGame:
+    return build_game(*job)
+
+
+def read_index(path: str) -> tuple[str, dict[int, bytes]]:
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    magic, version, key, first, count = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != ARCHIVE_VERSION:
+        return '', {}
+    return key.decode(), {
+        first + i: data[
+            _HEADER.size + i * _DIGEST_SIZE:
+            _HEADER.size + (i + 1) * _DIGEST_SIZE
+        ]
+        for i in range(count)
+    }
+
+
+def write_index(path: str, order_key: str, digests: dict[int, bytes]) -> None:
+    first = min(digests, default=0)
+    count = max(digests, default=-1) - first + 1
+    _write_atomic(path, b''.join((
+        _HEADER.pack(
+            _MAGIC, ARCHIVE_VERSION, order_key.encode(), first, count,
+        ),
+        *(digests.get(first + i, _MISSING) for i in range(count)),
+    )))
+
+
+def build_archive(
+    root: str,
+    language: str,
+    game_ids: Iterable[int],
+    workers: int = 0,
+) -> list[BuiltGame]:
+    """Builds the games in a process pool and merges them into the index
+
+    Games already in an index built for the same order are kept, so the
+    archive can be extended a range at a time.
+    """
+    order_key = get_order_key()
+    jobs = [(root, language, game_id) for game_id in game_ids]
+    if workers > 0:
+        with ProcessPoolExecutor(workers) as pool:
+            built = list(pool.map(_build_one, jobs, chunksize=4))
+    else:
+        built = [_build_one(job) for job in jobs]
+
+    digests: dict[int, bytes] = {}
+    path = index_path(root, language)
+    if os.path.exists(path):
+        key, digests = read_index(path)
+        if key != order_key:
+            logging.warning(f'Replacing index {path} built for another order')
+            digests = {}
+    for game in built:
+        if game.digest != _MISSING or game.game_id not in digests:
+            digests[game.game_id] = game.digest
+    write_index(path, order_key, digests)
+    write_manifest(root, language, order_key, built)
+    return built
+
+
+def write_manifest(
+    root: str,
+    language: str,
+    order_key: str,
+    built: list[BuiltGame],
+) -> None:
+    path = os.path.join(root, 'manifest.json')
+    manifest: dict[str, Any] = {'version': ARCHIVE_VERSION, 'languages': {}}
+    if os.path.exists(path):
+        with open(path) as fh:
+            previous = json.load(fh)
+        if previous.get('version') == ARCHIVE_VERSION:
+            manifest = previous
+
+    entry = manifest['languages'].get(language)
+    if entry is None or entry['orderKey'] != order_key:
+        entry = {'orderKey': order_key, 'games': {}}
+    for game in built:
+        if game.digest == _MISSING and str(game.game_id) in entry['games']:
+            continue
+        entry['games'][str(game.game_id)] = {
+            'pageName': game.page_name,
+            'bundle': game.digest.hex() if game.digest != _MISSING else None,
+            'size': game.size,
+            'error': game.error,
+        }
+    manifest['languages'][language] = entry
+    _write_atomic(path, json.dumps(manifest, indent=2).encode())
+
+
+@dataclass
+class ArchivedGame:
+    etag: str
+    gzip: bytes
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        return self.etag if encoding is None else f'{self.etag}-{encoding}'
+
+
+class Archive:
+    """Reads bundles through the memory mapped game index of a language"""
+
+    def __init__(self, root: str, language: str, order_key: str):
+        self.root = root
+        self.language = language
+        with open(index_path(root, language), 'rb') as fh:
+            self._index = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, key, first, count = _HEADER.unpack_from(self._index)
+        if magic != _MAGIC or version != ARCHIVE_VERSION:
+            raise ArchiveError(f'Archive index version {version} is unknown')
+        if key.decode() != order_key:
+            raise ArchiveError('Archive was built for another game order')
+        self.first = first
+        self.count = count
+
+    def get(self, game_id: int) -> Optional[ArchivedGame]:
+        i = game_id - self.first
+        if not 0 <= i < self.count:
+            return None
+        offset = _HEADER.size + i * _DIGEST_SIZE
+        digest = self._index[offset:offset + _DIGEST_SIZE]
+        if digest == _MISSING:
+            return None
+        try:
+            with open(bundle_path(self.root, digest), 'rb') as fh:
+                return ArchivedGame(digest.hex(), fh.read())
+        except FileNotFoundError:
+            logging.error(f'Archive bundle of game {game_id} is missing')
+            return None
+
+
+_archives: dict[str, tuple[int, Optional[Archive]]] = {}
+
+
+def get_archive(language: str) -> Optional[Archive]:
+    """The language's archive, reopened when a build replaces its index"""
+    root = os.environ.get('WR_ARCHIVE')
+    if not root:
+        return None
+    try:
+        modified = os.stat(index_path(root, language)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    known = _archives.get(language)
+    if known is not None and known[0] == modified:
+        return known[1]
+
+    archive: Optional[Archive] = None
+    try:
+        archive = Archive(root, language, get_order_key())
+        logging.info(
+            f'Using archive at {root} with {archive.count} {language} games',
+        )
+    except ArchiveError:
+        logging.exception(f'Not using the archive at {root}')
+    _archives[language] = (modified, archive)
+    return archive
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = ArgumentParser(
+        prog='python -m wiki_reveal.archive',
+        description='Build the static archive of game payloads',
+    )
+    parser.add_argument(
+        '--path',
+        default=os.environ.get('WR_ARCHIVE'),
+        help='Archive directory (default: $WR_ARCHIVE)',
+    )
+    parser.add_argument('--language', default='en')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Processes building games, 0 builds in this process',
+    )
+    parser.add_argument('first', type=int, help='First game id')
+    parser.add_argument('last', type=int, help='Last game id, inclusive')
+    args = parser.parse_args(argv)
+
+    if not args.path:
+        parser.error('No archive given, use --path or set WR_ARCHIVE')
+    if args.last < args.first:
+        parser.error('Last game id is before the first')
+
+    built = build_archive(
+        args.path,
+        args.language,
+        range(args.first, args.last + 1),
+        args.workers,
+    )
+    failed = [game for game in built if game.error is not None]
+    for game in failed:
+        print(f'{game.game_id}\t{game.page_name}\t{game.error}')
+    print(f'Built {len(built) - len(failed)} of {len(built)} games')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import logging
+import os
+from threading import Lock
+from typing import Any, Callable
+
+BATCH_INTERVAL = float(os.environ.get('WR_BATCH_MS', 0)) / 1000
+BATCH_MAX = int(os.environ.get('WR_BATCH_MAX', 64))
+
+Message = dict[str, Any]
+
+
+def coalesce(messages: list[Message]) -> Message:
+    """Wraps messages in one BATCH, only the last user list is kept"""
+    if len(messages) == 1:
+        return messages[0]
+
+    last_users = max(
+        (i for i, m in enumerate(messages) if 'users' in m),
+        default=None,
+    )
+    return {
+        'type': 'BATCH',
+        'messages': [
+            message if i == last_users or 'users' not in message
+            else {k: v for k, v in message.items() if k != 'users'}
+            for i, message in enumerate(messages)
+        ],
+    }
+
+
+class RoomBroadcaster:
+    """Queues room messages and sends each room's queue as one message
+
+    Queues are flushed every `interval` seconds, which is then the most a
+    message is delayed, or as soon as `max_messages` are waiting. With an
+    interval of 0 every message is sent right away.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Message, str], Any],
+        interval: float = BATCH_INTERVAL,
+        max_messages: int = BATCH_MAX,
+    ):
+        self.send = send
+        self.interval = interval
+        self.max_messages = max_messages
+        self._queues: dict[str, list[Message]] = {}
+        self._lock = Lock()
+        self.messages = 0
+        self.sent = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def broadcast(self, message: Message, room: str) -> None:
+        self.messages += 1
+        if not self.enabled:
+            self._send(message, room)
+            return
+
+        with self._lock:
+            queue = self._queues.setdefault(room, [])
+            queue.append(message)
+            if len(queue) < self.max_messages:
+                return
+            del self._queues[room]
+        self._send(coalesce(queue), room)
+
+    def _send(self, message: Message, room: str) -> None:
+        self.sent += 1
+        try:
+            self.send(message, room)
+        except Exception:
+            logging.exception(f'Failed to send to room {room}')
+
+    def flush(self) -> None:
+        with self._lock:
+            queues, self._queues = self._queues, {}
+        for room, queue in queues.items():
+            self._send(coalesce(queue), room)
+
+    def flush_room(self, room: str) -> None:
+        with self._lock:
+            queue = self._queues.pop(room, None)
+        if queue:
+            self._send(coalesce(queue), room)
+
+    def run(self, sleep: Callable[[float], Any]) -> None:
+        while True:
+            sleep(self.interval)
+            self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'intervalMs': self.interval * 1000,
+            'messages': self.messages,
+            'sent': self.sent,
+        }
@@ -0,0 +1,218 @@
+from collections import OrderedDict
+from functools import update_wrapper, wraps
+import os
+from threading import Event, Lock
+from typing import (
+    Any, Callable, Generic, Hashable, Iterable, NamedTuple, Optional,
+    TypeVar, cast,
+)
+
+from wiki_reveal.exceptions import SingleFlightTimeoutError
+
+T = TypeVar('T')
+
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('WR_SINGLE_FLIGHT_TIMEOUT', 30))
+
+
+def make_key(args: tuple[Any, ...], kwargs: dict[str, Any]) -> Hashable:
+    if not kwargs:
+        return args
+    return (args, tuple(sorted(kwargs.items())))
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class PinnableCache(Generic[T]):
+    """An lru cache where some entries can be pinned to never be evicted"""
+
+    def __init__(self, func: Callable[..., T], maxsize: int):
+        self._func = func
+        self.maxsize = maxsize
+        self._cached: OrderedDict[Hashable, T] = OrderedDict()
+        self._lock = Lock()
+        self._pinned: dict[Hashable, T] = {}
+        self._hits = 0
+        self._misses = 0
+        update_wrapper(self, func)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> T:
+        key = make_key(args, kwargs)
+        try:
+            return self._pinned[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if key in self._cached:
+                self._hits += 1
+                self._cached.move_to_end(key)
+                return self._cached[key]
+            self._misses += 1
+
+        value = self._func(*args, **kwargs)
+        with self._lock:
+            self._cached[key] = value
+            self._cached.move_to_end(key)
+            while len(self._cached) > self.maxsize:
+                self._cached.popitem(last=False)
+        return value
+
+    def pin(self, *args: Any, **kwargs: Any) -> T:
+        value = self(*args, **kwargs)
+        self._pinned[make_key(args, kwargs)] = value
+        return value
+
+    def is_pinned(self, *args: Any, **kwargs: Any) -> bool:
+        return make_key(args, kwargs) in self._pinned
+
+    def is_cached(self, *args: Any, **kwargs: Any) -> bool:
+        """If the entry is there, pinned or not, without computing it"""
+        key = make_key(args, kwargs)
+        return key in self._pinned or key in self._cached
+
+    def unpin_all(self) -> None:
+        self._pinned.clear()
+
+    def pinned(self) -> int:
+        return len(self._pinned)
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(
+            self._hits, self._misses, self.maxsize, len(self._cached),
+        )
+
+    def cache_clear(self) -> None:
+        self._pinned.clear()
+        with self._lock:
+            self._cached.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+class PinSet:
+    """Pins for several caches that replace their current pins together
+
+    Entries are computed, or taken from the current pins, while the old
+    pins keep serving. If anything fails before `swap`, nothing changes.
+    """
+
+    def __init__(self, caches: Iterable[PinnableCache[Any]]):
+        self._pins: dict[PinnableCache[Any], dict[Hashable, Any]] = {
+            cache: {} for cache in caches
+        }
+
+    def pin(self, cache: PinnableCache[T], *args: Any, **kwargs: Any) -> T:
+        value = cache(*args, **kwargs)
+        self._pins[cache][make_key(args, kwargs)] = value
+        return value
+
+    def swap(self) -> None:
+        for cache, pins in self._pins.items():
+            cache._pinned = pins
+
+
+def pinnable_lru_cache(
+    maxsize: int = 128,
+) -> Callable[[Callable[..., T]], PinnableCache[T]]:
+    def decorator(func: Callable[..., T]) -> PinnableCache[T]:
+        return PinnableCache(func, maxsize)
+
+    return decorator
+
+
+class _Flight(Generic[T]):
+    def __init__(self) -> None:
+        self.done = Event()
+        self.value: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[T]):
+    """Lets concurrent callers with the same key share one computation
+
+    The first caller runs the function, everyone else arriving before it
+    finishes waits for and gets the same result or exception.
+    """
+
+    def __init__(self, timeout: Optional[float] = SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self._lock = Lock()
+        self._flights: dict[Hashable, _Flight[T]] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(
+        self,
+        key: Hashable,
+        func: Callable[..., T],
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                self.timeouts += 1
+                raise SingleFlightTimeoutError
+            if flight.error is not None:
+                raise flight.error
+            return cast(T, flight.value)
+
+        try:
+            flight.value = func(*args, **kwargs)
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'timeouts': self.timeouts,
+            'inFlight': self.in_flight(),
+        }
+
+
+SINGLE_FLIGHTS: dict[str, SingleFlight] = {}
+
+
+def single_flight(
+    timeout: Optional[float] = SINGLE_FLIGHT_TIMEOUT,
+) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        flight: SingleFlight[T] = SingleFlight(timeout)
+        SINGLE_FLIGHTS[func.__name__] = flight
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            return flight.do(make_key(args, kwargs), func, *args, **kwargs)
+
+        setattr(wrapper, 'flight', flight)
+        return wrapper
+
+    return decorator
+
+
+def single_flight_stats() -> dict[str, dict[str, int]]:
+    return {name: flight.stats() for name, flight in SINGLE_FLIGHTS.items()}
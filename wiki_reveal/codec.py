@@ -0,0 +1,61 @@
+from typing import Any, Optional, Union
+
+try:
+    import msgpack  # type: ignore
+except ImportError:
+    msgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+CODECS: tuple[str, ...] = (JSON, MSGPACK) if msgpack is not None else (JSON,)
+
+# GUESS is by far the most sent message, binary clients get it as
+# ['G', index, lex, username, isHint]
+COMPACT_GUESS = 'G'
+
+Message = dict[str, Any]
+
+
+def client_codec(auth: Any) -> str:
+    """The codec a client asked for when connecting, if the server has it"""
+    codec = auth.get('codec') if isinstance(auth, dict) else None
+    return codec if codec in CODECS else JSON
+
+
+def codec_room(room: str, codec: str) -> str:
+    """Members of a room are split by codec, JSON clients use the room"""
+    return room if codec == JSON else f'{room}~{codec}'
+
+
+def base_room(name: str) -> str:
+    return name.split('~', 1)[0]
+
+
+def room_variants(room: str) -> list[str]:
+    return [codec_room(room, codec) for codec in CODECS]
+
+
+def compact_message(message: Message) -> Union[Message, list[Any]]:
+    if message['type'] == 'GUESS':
+        return [
+            COMPACT_GUESS,
+            message['index'],
+            message['lex'],
+            message['username'],
+            message['isHint'],
+        ]
+    if message['type'] == 'BATCH':
+        return {
+            'type': 'BATCH',
+            'messages': [compact_message(m) for m in message['messages']],
+        }
+    return message
+
+
+def encode_message(
+    message: Message,
+    codec: Optional[str],
+) -> Union[Message, bytes]:
+    if codec == MSGPACK:
+        return msgpack.packb(compact_message(message))
+    return message
@@ -0,0 +1,104 @@
+from base64 import b64decode, b64encode
+from typing import Any, Optional
+
+from wiki_reveal.wiki import Page, Paragraph, Section
+
+COMPACT_FORMAT = 'compact-1'
+COMPACT_MIMETYPE = 'application/vnd.wiki-reveal.compact+json'
+NULL_TOKEN = -1
+
+COMMON_SEPARATORS: tuple[str, ...] = (
+    ' ', ', ', '. ', '\n', '.\n', '\n\n', '.\n\n', ' (', ') ', '), ', '-',
+    '\'', '"', ' "', '" ', ': ', '; ', '.', ',',
+)
+
+
+class StringTable:
+    """Per-page table of token strings, common separators always first"""
+
+    def __init__(self) -> None:
+        self.strings: list[str] = list(COMMON_SEPARATORS)
+        self._index: dict[str, int] = {
+            s: i for i, s in enumerate(self.strings)
+        }
+
+    def lookup(self, token: Optional[str]) -> int:
+        if token is None:
+            return NULL_TOKEN
+        idx = self._index.get(token)
+        if idx is None:
+            idx = len(self.strings)
+            self.strings.append(token)
+            self._index[token] = idx
+        return idx
+
+
+def encode_bitmap(flags: list[bool]) -> str:
+    bitmap = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return b64encode(bitmap).decode()
+
+
+def decode_bitmap(bitmap: str, length: int) -> list[bool]:
+    data = b64decode(bitmap)
+    return [bool(data[i >> 3] & (1 << (i & 7))) for i in range(length)]
+
+
+def encode_paragraph(
+    paragraph: Paragraph,
+    table: StringTable,
+) -> dict[str, Any]:
+    return {
+        'tokens': [table.lookup(token) for token, _ in paragraph],
+        'hidden': encode_bitmap([is_hidden for _, is_hidden in paragraph]),
+    }
+
+
+def encode_section(section: Section, table: StringTable) -> dict[str, Any]:
+    return {
+        'title': encode_paragraph(section.title, table),
+        'depth': section.depth,
+        'paragraphs': encode_paragraph(section.paragraphs, table),
+        'sections': [encode_section(s, table) for s in section.sections],
+    }
+
+
+def encode_page(page: Page) -> dict[str, Any]:
+    table = StringTable()
+    encoded = {
+        'title': encode_paragraph(page.title, table),
+        'summary': encode_paragraph(page.summary, table),
+        'sections': [encode_section(s, table) for s in page.sections],
+    }
+    return {'format': COMPACT_FORMAT, 'strings': table.strings, **encoded}
+
+
+def decode_paragraph(data: dict[str, Any], strings: list[str]) -> Paragraph:
+    tokens = data['tokens']
+    return tuple(
+        (None if idx == NULL_TOKEN else strings[idx], is_hidden)
+        for idx, is_hidden in zip(
+            tokens,
+            decode_bitmap(data['hidden'], len(tokens)),
+        )
+    )
+
+
+def decode_section(data: dict[str, Any], strings: list[str]) -> Section:
+    return Section(
+        title=decode_paragraph(data['title'], strings),
+        depth=data['depth'],
+        paragraphs=decode_paragraph(data['paragraphs'], strings),
+        sections=tuple(decode_section(s, strings) for s in data['sections']),
+    )
+
+
+def decode_page(data: dict[str, Any]) -> Page:
+    strings = data['strings']
+    return Page(
+        title=decode_paragraph(data['title'], strings),
+        summary=decode_paragraph(data['summary'], strings),
+        sections=tuple(decode_section(s, strings) for s in data['sections']),
+    )
@@ -16,3 +16,27 @@ class FailedToSelectPageError(WikiError):
 
 class CoopGameDoesNotExistError(WikiError):
     pass
+
+
+class SingleFlightTimeoutError(WikiError):
+    pass
+
+
+class OffloadError(WikiError):
+    pass
+
+
+class OffloadQueueFullError(OffloadError):
+    pass
+
+
+class OffloadTimeoutError(OffloadError):
+    pass
+
+
+class RespError(WikiError):
+    pass
+
+
+class ArchiveError(WikiError):
+    pass
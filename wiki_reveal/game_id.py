@@ -30,3 +30,12 @@ def get_start_of_current() -> datetime:
 
 def get_end_of_current() -> datetime:
     return get_start_of_current() + timedelta(days=1) + timedelta(seconds=NIGHT_RESET_OFFSET)
+
+
+def get_start_of_next() -> datetime:
+    return get_start_of_current() + timedelta(days=1)
+
+
+def get_start_of_game(game_id: int) -> datetime:
+    epoch = datetime.fromisoformat(START_DATE)
+    return epoch + timedelta(days=game_id, seconds=NIGHT_RESET_OFFSET)
@@ -0,0 +1,142 @@
+from argparse import ArgumentParser
+from functools import cache
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Optional, Union
+
+from wiki_reveal.exceptions import FailedToSelectPageError
+from wiki_reveal.nicer_random import get_order_key, randomize_titles
+
+ORDER_VERSION = 1
+
+# magic, version, order key, number of titles
+_HEADER = struct.Struct('<4sH16sI')
+_MAGIC = b'WROI'
+# Title i is table[offsets[i]:offsets[i + 1]], the table is utf-8
+_OFFSET = struct.Struct('<I')
+
+
+def encode_order(order_key: str, titles: list[str]) -> bytes:
+    encoded = [title.encode() for title in titles]
+    offsets = [0]
+    for title in encoded:
+        offsets.append(offsets[-1] + len(title))
+    return b''.join((
+        _HEADER.pack(_MAGIC, ORDER_VERSION, order_key.encode(), len(titles)),
+        struct.pack(f'<{len(offsets)}I', *offsets),
+        *encoded,
+    ))
+
+
+class GameOrder:
+    """The shuffled titles, read one at a time from an encoded index"""
+
+    def __init__(self, data: Union[bytes, mmap.mmap], order_key: str):
+        magic, version, key, count = _HEADER.unpack_from(data)
+        if (
+            magic != _MAGIC
+            or version != ORDER_VERSION
+            or key.decode() != order_key
+        ):
+            raise ValueError('Game order index is outdated')
+        self._data = data
+        self._count = count
+        self._table = _HEADER.size + (count + 1) * _OFFSET.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        start, end = struct.unpack_from(
+            '<2I', self._data, _HEADER.size + i * _OFFSET.size,
+        )
+        return self._data[self._table + start:self._table + end].decode()
+
+
+def order_path(directory: str, order_key: str) -> str:
+    return os.path.join(directory, f'game-order-{order_key}.index')
+
+
+def _open(path: str, order_key: str) -> Optional[GameOrder]:
+    try:
+        with open(path, 'rb') as fh:
+            data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return GameOrder(data, order_key)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def build_order(directory: str) -> str:
+    """Shuffles the catalog and writes the order where it is looked for"""
+    order_key = get_order_key()
+    path = order_path(directory, order_key)
+    os.makedirs(directory, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(encode_order(order_key, randomize_titles()))
+    os.replace(tmp, path)
+    return path
+
+
+def _order_directory() -> str:
+    return os.environ.get('WR_ORDER_INDEX') or tempfile.gettempdir()
+
+
+@cache
+def get_game_order() -> GameOrder:
+    """Maps the stored order, shuffling the catalog only the first time
+
+    The index is keyed by seed and catalog so a changed catalog or seed is
+    shuffled anew. Without a writable directory the order is kept in memory.
+    """
+    order_key = get_order_key()
+    directory = _order_directory()
+    path = order_path(directory, order_key)
+    order = _open(path, order_key)
+    if order is not None:
+        return order
+
+    logging.info('Preloading randomized articles')
+    try:
+        order = _open(build_order(directory), order_key)
+    except OSError:
+        logging.exception(f'Could not store the game order in {directory}')
+    if order is None:
+        order = GameOrder(
+            encode_order(order_key, randomize_titles()), order_key,
+        )
+    logging.info('Article order preloaded')
+    return order
+
+
+def get_game_title(game_id: int) -> str:
+    order = get_game_order()
+    if len(order) == 0:
+        raise FailedToSelectPageError
+    return order[game_id % len(order)]
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = ArgumentParser(
+        prog='python -m wiki_reveal.game_order',
+        description='Precompute the order of games for WR_SEED and WR_PAGES',
+    )
+    parser.add_argument(
+        '--path',
+        default=_order_directory(),
+        help='Directory of the index (default: $WR_ORDER_INDEX or tmp)',
+    )
+    args = parser.parse_args(argv)
+
+    path = build_order(args.path)
+    order = _open(path, get_order_key())
+    print(f'Wrote {len(order or ())} games to {path}')
+
+
+if __name__ == '__main__':
+    main()
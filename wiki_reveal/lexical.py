@@ -0,0 +1,52 @@
+from typing import Optional
+
+# Same folding as wordAsLexicalEntry in tsclient/src/utils/wiki.ts
+_FOLDS = {
+    'a': 'àáâäæãåā',
+    'c': 'çćč',
+    'e': 'èéêëēėę',
+    'l': 'ł',
+    'i': 'îïíīįì',
+    'n': 'ñń',
+    'o': 'ôöòóœøōõ',
+    's': 'ßśš',
+    'u': 'ûüùúū',
+    'y': 'ýÿ',
+    'z': 'žźż',
+}
+_FOLD_TABLE = str.maketrans({
+    char: base for base, chars in _FOLDS.items() for char in chars
+})
+
+# Same as tsclient/src/data/allowedWords.ts, these are never hidden
+FREE_WORDS: dict[str, frozenset[str]] = {
+    'en': frozenset((
+        'a', 'aboard', 'about', 'above', 'across', 'after', 'against',
+        'along', 'amid', 'among', 'an', 'and', 'around', 'as', 'at',
+        'because', 'before', 'behind', 'below', 'beneath', 'beside',
+        'between', 'beyond', 'but', 'by', 'concerning', 'considering',
+        'despite', 'down', 'during', 'except', 'following', 'for', 'from',
+        'if', 'in', 'inside', 'into', 'is', 'it', 'like', 'minus', 'near',
+        'next', 'of', 'off', 'on', 'onto', 'opposite', 'or', 'out',
+        'outside', 'over', 'past', 'per', 'plus', 'regarding', 'round',
+        'save', 'since', 'than', 'the', 'through', 'till', 'to', 'toward',
+        'under', 'underneath', 'unlike', 'until', 'up', 'upon', 'versus',
+        'via', 'was', 'with', 'within', 'without',
+    )),
+}
+
+
+# Same as tsclient/src/utils/hints.ts, hinted last unless players want them
+BORING_HINTS = frozenset((
+    's', 'he', 'she', 'his', 'her', 'its', 'this', 'that', 'those', 'these',
+    'their', 'they', 'then', 'them', 'which', 'where', 'when', 'who',
+    'while', 'be', 'are', 'were', 'has', 'had', 'have', 'can', 'could', 'so',
+    'yes', 'no', 'not', 'any', 'only', 'some', 'all', 'many', 'most', 'also',
+    'both', 'such', 'same', 'would', 'however',
+))
+
+
+def word_as_lexical_entry(word: Optional[str]) -> Optional[str]:
+    if word is None:
+        return None
+    return word.lower().translate(_FOLD_TABLE).strip()
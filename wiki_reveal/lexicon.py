@@ -0,0 +1,55 @@
+from collections import Counter
+from typing import Any
+
+from wiki_reveal.lexical import BORING_HINTS, FREE_WORDS, word_as_lexical_entry
+from wiki_reveal.masked import trim_sections
+from wiki_reveal.wiki import Page, Paragraph, Section
+
+
+class PageLexicon:
+    """What the frontend otherwise works out by walking the whole page
+
+    `counts` has how often each lexical entry is hidden on the page, with
+    the reference sections trimmed like the frontend does. `hints` ranks
+    the entries players may get as hints, most common first, flagging the
+    boring ones.
+    """
+
+    def __init__(self, page: Page, language: str = 'en'):
+        self.counts: Counter[str] = Counter()
+        self._count(page.title)
+        self._count(page.summary)
+        for section in trim_sections(page.sections):
+            self._count_section(section)
+
+        free_words = FREE_WORDS.get(language, frozenset())
+        self.hints = [
+            (lex, count, lex in BORING_HINTS)
+            for lex, count in sorted(
+                self.counts.items(),
+                key=lambda item: (-item[1], item[0]),
+            )
+            if lex not in free_words
+        ]
+
+    def _count(self, paragraph: Paragraph) -> None:
+        self.counts.update(
+            lex for lex in (
+                word_as_lexical_entry(token)
+                for token, is_hidden in paragraph
+                if is_hidden
+            )
+            if lex is not None
+        )
+
+    def _count_section(self, section: Section) -> None:
+        self._count(section.title)
+        self._count(section.paragraphs)
+        for subsection in section.sections:
+            self._count_section(subsection)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'lexicon': dict(self.counts),
+            'hints': self.hints,
+        }
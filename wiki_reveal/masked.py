@@ -0,0 +1,97 @@
+from array import array
+from typing import Any, Iterable
+
+from wiki_reveal.compact import StringTable, encode_bitmap
+from wiki_reveal.lexical import FREE_WORDS, word_as_lexical_entry
+from wiki_reveal.wiki import Page, Paragraph, Section
+
+MASKED_FORMAT = 'masked-1'
+MAX_REVEAL_LEXES = 128
+
+# Same as trimSections in tsclient/src/utils/wiki.ts
+TRIM_AT = ('references', 'see also', 'notes', 'external links',
+           'further reading')
+
+
+def trim_sections(sections: Iterable[Section]) -> tuple[Section, ...]:
+    """Drops the sections from the first one that lists references on"""
+    kept = []
+    for section in sections:
+        title = ' '.join(
+            word_as_lexical_entry(token) or ''
+            for token, is_hidden in section.title
+            if is_hidden
+        )
+        if title in TRIM_AT:
+            break
+        kept.append(section)
+    return tuple(kept)
+
+
+class MaskedPage:
+    """A page where hidden words are sent as their length only
+
+    Hidden words are numbered in page order: title, summary and then the
+    sections depth first. The index maps each lexical entry to the numbers
+    of the words it reveals, so a guess costs its hits, not a page walk.
+    Free words and references are dealt with here like the frontend does.
+    """
+
+    def __init__(self, page: Page, language: str = 'en'):
+        self.free_words = FREE_WORDS.get(language, frozenset())
+        self.words: list[str] = []
+        self.index: dict[str, array] = {}
+        table = StringTable()
+        encoded = {
+            'title': self._mask(page.title, table),
+            'summary': self._mask(page.summary, table),
+            'sections': [
+                self._mask_section(section, table)
+                for section in trim_sections(page.sections)
+            ],
+        }
+        self.json: dict[str, Any] = {
+            'format': MASKED_FORMAT,
+            'strings': table.strings,
+            'hiddenCount': len(self.words),
+            **encoded,
+        }
+
+    def _mask(self, paragraph: Paragraph, table: StringTable) -> dict:
+        tokens = []
+        hidden = []
+        for token, is_hidden in paragraph:
+            lex = word_as_lexical_entry(token) if is_hidden else None
+            if token is not None and lex and lex not in self.free_words:
+                self.index.setdefault(lex, array('I')).append(len(self.words))
+                self.words.append(token)
+                tokens.append(len(token))
+                hidden.append(True)
+            else:
+                tokens.append(table.lookup(token))
+                hidden.append(False)
+        return {'tokens': tokens, 'hidden': encode_bitmap(hidden)}
+
+    def _mask_section(self, section: Section, table: StringTable) -> dict:
+        return {
+            'title': self._mask(section.title, table),
+            'depth': section.depth,
+            'paragraphs': self._mask(section.paragraphs, table),
+            'sections': [
+                self._mask_section(s, table) for s in section.sections
+            ],
+        }
+
+    def reveal(self, lexes: Iterable[str]) -> dict[str, dict[str, Any]]:
+        """The numbers and words each lex reveals, keyed by lexical entry"""
+        reveals = {}
+        for lex in lexes:
+            entry = word_as_lexical_entry(lex)
+            if not entry or entry in reveals:
+                continue
+            positions = self.index.get(entry, ())
+            reveals[entry] = {
+                'positions': list(positions),
+                'words': [self.words[position] for position in positions],
+            }
+        return reveals
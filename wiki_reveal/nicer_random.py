@@ -1,18 +1,37 @@
 from functools import cache
+from hashlib import sha256
 from random import Random
 from typing import Iterator
 import os
 
-from wiki_reveal.page_options import load_page_name_options
+from wiki_reveal.page_options import get_catalog_path, load_page_name_options
 
 _SEED = int(os.environ.get('WR_SEED', 777))
 _FORCE_PAGE = os.environ.get('WR_FORCE_PAGE', '')
 
 
+def _catalog() -> dict[str, list[str]]:
+    if _FORCE_PAGE:
+        return {'forced': [_FORCE_PAGE]}
+    return load_page_name_options()
+
+
 @cache
+def get_order_key() -> str:
+    """Changes whenever the seed or the catalog changes the game order
+
+    The catalog file is hashed as is, so this is cheap compared to the order.
+    """
+    digest = sha256(f'{_SEED}\n{_FORCE_PAGE}\n'.encode())
+    if not _FORCE_PAGE:
+        with open(get_catalog_path(), 'rb') as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()[:16]
+
+
 def randomize_titles() -> list[str]:
     rng = Random(_SEED)
-    titles = load_page_name_options() if not _FORCE_PAGE else { 'forced': [_FORCE_PAGE] }
+    titles = _catalog()
     categorized = [list(v) for v in titles.values()]
     tuple(map(rng.shuffle, categorized))
     counts = [len(v) for v in categorized]
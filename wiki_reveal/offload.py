@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import logging
+import os
+import sys
+from threading import Lock, Semaphore
+from typing import Any, Callable, Optional, TypeVar
+
+from wiki_reveal.exceptions import OffloadQueueFullError, OffloadTimeoutError
+
+T = TypeVar('T')
+
+OFFLOAD_WORKERS = int(os.environ.get('WR_OFFLOAD_WORKERS', 4))
+OFFLOAD_QUEUE = int(os.environ.get('WR_OFFLOAD_QUEUE', 16))
+OFFLOAD_TIMEOUT = float(os.environ.get('WR_OFFLOAD_TIMEOUT', 30))
+
+
+def eventlet_is_patched() -> bool:
+    eventlet = sys.modules.get('eventlet')
+    if eventlet is None:
+        return False
+    return eventlet.patcher.is_monkey_patched('thread')
+
+
+def native_lock() -> Any:
+    """A lock between OS threads, also when eventlet patched threading
+
+    A green lock must not be shared with the threads work is offloaded to.
+    Keep what it guards short, the hub blocks while it waits for one.
+    """
+    if eventlet_is_patched():
+        from eventlet import patcher  # type: ignore
+
+        return patcher.original('threading').Lock()
+    return Lock()
+
+
+class Offloader:
+    """Runs blocking work on real OS threads with bounded queueing
+
+    Under a monkey-patched eventlet the work goes to `eventlet.tpool` so
+    only the calling greenlet waits while the hub keeps serving sockets.
+    Otherwise a plain thread pool is used. At most `workers + max_queue`
+    calls may be running or waiting, further calls are rejected.
+    """
+
+    def __init__(
+        self,
+        workers: int = OFFLOAD_WORKERS,
+        max_queue: int = OFFLOAD_QUEUE,
+        timeout: Optional[float] = OFFLOAD_TIMEOUT,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = Semaphore(workers + max_queue)
+        self._lock = Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tpool_configured = False
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _run_in_tpool(self, func: Callable[..., T], *args: Any) -> T:
+        from eventlet import Timeout, tpool  # type: ignore
+
+        if not self._tpool_configured:
+            tpool.set_num_threads(self.workers)
+            self._tpool_configured = True
+
+        with Timeout(self.timeout, OffloadTimeoutError):
+            return tpool.execute(func, *args)
+
+    def _run_in_executor(self, func: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='wr-offload',
+                )
+        future = self._executor.submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise OffloadTimeoutError
+
+    def run(self, func: Callable[..., T], *args: Any) -> T:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            logging.warning(f'Offload queue full, rejecting {func.__name__}')
+            raise OffloadQueueFullError
+
+        self.pending += 1
+        try:
+            if eventlet_is_patched():
+                return self._run_in_tpool(func, *args)
+            return self._run_in_executor(func, *args)
+        except OffloadTimeoutError:
+            self.timeouts += 1
+            logging.error(f'Offloaded {func.__name__} timed out')
+            raise
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'maxQueue': self.max_queue,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+        }
+
+
+offloader = Offloader()
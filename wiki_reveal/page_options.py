@@ -5,15 +5,16 @@ import os
 from wiki_reveal.about import get_json_filename
 
 
+def get_catalog_path() -> str:
+    return os.path.join(
+        os.path.dirname(__file__),
+        get_json_filename('pages', os.environ.get('WR_PAGES')),
+    )
+
+
 @cache
 def load_page_name_options() -> dict[str, list[str]]:
-    with open(
-        os.path.join(
-            os.path.dirname(__file__),
-            get_json_filename('pages', os.environ.get('WR_PAGES')),
-        ),
-        'r',
-    ) as fh:
+    with open(get_catalog_path(), 'r') as fh:
         return json.load(fh)
 
 
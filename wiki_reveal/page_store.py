@@ -0,0 +1,265 @@
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from functools import cache
+import json
+import logging
+import os
+import sqlite3
+from time import time
+from typing import Any, Optional
+import zlib
+
+from wiki_reveal.offload import native_lock
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_name TEXT NOT NULL,
+    language TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    tokenizer_version INTEGER NOT NULL,
+    extract BLOB NOT NULL,
+    page BLOB,
+    size INTEGER NOT NULL,
+    stored REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (page_name, language, revision)
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed);
+"""
+
+
+def _pack(data: Any) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode())
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+@dataclass
+class StoredPage:
+    page_name: str
+    language: str
+    revision: int
+    tokenizer_version: int
+    extract: dict[str, Any]
+    page: Optional[dict[str, Any]]
+
+
+@dataclass
+class StoreEntry:
+    page_name: str
+    language: str
+    revision: int
+    tokenizer_version: int
+    size: int
+    stored: float
+    accessed: float
+
+
+class PageStore:
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = native_lock()
+        self._db = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+
+    def get(self, page_name: str, language: str) -> Optional[StoredPage]:
+        """Returns the newest stored revision of the page"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT revision, tokenizer_version, extract, page FROM pages'
+                ' WHERE page_name = ? AND language = ?'
+                ' ORDER BY revision DESC LIMIT 1',
+                (page_name, language),
+            ).fetchone()
+            if row is None:
+                return None
+
+            revision, tokenizer_version, extract, page = row
+            self._db.execute(
+                'UPDATE pages SET accessed = ?'
+                ' WHERE page_name = ? AND language = ? AND revision = ?',
+                (time(), page_name, language, revision),
+            )
+
+        return StoredPage(
+            page_name=page_name,
+            language=language,
+            revision=revision,
+            tokenizer_version=tokenizer_version,
+            extract=_unpack(extract),
+            page=None if page is None else _unpack(page),
+        )
+
+    def put(
+        self,
+        page_name: str,
+        language: str,
+        revision: int,
+        extract: dict[str, Any],
+        page: Optional[dict[str, Any]],
+        tokenizer_version: int,
+    ) -> None:
+        packed_extract = _pack(extract)
+        packed_page = None if page is None else _pack(page)
+        size = len(packed_extract) + len(packed_page or b'')
+        if size > self.max_bytes:
+            logging.warning(
+                f'Not storing {language} page {page_name} of {size} bytes,'
+                f' the page store holds {self.max_bytes}',
+            )
+            return
+        now = time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    page_name, language, revision, tokenizer_version,
+                    packed_extract, packed_page, size, now, now,
+                ),
+            )
+        self.evict(keep=(page_name, language, revision))
+
+    def size(self) -> int:
+        with self._lock:
+            (total,) = self._db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM pages',
+            ).fetchone()
+        return total
+
+    def evict(self, keep: Optional[tuple[str, str, int]] = None) -> int:
+        """Drops least recently accessed pages until within max_bytes
+
+        The page keyed by `keep`, such as one just stored, is never dropped.
+        """
+        evicted = 0
+        with self._lock:
+            (total,) = self._db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM pages',
+            ).fetchone()
+            if total <= self.max_bytes:
+                return 0
+
+            rows = self._db.execute(
+                'SELECT page_name, language, revision, size FROM pages'
+                ' ORDER BY accessed ASC',
+            ).fetchall()
+            for page_name, language, revision, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if (page_name, language, revision) == keep:
+                    continue
+                self._db.execute(
+                    'DELETE FROM pages'
+                    ' WHERE page_name = ? AND language = ? AND revision = ?',
+                    (page_name, language, revision),
+                )
+                total -= size
+                evicted += 1
+
+        if evicted:
+            logging.info(f'Evicted {evicted} pages from the page store')
+        return evicted
+
+    def entries(self) -> list[StoreEntry]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT page_name, language, revision, tokenizer_version,'
+                ' size, stored, accessed FROM pages ORDER BY accessed DESC',
+            ).fetchall()
+        return [StoreEntry(*row) for row in rows]
+
+    def purge(
+        self,
+        page_name: Optional[str] = None,
+        language: Optional[str] = None,
+    ) -> int:
+        clauses = []
+        params = []
+        if page_name is not None:
+            clauses.append('page_name = ?')
+            params.append(page_name)
+        if language is not None:
+            clauses.append('language = ?')
+            params.append(language)
+        where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+
+        with self._lock:
+            cursor = self._db.execute(f'DELETE FROM pages{where}', params)
+            self._db.execute('VACUUM')
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _max_bytes() -> int:
+    max_mb = os.environ.get('WR_PAGE_STORE_MAX_MB')
+    if max_mb:
+        return int(max_mb) * 1024 * 1024
+    return DEFAULT_MAX_BYTES
+
+
+@cache
+def get_page_store() -> Optional[PageStore]:
+    path = os.environ.get('WR_PAGE_STORE')
+    if not path:
+        return None
+
+    logging.info(f'Using page store at {path}')
+    return PageStore(path, _max_bytes())
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = ArgumentParser(
+        prog='python -m wiki_reveal.page_store',
+        description='Inspect and purge the persistent page store',
+    )
+    parser.add_argument(
+        '--path',
+        default=os.environ.get('WR_PAGE_STORE'),
+        help='Path to the store (default: $WR_PAGE_STORE)',
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='Show number of pages and total size')
+    commands.add_parser('list', help='List stored pages, most recent first')
+    commands.add_parser('evict', help='Evict down to the size limit')
+    purge = commands.add_parser('purge', help='Remove stored pages')
+    purge.add_argument('--page', help='Only remove this page')
+    purge.add_argument('--language', help='Only remove this language')
+    args = parser.parse_args(argv)
+
+    if not args.path:
+        parser.error('No store given, use --path or set WR_PAGE_STORE')
+
+    store = PageStore(args.path, _max_bytes())
+    if args.command == 'stats':
+        entries = store.entries()
+        print(f'{len(entries)} pages, {store.size()} bytes')
+        print(f'Limit {store.max_bytes} bytes')
+    elif args.command == 'list':
+        for entry in store.entries():
+            print(
+                f'{entry.page_name}\t{entry.language}\t{entry.revision}'
+                f'\tv{entry.tokenizer_version}\t{entry.size}',
+            )
+    elif args.command == 'evict':
+        print(f'Evicted {store.evict()} pages')
+    elif args.command == 'purge':
+        print(f'Purged {store.purge(args.page, args.language)} pages')
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,30 @@
 from collections.abc import Iterator
+import re
 from .escapes import ESCAPES
 
+_BRACES = re.compile(r'[{}]')
+
 
 def find_tags(text: str) -> Iterator[tuple[str, int]]:
-    offset = 0
-    while (idx := text.find('{\\')) >= 0:
+    length = len(text)
+    pos = 0
+    while (start := text.find('{\\', pos)) >= 0:
         depth = 1
-        start = idx
-        idx += 1
-
-        while depth > 0:
-            if idx >= len(text):
-                break
-                
-            if text[idx] == '{':
+        idx = length
+        for brace in _BRACES.finditer(text, start + 1):
+            if brace.group() == '{':
                 depth += 1
-            elif text[idx] == '}':
+            else:
                 depth -= 1
-            idx += 1
+                if depth == 0:
+                    idx = brace.end()
+                    break
 
-        yield text[start: idx + 1], start + offset
-        offset += idx + 1
+        yield text[start: idx + 1], start
 
-        if idx + 1 >= len(text):
+        pos = idx + 1
+        if pos >= length:
             break
-            
-        text = text[idx + 1:]
 
 
 def in_tag(line: str, tag: str) -> bool:
@@ -37,21 +36,16 @@ EQUATION_TAG = 'xxxxEQUATI0Nxxxx'
 
 def clean_lines(text: str) -> str:
     prev_idx = 0
-    out = ''
+    out: list[str] = []
     for tag, idx in find_tags(text):
-        def removable(line) -> bool:
-            return line == '' or in_tag(line, tag)
-
-        rev_lines = [
-            line.strip() for line in text[prev_idx: idx].split('\n')
-        ][::-1]
-        line_idx = 0
-        while line_idx < len(rev_lines) and removable(rev_lines[line_idx]):
-            line_idx += 1
+        lines = [line.strip() for line in text[prev_idx: idx].split('\n')]
+        while lines and (lines[-1] == '' or in_tag(lines[-1], tag)):
+            lines.pop()
 
-        out += '\n'.join(rev_lines[line_idx:][::-1]) + EQUATION_TAG
+        out.append('\n'.join(lines))
+        out.append(EQUATION_TAG)
 
         prev_idx = idx + len(tag) + 1
 
-    out += text[prev_idx:]
-    return out
+    out.append(text[prev_idx:])
+    return ''.join(out)
@@ -0,0 +1,158 @@
+from datetime import datetime, timezone
+from functools import cached_property
+from hashlib import sha256
+from http import HTTPStatus
+import json
+from typing import Any, Optional
+import zlib
+
+from flask import Request, Response
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+
+ENCODINGS = ('br', 'gzip')
+
+
+def encode_json(data: Any) -> bytes:
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+def encode_overlay(overlay: dict[str, Any]) -> bytes:
+    """Encodes fields to continue an open JSON object and close it"""
+    if not overlay:
+        return b'}'
+    return b',' + encode_json(overlay)[1:]
+
+
+def cache_until(response: Response, expires: datetime) -> None:
+    """Lets the gateway cache the response until it changes
+
+    The gateway replays the headers unchanged on every hit, so browsers are
+    never given a lifetime that could outlive the reset. They revalidate
+    with the ETag instead.
+    """
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    if expires > datetime.now(tz=timezone.utc):
+        response.headers['X-Accel-Expires'] = f'@{int(expires.timestamp())}'
+    else:
+        response.headers['X-Accel-Expires'] = '0'
+
+
+class PageBody:
+    """The shared part of a page payload, encoded once to immutable bytes
+
+    The body is kept as an open JSON object so that per-endpoint fields can
+    be appended by a `PreparedPayload` without copying the body.
+    """
+
+    def __init__(self, data: dict[str, Any]):
+        if not data:
+            raise ValueError('Page body needs at least one field')
+        self.prefix = encode_json(data)[:-1]
+        self.etag = sha256(self.prefix).hexdigest()[:32]
+
+    @cached_property
+    def _gzip_state(self) -> tuple[bytes, Any]:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        head = compressor.compress(self.prefix)
+        head += compressor.flush(zlib.Z_SYNC_FLUSH)
+        return head, compressor
+
+    def gzip_chunks(self, tail: bytes) -> list[bytes]:
+        head, compressor = self._gzip_state
+        compressor = compressor.copy()
+        return [head, compressor.compress(tail) + compressor.flush()]
+
+    def brotli(self, tail: bytes) -> bytes:
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return (
+            compressor.process(self.prefix)
+            + compressor.process(tail)
+            + compressor.finish()
+        )
+
+
+class PreparedPayload:
+    """A page body with a small overlay of per-endpoint fields"""
+
+    def __init__(
+        self,
+        body: PageBody,
+        overlay: Optional[dict[str, Any]] = None,
+        *,
+        offer_brotli: bool = True,
+    ):
+        self.body = body
+        self.tail = encode_overlay(overlay or {})
+        self.etag = f'{body.etag}{sha256(self.tail).hexdigest()[:8]}'
+        self.offer_brotli = offer_brotli and brotli is not None
+
+    @cached_property
+    def gzip(self) -> list[bytes]:
+        return self.body.gzip_chunks(self.tail)
+
+    @cached_property
+    def br(self) -> list[bytes]:
+        return [self.body.brotli(self.tail)]
+
+    def precompress(self) -> None:
+        self.gzip
+        if self.offer_brotli:
+            self.br
+
+    def chunks(self, encoding: Optional[str]) -> list[bytes]:
+        if encoding == 'br':
+            return self.br
+        if encoding == 'gzip':
+            return self.gzip
+        return [self.body.prefix, self.tail]
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        return self.etag if encoding is None else f'{self.etag}-{encoding}'
+
+    def choose_encoding(self, request: Request) -> Optional[str]:
+        best: Optional[str] = None
+        best_quality = 0.0
+        for encoding in ENCODINGS:
+            if encoding == 'br' and not self.offer_brotli:
+                continue
+            quality = request.accept_encodings[encoding]
+            if quality > best_quality:
+                best = encoding
+                best_quality = quality
+        return best
+
+    def response(
+        self,
+        request: Request,
+        expires: Optional[datetime] = None,
+    ) -> Response:
+        encoding = self.choose_encoding(request)
+        etags = [self.variant_etag(e) for e in (None, *ENCODINGS)]
+
+        if any(request.if_none_match.contains(etag) for etag in etags):
+            response = Response(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            response = Response(
+                self.chunks(encoding),
+                mimetype='application/json',
+            )
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(self.variant_etag(encoding))
+        response.headers['Vary'] = 'Accept, Accept-Encoding'
+        if expires is not None:
+            cache_until(response, expires)
+        return response
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import logging
+from time import monotonic
+from typing import Any, Callable, Optional
+
+from wiki_reveal.game_id import get_game_id, get_start_of_next
+
+# Never sleep longer than this between checks so clock jumps are noticed
+MAX_SLEEP = 60 * 60
+RETRY_INTERVAL = 60
+
+
+@dataclass
+class WarmStatus:
+    game_id: Optional[int] = None
+    last_warm: Optional[datetime] = None
+    success: Optional[bool] = None
+    duration: Optional[float] = None
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'gameId': self.game_id,
+            'lastWarm': (
+                None if self.last_warm is None
+                else self.last_warm.isoformat().replace(' ', 'T')
+            ),
+            'success': self.success,
+            'duration': self.duration,
+        }
+
+
+class RolloverPrefetcher:
+    """Warms the next game a while before the daily reset
+
+    `warm` is given the game ids to keep pinned: yesterday's, today's and
+    the one being warmed. Until today's game is warm it is retried every
+    RETRY_INTERVAL, also when the boot warm or the next game failed.
+    `ready` is called each time today's game has been warmed.
+    """
+
+    def __init__(
+        self,
+        warm: Callable[[list[int]], None],
+        lead: timedelta,
+        sleep: Callable[[float], Any],
+        ready: Callable[[], Any] = lambda: None,
+    ):
+        self.warm = warm
+        self.lead = lead
+        self.sleep = sleep
+        self.ready = ready
+        self.status = WarmStatus()
+        # Games pinned by the last warm that succeeded
+        self.warmed: frozenset[int] = frozenset()
+
+    def warm_game(self, game_id: int) -> WarmStatus:
+        today = get_game_id()
+        game_ids = sorted({
+            i for i in (today - 1, today, game_id) if i >= 0
+        })
+        logging.info(f'Warming game {game_id}')
+        t0 = monotonic()
+        try:
+            self.warm(game_ids)
+        except Exception:
+            logging.exception(f'Failed to warm game {game_id}')
+            success = False
+        else:
+            success = True
+            self.warmed = frozenset(game_ids)
+
+        self.status = WarmStatus(
+            game_id=game_id,
+            last_warm=datetime.now(tz=timezone.utc),
+            success=success,
+            duration=monotonic() - t0,
+        )
+        logging.info(
+            f'Warmed game {game_id} in {self.status.duration:.2f}s'
+            f' ({"ok" if success else "failed"})',
+        )
+        return self.status
+
+    def seconds_to_next_warm(self) -> float:
+        warm_at = get_start_of_next() - self.lead
+        return (warm_at - datetime.now(tz=timezone.utc)).total_seconds()
+
+    def run(self) -> None:
+        while True:
+            today = get_game_id()
+            if today not in self.warmed:
+                self.warm_game(today)
+                if today not in self.warmed:
+                    self.sleep(RETRY_INTERVAL)
+                    continue
+                self.ready()
+
+            delay = self.seconds_to_next_warm()
+            if delay > 0:
+                self.sleep(min(delay, MAX_SLEEP))
+                continue
+
+            next_id = today + 1
+            if next_id not in self.warmed:
+                self.warm_game(next_id)
+
+            if next_id in self.warmed:
+                self.sleep(min(self.lead.total_seconds() + 1, MAX_SLEEP))
+            else:
+                self.sleep(RETRY_INTERVAL)
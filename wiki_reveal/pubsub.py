@@ -0,0 +1,51 @@
+import logging
+import pickle
+import time
+from typing import Any, Iterator
+
+import socketio  # type: ignore
+
+from wiki_reveal.exceptions import RespError
+from wiki_reveal.resp import RespClient
+
+MAX_RETRY_SLEEP = 60
+
+
+class RespManager(socketio.PubSubManager):
+    """Socket.IO client manager fanning out through a Redis protocol server
+
+    Works like `socketio.RedisManager` but uses our own client, so the same
+    server that keeps the rooms also carries emits between workers.
+    """
+
+    name = 'resp'
+
+    def __init__(
+        self,
+        url: str,
+        channel: str = 'flask-socketio',
+        write_only: bool = False,
+    ):
+        self.client = RespClient(url)
+        super().__init__(channel=channel, write_only=write_only)
+
+    def _publish(self, data: Any) -> None:
+        try:
+            self.client.execute('PUBLISH', self.channel, pickle.dumps(data))
+        except (RespError, ConnectionError, OSError):
+            logging.exception('Could not publish socket message')
+
+    def _listen(self) -> Iterator[bytes]:
+        retry_sleep = 1
+        while True:
+            try:
+                for message in self.client.subscribe(self.channel):
+                    retry_sleep = 1
+                    yield message
+            except (RespError, ConnectionError, OSError):
+                logging.exception(
+                    f'Lost socket message subscription, retrying in'
+                    f' {retry_sleep}s',
+                )
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, MAX_RETRY_SLEEP)
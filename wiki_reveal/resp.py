@@ -0,0 +1,194 @@
+import logging
+import select
+import socket
+from threading import Lock
+from typing import Any, Iterator, Optional, Union
+from urllib.parse import unquote, urlsplit
+
+from wiki_reveal.exceptions import RespError
+
+DEFAULT_PORT = 6379
+Reply = Union[None, int, bytes, str, list[Any], RespError]
+
+
+def encode_command(*args: Union[str, bytes, int, float]) -> bytes:
+    parts = [f'*{len(args)}\r\n'.encode()]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode()
+        else:
+            data = str(arg).encode()
+        parts.append(f'${len(data)}\r\n'.encode())
+        parts.append(data)
+        parts.append(b'\r\n')
+    return b''.join(parts)
+
+
+class RespConnection:
+    """A single connection speaking the Redis serialization protocol"""
+
+    def __init__(self, url: str, timeout: Optional[float] = 5.0):
+        parts = urlsplit(url)
+        if parts.scheme != 'redis':
+            raise ValueError(f'Only redis:// urls are supported, got {url}')
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or DEFAULT_PORT
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._sock = socket.create_connection(
+            (self.host, self.port),
+            timeout=timeout,
+        )
+        self._file = self._sock.makefile('rb')
+        self.sent = 0
+
+        if self.password is not None:
+            self.command('AUTH', self.password)
+        if self.db:
+            self.command('SELECT', self.db)
+
+    def send(self, *commands: tuple[Any, ...]) -> None:
+        data = memoryview(b''.join(encode_command(*c) for c in commands))
+        self.sent = 0
+        while self.sent < len(data):
+            self.sent += self._sock.send(data[self.sent:])
+
+    def is_stale(self) -> bool:
+        """If the server closed the idle connection or sent unasked replies"""
+        readable, _, _ = select.select([self._sock], [], [], 0)
+        return bool(readable)
+
+    def read(self) -> Reply:
+        line = self._file.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Connection closed by server')
+
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            return RespError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError('Connection closed by server')
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self.read() for _ in range(length)]
+        raise RespError(f'Unknown reply type {line!r}')
+
+    def command(self, *args: Any) -> Any:
+        self.send(args)
+        reply = self.read()
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+
+class RespClient:
+    """A thread safe client that reconnects once if a command could not go out
+
+    Commands are only sent again if not a byte of them reached the server,
+    since most of them are not safe to run twice.
+    """
+
+    def __init__(self, url: str, timeout: Optional[float] = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._lock = Lock()
+        self._connection: Optional[RespConnection] = None
+
+    def _connect(self) -> RespConnection:
+        if self._connection is not None and self._connection.is_stale():
+            self._drop()
+        if self._connection is None:
+            self._connection = RespConnection(self.url, self.timeout)
+        return self._connection
+
+    def _drop(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except OSError:
+                pass
+            self._connection = None
+
+    def _send(self, commands: tuple[tuple[Any, ...], ...]) -> RespConnection:
+        for attempt in range(2):
+            connection: Optional[RespConnection] = None
+            try:
+                connection = self._connect()
+                connection.send(*commands)
+                return connection
+            except (ConnectionError, OSError):
+                self._drop()
+                if attempt or (connection is not None and connection.sent):
+                    raise
+                logging.warning(f'Reconnecting to {self.url}')
+        raise AssertionError('Unreachable')
+
+    def pipeline(self, *commands: tuple[Any, ...]) -> list[Any]:
+        """Sends all commands at once and returns their replies in order
+
+        Raises the first error reply after all replies have been read.
+        """
+        with self._lock:
+            connection = self._send(commands)
+            try:
+                replies = [connection.read() for _ in commands]
+            except (ConnectionError, OSError):
+                self._drop()
+                raise
+
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def execute(self, *args: Any) -> Any:
+        return self.pipeline(args)[0]
+
+    def transaction(self, *commands: tuple[Any, ...]) -> list[Any]:
+        """Runs the commands atomically in a MULTI/EXEC block"""
+        replies = self.pipeline(('MULTI',), *commands, ('EXEC',))[-1]
+        if replies is None:
+            raise RespError('Transaction was aborted')
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def subscribe(self, channel: str) -> Iterator[bytes]:
+        """Yields messages published to the channel, forever"""
+        connection = RespConnection(self.url, timeout=None)
+        try:
+            connection.send(('SUBSCRIBE', channel))
+            while True:
+                reply = connection.read()
+                if (
+                    isinstance(reply, list)
+                    and len(reply) == 3
+                    and reply[0] == b'message'
+                ):
+                    yield reply[2]
+        finally:
+            connection.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
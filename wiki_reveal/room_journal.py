@@ -0,0 +1,317 @@
+from datetime import datetime, timezone
+from heapq import heapify
+import json
+import logging
+import os
+from typing import Any, Callable, Optional
+
+from wiki_reveal.exceptions import OffloadError
+from wiki_reveal.offload import native_lock, offloader
+from wiki_reveal.room_store import (
+    GUESS, SID, MemoryRoomStore, RoomData, new_epoch,
+)
+
+FLUSH_INTERVAL = float(os.environ.get('WR_JOURNAL_FLUSH_MS', 200)) / 1000
+COMPACT_RECORDS = int(os.environ.get('WR_JOURNAL_COMPACT_RECORDS', 10000))
+
+
+class RoomJournal:
+    """An append-only log of room changes with snapshot compaction
+
+    Records are buffered in memory and written with one fsync per flush.
+    Every record has a sequence number, a snapshot remembers the last one
+    it includes so replay can skip records that are already in it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        offload: Callable[..., Any] = offloader.run,
+    ):
+        self.path = path
+        self.snapshot_path = f'{path}.snapshot'
+        self.offload = offload
+        self.seq = 0
+        self.since_snapshot = 0
+        self.flushes = 0
+        self._buffer: list[bytes] = []
+        # Writes run on the offloader's threads
+        self._lock = native_lock()
+        self._write_lock = native_lock()
+
+    def append(self, op: str, **fields: Any) -> None:
+        with self._lock:
+            self.seq += 1
+            self.since_snapshot += 1
+            self._buffer.append(json.dumps(
+                {'seq': self.seq, 'op': op, **fields},
+                separators=(',', ':'),
+            ).encode() + b'\n')
+
+    def _take(self) -> list[bytes]:
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        return pending
+
+    def _restore(self, pending: list[bytes]) -> None:
+        with self._lock:
+            self._buffer = pending + self._buffer
+
+    def _append(self, pending: list[bytes]) -> None:
+        with open(self.path, 'ab') as journal:
+            journal.write(b''.join(pending))
+            journal.flush()
+            os.fsync(journal.fileno())
+        self.flushes += 1
+
+    def _write(self, pending: list[bytes]) -> None:
+        with self._write_lock:
+            self._append(pending)
+
+    def flush(self) -> None:
+        pending = self._take()
+        if not pending:
+            return
+        try:
+            self.offload(self._write, pending)
+        except OffloadError:
+            # Replay skips repeated sequence numbers if it was written anyway
+            self._restore(pending)
+            raise
+
+    def _write_snapshot(self, pending: list[bytes], snapshot: bytes) -> None:
+        with self._write_lock:
+            if pending:
+                self._append(pending)
+
+            tmp_path = f'{self.snapshot_path}.tmp'
+            with open(tmp_path, 'wb') as snapshot_file:
+                snapshot_file.write(snapshot)
+                snapshot_file.flush()
+                os.fsync(snapshot_file.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            # Everything in the journal is now in the snapshot. Records
+            # appended since were still buffered and are written after.
+            with open(self.path, 'wb') as journal:
+                os.fsync(journal.fileno())
+
+    def compact(self, rooms: dict[str, Any]) -> None:
+        """Replaces the journal with a snapshot of the rooms
+
+        The rooms are serialized right away, so they may change as soon as
+        this returns or while the snapshot is written.
+        """
+        with self._lock:
+            snapshot = json.dumps(
+                {'seq': self.seq, 'rooms': rooms},
+                separators=(',', ':'),
+            ).encode()
+            pending, self._buffer = self._buffer, []
+            self.since_snapshot = 0
+        try:
+            self.offload(self._write_snapshot, pending, snapshot)
+        except OffloadError:
+            self._restore(pending)
+            raise
+        logging.info(f'Compacted room journal into {len(rooms)} rooms')
+
+    def compaction_due(self) -> bool:
+        return self.since_snapshot >= COMPACT_RECORDS
+
+    def read(self) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        """Returns the snapshot rooms and the journal records after it"""
+        rooms: dict[str, Any] = {}
+        last_seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            rooms = snapshot['rooms']
+            last_seq = snapshot['seq']
+
+        records = []
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logging.warning('Ignoring torn room journal record')
+                        break
+                    if record['seq'] > last_seq:
+                        records.append(record)
+                        last_seq = record['seq']
+
+        with self._lock:
+            self.seq = max(self.seq, last_seq)
+        return rooms, records
+
+    def close(self) -> None:
+        pending = self._take()
+        if pending:
+            self._write(pending)
+
+
+class JournaledRoomStore(MemoryRoomStore):
+    """Rooms kept in memory with every change journaled to disk"""
+
+    def __init__(self, journal: RoomJournal):
+        super().__init__()
+        self.journal = journal
+
+    def recover(self, now: Optional[datetime] = None) -> int:
+        now = datetime.now(tz=timezone.utc) if now is None else now
+        rooms, records = self.journal.read()
+        self.rooms = {
+            room: RoomData.from_json(data) for room, data in rooms.items()
+        }
+        for record in records:
+            try:
+                self._apply(record)
+            except Exception:
+                logging.exception(f'Could not replay {record}')
+
+        self.expiries = [(r.end, room) for room, r in self.rooms.items()]
+        heapify(self.expiries)
+        MemoryRoomStore.pop_expired(self, now)
+
+        # Socket ids from before the restart are gone, clients join again.
+        # Guesses clients saw may not have reached the journal, so their
+        # cursors can't be trusted either.
+        for room_data in self.rooms.values():
+            room_data.users.clear()
+            room_data.epoch = new_epoch()
+
+        logging.info(
+            f'Recovered {len(self.rooms)} rooms from {len(rooms)} in snapshot'
+            f' and {len(records)} journal records',
+        )
+        return len(self.rooms)
+
+    def _apply(self, record: dict[str, Any]) -> None:
+        op = record['op']
+        room = record['room']
+        if op == 'create':
+            MemoryRoomStore.create(
+                self,
+                room,
+                start=datetime.fromisoformat(record['start']),
+                end=datetime.fromisoformat(record['end']),
+                game_id=record['gameId'],
+                sid=record['sid'],
+                username=record['username'],
+                lexes=[tuple(lex) for lex in record['lexes']],
+                settings=record['settings'],
+            )
+        elif room not in self.rooms:
+            return
+        elif op == 'join':
+            MemoryRoomStore.add_user(
+                self, room, record['sid'], record['username'],
+            )
+        elif op == 'leave':
+            MemoryRoomStore.remove_user(self, room, record['sid'])
+        elif op == 'rename':
+            MemoryRoomStore.rename_user(
+                self, room, record['sid'], record['username'],
+            )
+        elif op == 'guess':
+            MemoryRoomStore.add_guess(
+                self, room, record['username'], record['lex'],
+                record['isHint'],
+            )
+        elif op == 'expire':
+            del self.rooms[room]
+
+    def create(
+        self,
+        room: str,
+        start: datetime,
+        end: datetime,
+        game_id: int,
+        sid: SID,
+        username: str,
+        lexes: list[tuple[str, bool]],
+        settings: dict[str, Any],
+    ) -> list[GUESS]:
+        backlog = super().create(
+            room, start, end, game_id, sid, username, lexes, settings,
+        )
+        self.journal.append(
+            'create',
+            room=room,
+            start=start.isoformat(),
+            end=end.isoformat(),
+            gameId=game_id,
+            sid=sid,
+            username=username,
+            lexes=lexes,
+            settings=settings,
+        )
+        return backlog
+
+    def add_user(
+        self,
+        room: str,
+        sid: SID,
+        username: str,
+        since: int = 0,
+        epoch: Optional[str] = None,
+    ) -> tuple[list[str], list[GUESS], dict[str, Any], str, int]:
+        result = super().add_user(room, sid, username, since, epoch)
+        self.journal.append('join', room=room, sid=sid, username=username)
+        return result
+
+    def remove_user(
+        self,
+        room: str,
+        sid: SID,
+    ) -> tuple[Optional[str], list[str]]:
+        result = super().remove_user(room, sid)
+        self.journal.append('leave', room=room, sid=sid)
+        return result
+
+    def rename_user(self, room: str, sid: SID, username: str) -> None:
+        super().rename_user(room, sid, username)
+        self.journal.append('rename', room=room, sid=sid, username=username)
+
+    def add_guess(
+        self,
+        room: str,
+        username: str,
+        lex: str,
+        is_hint: bool,
+    ) -> int:
+        index = super().add_guess(room, username, lex, is_hint)
+        if index >= 0:
+            self.journal.append(
+                'guess', room=room, username=username, lex=lex,
+                isHint=is_hint,
+            )
+        return index
+
+    def pop_expired(self, now: datetime) -> list[str]:
+        expired = super().pop_expired(now)
+        for room in expired:
+            self.journal.append('expire', room=room)
+        return expired
+
+    def compact(self) -> None:
+        self.journal.compact({
+            room: room_data.to_json()
+            for room, room_data in self.rooms.items()
+        })
+
+    def run_journal(
+        self,
+        sleep: Callable[[float], Any],
+        interval: float = FLUSH_INTERVAL,
+    ) -> None:
+        while True:
+            sleep(interval)
+            try:
+                self.journal.flush()
+                if self.journal.compaction_due():
+                    self.compact()
+            except Exception:
+                logging.exception('Failed to write room journal')
@@ -0,0 +1,624 @@
+from array import array
+from collections import Counter
+from datetime import datetime
+from heapq import heappop, heappush
+import json
+from operator import attrgetter
+from secrets import token_hex
+from typing import Any, Literal, Optional, Tuple, Union, cast
+
+from wiki_reveal.exceptions import CoopGameDoesNotExistError
+from wiki_reveal.resp import RespClient
+
+SID = str
+GUESS = list[Any]
+ROOM_ATTRIBUTE = Literal[
+    'start', 'end', 'game_id', 'users', 'settings', 'names', 'lexes',
+]
+# Redis keys outlive the room a little so late requests still find it
+KEY_GRACE = 60 * 60
+
+
+def new_epoch() -> str:
+    return token_hex(4)
+
+
+def resume_index(
+    since: int,
+    epoch: Optional[str],
+    room_epoch: str,
+    length: int,
+) -> int:
+    """Where a joining client's backlog starts, 0 if its cursor is stale"""
+    if epoch is not None and epoch != room_epoch:
+        return 0
+    return since if 0 < since <= length else 0
+
+
+class RoomData:
+    """A coop room with its users and guesses
+
+    Usernames and lexes are interned per room. Guesses are kept as parallel
+    arrays of lex id, user id and hint flag, so a guess costs a few bytes
+    and renaming a user only changes its entry in `names`.
+
+    The epoch changes whenever guesses already sent could have changed, so
+    clients holding an older one must fetch the whole backlog again.
+    """
+
+    __slots__ = (
+        'start', 'end', 'game_id', 'users', 'settings', 'names', 'name_ids',
+        'lexes', 'lex_ids', 'guess_lexes', 'guess_users', 'guess_hints',
+        'guess_counts', 'epoch',
+    )
+
+    def __init__(
+        self,
+        start: datetime,
+        end: datetime,
+        game_id: int,
+        settings: dict[str, Any],
+    ):
+        self.start = start
+        self.end = end
+        self.game_id = game_id
+        self.settings = settings
+        self.users: dict[SID, int] = {}
+        self.names: list[str] = []
+        self.name_ids: dict[str, int] = {}
+        self.lexes: list[str] = []
+        self.lex_ids: dict[str, int] = {}
+        self.guess_lexes = array('I')
+        self.guess_users = array('I')
+        self.guess_hints = bytearray()
+        # Guesses per user id, so a rename needs not scan guess_users
+        self.guess_counts: Counter[int] = Counter()
+        self.epoch = new_epoch()
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'gameId': self.game_id,
+            'settings': self.settings,
+            'users': self.users,
+            'names': self.names,
+            'nameIds': self.name_ids,
+            'lexes': self.lexes,
+            'guessLexes': self.guess_lexes.tolist(),
+            'guessUsers': self.guess_users.tolist(),
+            'guessHints': list(self.guess_hints),
+            'epoch': self.epoch,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> 'RoomData':
+        room_data = cls(
+            start=datetime.fromisoformat(data['start']),
+            end=datetime.fromisoformat(data['end']),
+            game_id=data['gameId'],
+            settings=data['settings'],
+        )
+        room_data.users = data['users']
+        room_data.names = data['names']
+        room_data.name_ids = data['nameIds']
+        room_data.lexes = data['lexes']
+        room_data.lex_ids = {lex: i for i, lex in enumerate(data['lexes'])}
+        room_data.guess_lexes = array('I', data['guessLexes'])
+        room_data.guess_users = array('I', data['guessUsers'])
+        room_data.guess_hints = bytearray(data['guessHints'])
+        room_data.guess_counts = Counter(room_data.guess_users)
+        room_data.epoch = data.get('epoch', room_data.epoch)
+        return room_data
+
+    def user_id(self, username: str) -> int:
+        user_id = self.name_ids.get(username)
+        if user_id is None:
+            user_id = self.name_ids[username] = len(self.names)
+            self.names.append(username)
+        return user_id
+
+    def lex_id(self, lex: str) -> int:
+        lex_id = self.lex_ids.get(lex)
+        if lex_id is None:
+            lex_id = self.lex_ids[lex] = len(self.lexes)
+            self.lexes.append(lex)
+        return lex_id
+
+    def has_guessed(self, lex: str) -> bool:
+        return lex in self.lex_ids
+
+    def append_guess(self, lex: str, username: str, is_hint: bool) -> int:
+        user_id = self.user_id(username)
+        self.guess_lexes.append(self.lex_id(lex))
+        self.guess_users.append(user_id)
+        self.guess_counts[user_id] += 1
+        self.guess_hints.append(is_hint)
+        return len(self.guess_hints) - 1
+
+    def rename(self, user_id: int, username: str) -> None:
+        old_name = self.names[user_id]
+        if self.name_ids.get(old_name) == user_id:
+            del self.name_ids[old_name]
+        self.names[user_id] = username
+        self.name_ids[username] = user_id
+        if self.guess_counts[user_id] and old_name != username:
+            self.epoch = new_epoch()
+
+    def usernames(self) -> list[str]:
+        return [self.names[user_id] for user_id in self.users.values()]
+
+    def backlog(self, since: int = 0) -> list[GUESS]:
+        lexes = self.lexes
+        names = self.names
+        return [
+            [lexes[lex_id], names[user_id], bool(is_hint)]
+            for lex_id, user_id, is_hint in zip(
+                self.guess_lexes[since:],
+                self.guess_users[since:],
+                self.guess_hints[since:],
+            )
+        ]
+
+
+def dest(
+    room_data: RoomData,
+    *attrs: ROOM_ATTRIBUTE,
+) -> Union[Tuple[Any], Any]:
+    """Returns the single attribute if one is requested, or all as a tuple"""
+    return attrgetter(*attrs)(room_data)
+
+
+class RoomStore:
+    """Where coop rooms live, shared by all workers using the same store"""
+
+    def create(
+        self,
+        room: str,
+        start: datetime,
+        end: datetime,
+        game_id: int,
+        sid: SID,
+        username: str,
+        lexes: list[tuple[str, bool]],
+        settings: dict[str, Any],
+    ) -> list[GUESS]:
+        raise NotImplementedError
+
+    def exists(self, room: str) -> bool:
+        raise NotImplementedError
+
+    def user_count(self, room: str) -> int:
+        raise NotImplementedError
+
+    def epoch(self, room: str) -> str:
+        raise NotImplementedError
+
+    def add_user(
+        self,
+        room: str,
+        sid: SID,
+        username: str,
+        since: int = 0,
+        epoch: Optional[str] = None,
+    ) -> tuple[list[str], list[GUESS], dict[str, Any], str, int]:
+        """Returns users, backlog, settings, epoch and where backlog starts
+
+        The backlog starts at `since` if the room is still at `epoch` and
+        has that many guesses, otherwise it is the whole backlog.
+        """
+        raise NotImplementedError
+
+    def remove_user(
+        self,
+        room: str,
+        sid: SID,
+    ) -> tuple[Optional[str], list[str]]:
+        raise NotImplementedError
+
+    def rename_user(self, room: str, sid: SID, username: str) -> None:
+        raise NotImplementedError
+
+    def room_data(self, room: str) -> tuple[datetime, datetime, int]:
+        raise NotImplementedError
+
+    def add_guess(
+        self,
+        room: str,
+        username: str,
+        lex: str,
+        is_hint: bool,
+    ) -> int:
+        """Returns the index of the guess or -1 if the lex was known"""
+        raise NotImplementedError
+
+    def active_rooms(self) -> list[int]:
+        raise NotImplementedError
+
+    def pop_expired(self, now: datetime) -> list[str]:
+        """Removes expired rooms, each room is only returned to one caller"""
+        raise NotImplementedError
+
+
+class MemoryRoomStore(RoomStore):
+    def __init__(self) -> None:
+        self.rooms: dict[str, RoomData] = {}
+        # Min-heap of (end, room) so expired rooms are found without a scan
+        self.expiries: list[tuple[datetime, str]] = []
+
+    def _get(self, room: str) -> RoomData:
+        try:
+            return self.rooms[room]
+        except KeyError:
+            raise CoopGameDoesNotExistError
+
+    def create(
+        self,
+        room: str,
+        start: datetime,
+        end: datetime,
+        game_id: int,
+        sid: SID,
+        username: str,
+        lexes: list[tuple[str, bool]],
+        settings: dict[str, Any],
+    ) -> list[GUESS]:
+        room_data = RoomData(
+            start=start,
+            end=end,
+            game_id=game_id,
+            settings=settings,
+        )
+        room_data.users[sid] = room_data.user_id(username)
+        for lex, is_hint in lexes:
+            room_data.append_guess(lex, username, is_hint)
+
+        self.rooms[room] = room_data
+        heappush(self.expiries, (end, room))
+        return room_data.backlog()
+
+    def exists(self, room: str) -> bool:
+        return room in self.rooms
+
+    def user_count(self, room: str) -> int:
+        return len(self._get(room).users)
+
+    def epoch(self, room: str) -> str:
+        return self._get(room).epoch
+
+    def add_user(
+        self,
+        room: str,
+        sid: SID,
+        username: str,
+        since: int = 0,
+        epoch: Optional[str] = None,
+    ) -> tuple[list[str], list[GUESS], dict[str, Any], str, int]:
+        room_data = self._get(room)
+        users = room_data.users
+
+        # Remove others with same name
+        for key in list(users.keys()):
+            if room_data.names[users[key]] == username:
+                del users[key]
+
+        users[sid] = room_data.user_id(username)
+        since = resume_index(
+            since, epoch, room_data.epoch, len(room_data.guess_hints),
+        )
+        return (
+            room_data.usernames(),
+            room_data.backlog(since),
+            room_data.settings,
+            room_data.epoch,
+            since,
+        )
+
+    def remove_user(
+        self,
+        room: str,
+        sid: SID,
+    ) -> tuple[Optional[str], list[str]]:
+        room_data = self._get(room)
+        user_id = room_data.users.pop(sid, None)
+        if user_id is None:
+            return None, room_data.usernames()
+        return room_data.names[user_id], room_data.usernames()
+
+    def rename_user(self, room: str, sid: SID, username: str) -> None:
+        room_data = self._get(room)
+        user_id = room_data.users.get(sid)
+        if user_id is None:
+            room_data.users[sid] = room_data.user_id(username)
+        else:
+            room_data.rename(user_id, username)
+
+    def room_data(self, room: str) -> tuple[datetime, datetime, int]:
+        return cast(
+            tuple[datetime, datetime, int],
+            dest(self._get(room), 'start', 'end', 'game_id'),
+        )
+
+    def add_guess(
+        self,
+        room: str,
+        username: str,
+        lex: str,
+        is_hint: bool,
+    ) -> int:
+        room_data = self._get(room)
+        if room_data.has_guessed(lex):
+            return -1
+        return room_data.append_guess(lex, username, is_hint)
+
+    def active_rooms(self) -> list[int]:
+        return [len(r.users) for r in self.rooms.values()]
+
+    def pop_expired(self, now: datetime) -> list[str]:
+        expired = []
+        while self.expiries and self.expiries[0][0] <= now:
+            end, room = heappop(self.expiries)
+            room_data = self.rooms.get(room)
+            if room_data is None or room_data.end != end:
+                continue
+            del self.rooms[room]
+            expired.append(room)
+        return expired
+
+
+class RedisRoomStore(RoomStore):
+    """Rooms kept in Redis, or anything speaking its protocol
+
+    Each room has a meta hash, a users hash of sid to user id, a names list
+    and a name_ids hash interning usernames, a set of guessed lexes, a
+    list of guesses as `user_id:is_hint:lex` and a counts hash of guesses
+    per user id. A sorted set of all rooms by
+    end time lets any worker sweep expired rooms.
+    """
+
+    def __init__(self, client: RespClient, prefix: str = 'wr'):
+        self.client = client
+        self.prefix = prefix
+        self.expiries_key = f'{prefix}:rooms'
+
+    def _key(self, room: str, part: str) -> str:
+        return f'{self.prefix}:room:{room}:{part}'
+
+    def _keys(self, room: str) -> list[str]:
+        return [
+            self._key(room, part)
+            for part in ('meta', 'users', 'names', 'name_ids', 'lexes',
+                         'guesses', 'counts')
+        ]
+
+    def _require(self, room: str) -> None:
+        if not self.exists(room):
+            raise CoopGameDoesNotExistError
+
+    def _user_id(self, room: str, username: str) -> int:
+        name_ids = self._key(room, 'name_ids')
+        user_id = self.client.execute('HGET', name_ids, username)
+        if user_id is not None:
+            return int(user_id)
+
+        user_id = self.client.execute(
+            'RPUSH', self._key(room, 'names'), username,
+        ) - 1
+        if not self.client.execute('HSETNX', name_ids, username, user_id):
+            # Someone else interned the name first, use theirs
+            return int(self.client.execute('HGET', name_ids, username))
+        return user_id
+
+    def _usernames(self, room: str) -> list[str]:
+        users, names = self.client.pipeline(
+            ('HVALS', self._key(room, 'users')),
+            ('LRANGE', self._key(room, 'names'), 0, -1),
+        )
+        return [names[int(user_id)].decode() for user_id in users]
+
+    def _backlog(self, room: str, since: int = 0) -> list[GUESS]:
+        guesses, names = self.client.pipeline(
+            ('LRANGE', self._key(room, 'guesses'), since, -1),
+            ('LRANGE', self._key(room, 'names'), 0, -1),
+        )
+        backlog = []
+        for guess in guesses:
+            user_id, is_hint, lex = guess.decode().split(':', 2)
+            backlog.append(
+                [lex, names[int(user_id)].decode(), is_hint == '1'],
+            )
+        return backlog
+
+    def create(
+        self,
+        room: str,
+        start: datetime,
+        end: datetime,
+        game_id: int,
+        sid: SID,
+        username: str,
+        lexes: list[tuple[str, bool]],
+        settings: dict[str, Any],
+    ) -> list[GUESS]:
+        keys = self._keys(room)
+        meta, users, names, name_ids, known, guesses, counts = keys
+        commands: list[tuple[Any, ...]] = [
+            ('DEL', *keys),
+            (
+                'HSET', meta,
+                'start', start.isoformat(),
+                'end', end.isoformat(),
+                'game_id', game_id,
+                'settings', json.dumps(settings),
+                'epoch', new_epoch(),
+            ),
+            ('HSET', users, sid, 0),
+            ('RPUSH', names, username),
+            ('HSET', name_ids, username, 0),
+        ]
+        if lexes:
+            commands.append(('SADD', known, *(lex for lex, _ in lexes)))
+            commands.append((
+                'RPUSH', guesses,
+                *(f'0:{int(is_hint)}:{lex}' for lex, is_hint in lexes),
+            ))
+            commands.append(('HSET', counts, 0, len(lexes)))
+        commands.append(('ZADD', self.expiries_key, end.timestamp(), room))
+        expire_at = int(end.timestamp()) + KEY_GRACE
+        commands.extend(('EXPIREAT', key, expire_at) for key in keys)
+        self.client.transaction(*commands)
+        return [[lex, username, is_hint] for lex, is_hint in lexes]
+
+    def exists(self, room: str) -> bool:
+        return bool(self.client.execute('EXISTS', self._key(room, 'meta')))
+
+    def user_count(self, room: str) -> int:
+        self._require(room)
+        return self.client.execute('HLEN', self._key(room, 'users'))
+
+    def epoch(self, room: str) -> str:
+        epoch = self.client.execute('HGET', self._key(room, 'meta'), 'epoch')
+        if epoch is None:
+            raise CoopGameDoesNotExistError
+        return epoch.decode()
+
+    def add_user(
+        self,
+        room: str,
+        sid: SID,
+        username: str,
+        since: int = 0,
+        epoch: Optional[str] = None,
+    ) -> tuple[list[str], list[GUESS], dict[str, Any], str, int]:
+        self._require(room)
+        users_key = self._key(room, 'users')
+        users, names = self.client.pipeline(
+            ('HGETALL', users_key),
+            ('LRANGE', self._key(room, 'names'), 0, -1),
+        )
+
+        # Remove others with same name
+        same_name = [
+            key for key, user_id in zip(users[::2], users[1::2])
+            if names[int(user_id)].decode() == username
+        ]
+        if same_name:
+            self.client.execute('HDEL', users_key, *same_name)
+
+        self.client.execute(
+            'HSET', users_key, sid, self._user_id(room, username),
+        )
+        (settings, room_epoch), length = self.client.pipeline(
+            ('HMGET', self._key(room, 'meta'), 'settings', 'epoch'),
+            ('LLEN', self._key(room, 'guesses')),
+        )
+        room_epoch = room_epoch.decode()
+        since = resume_index(since, epoch, room_epoch, length)
+        return (
+            self._usernames(room),
+            self._backlog(room, since),
+            json.loads(settings) if settings else {},
+            room_epoch,
+            since,
+        )
+
+    def remove_user(
+        self,
+        room: str,
+        sid: SID,
+    ) -> tuple[Optional[str], list[str]]:
+        self._require(room)
+        users_key = self._key(room, 'users')
+        user_id, _, names = self.client.pipeline(
+            ('HGET', users_key, sid),
+            ('HDEL', users_key, sid),
+            ('LRANGE', self._key(room, 'names'), 0, -1),
+        )
+        username = None if user_id is None else names[int(user_id)].decode()
+        return username, self._usernames(room)
+
+    def rename_user(self, room: str, sid: SID, username: str) -> None:
+        self._require(room)
+        users_key = self._key(room, 'users')
+        user_id = self.client.execute('HGET', users_key, sid)
+        if user_id is None:
+            self.client.execute(
+                'HSET', users_key, sid, self._user_id(room, username),
+            )
+            return
+
+        names = self._key(room, 'names')
+        name_ids = self._key(room, 'name_ids')
+        old_name, count = self.client.pipeline(
+            ('LINDEX', names, user_id),
+            ('HGET', self._key(room, 'counts'), user_id),
+        )
+        if old_name.decode() == username:
+            return
+
+        old_id = self.client.execute('HGET', name_ids, old_name)
+        commands: list[tuple[Any, ...]] = [
+            ('LSET', names, user_id, username),
+            ('HSET', name_ids, username, user_id),
+        ]
+        if old_id == user_id:
+            commands.insert(0, ('HDEL', name_ids, old_name))
+        if count is not None and int(count):
+            # Sent guesses show the old name, cursors into them are stale
+            commands.append(
+                ('HSET', self._key(room, 'meta'), 'epoch', new_epoch()),
+            )
+        self.client.transaction(*commands)
+
+    def room_data(self, room: str) -> tuple[datetime, datetime, int]:
+        start, end, game_id = self.client.execute(
+            'HMGET', self._key(room, 'meta'), 'start', 'end', 'game_id',
+        )
+        if start is None:
+            raise CoopGameDoesNotExistError
+        return (
+            datetime.fromisoformat(start.decode()),
+            datetime.fromisoformat(end.decode()),
+            int(game_id),
+        )
+
+    def add_guess(
+        self,
+        room: str,
+        username: str,
+        lex: str,
+        is_hint: bool,
+    ) -> int:
+        self._require(room)
+        if not self.client.execute('SADD', self._key(room, 'lexes'), lex):
+            return -1
+
+        user_id = self._user_id(room, username)
+        length, _ = self.client.transaction(
+            (
+                'RPUSH', self._key(room, 'guesses'),
+                f'{user_id}:{int(is_hint)}:{lex}',
+            ),
+            ('HINCRBY', self._key(room, 'counts'), user_id, 1),
+        )
+        return length - 1
+
+    def active_rooms(self) -> list[int]:
+        rooms = self.client.execute('ZRANGE', self.expiries_key, 0, -1)
+        if not rooms:
+            return []
+        return self.client.pipeline(*(
+            ('HLEN', self._key(room.decode(), 'users')) for room in rooms
+        ))
+
+    def pop_expired(self, now: datetime) -> list[str]:
+        rooms = self.client.execute(
+            'ZRANGEBYSCORE', self.expiries_key, '-inf', now.timestamp(),
+        )
+        expired = []
+        for room in (r.decode() for r in rooms):
+            # Only the worker whose ZREM removed the room closes it
+            if self.client.execute('ZREM', self.expiries_key, room):
+                self.client.execute('DEL', *self._keys(room))
+                expired.append(room)
+        return expired
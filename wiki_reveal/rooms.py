@@ -1,75 +1,73 @@
-from dataclasses import dataclass
+import atexit
 from datetime import datetime, timedelta, timezone
+from functools import cache
 import logging
-from operator import attrgetter
-from typing import Any, Literal, Optional, Tuple, Union, cast
-from flask_socketio import close_room  # type: ignore
+import os
+from typing import Any, Callable, Optional
 from wiki_reveal.exceptions import CoopGameDoesNotExistError
 
-from wiki_reveal.game_id import SECONDS_PER_DAY, get_end_of_current
-
-SID = str
-GUESS = list[Any]
-ROOM_ATTRIBUTE = Literal[
-    'start', 'end', 'game_id', 'users', 'guesses', 'settings'
-]
-
-
-@dataclass
-class RoomData:
-    start: datetime
-    end: datetime
-    game_id: int
-    users: dict[SID, str]
-    guesses: list[GUESS]
-    settings: dict[str, Any]
-
-
-ROOMS: dict[str, RoomData] = {}
-
-
-def dest(
-    room_data: RoomData,
-    *attrs: ROOM_ATTRIBUTE,
-) -> Union[Tuple[Any], Any]:
-    """Returns the single attribute if one is requested, or all as a tuple"""
-    return attrgetter(*attrs)(room_data)
-
-
-def clear_old_coop_games():
-    keys = tuple(ROOMS.keys())
-    now = datetime.now(tz=timezone.utc)
-    for key in keys:
-        start, end = cast(
-            tuple[datetime, datetime],
-            dest(ROOMS[key], 'start', 'end'),
-        )
-        if (
-            (start - now).total_seconds() > SECONDS_PER_DAY
-            or (
-                end is not None
-                and (end - now).total_seconds() < 0
-            )
-        ):
-            del ROOMS[key]
+from wiki_reveal.game_id import get_end_of_current
+from wiki_reveal.resp import RespClient
+from wiki_reveal.room_journal import JournaledRoomStore, RoomJournal
+from wiki_reveal.room_store import (
+    GUESS, SID, MemoryRoomStore, RedisRoomStore, RoomStore,
+)
+
+SWEEP_INTERVAL = float(os.environ.get('WR_ROOM_SWEEP_SECONDS', 60))
+
+
+@cache
+def get_room_store() -> RoomStore:
+    url = os.environ.get('WR_REDIS')
+    if url:
+        logging.info(f'Keeping coop rooms in {url}')
+        return RedisRoomStore(RespClient(url))
+
+    journal_path = os.environ.get('WR_ROOM_JOURNAL')
+    if journal_path:
+        logging.info(f'Journaling coop rooms to {journal_path}')
+        store = JournaledRoomStore(RoomJournal(journal_path))
+        store.recover()
+        atexit.register(store.journal.close)
+        return store
+
+    return MemoryRoomStore()
+
+
+def pop_expired_rooms(now: Optional[datetime] = None) -> list[str]:
+    now = datetime.now(tz=timezone.utc) if now is None else now
+    return get_room_store().pop_expired(now)
+
+
+def sweep_rooms(
+    close: Callable[[str], Any],
+    sleep: Callable[[float], Any],
+    interval: float = SWEEP_INTERVAL,
+) -> None:
+    while True:
+        try:
+            expired = pop_expired_rooms()
+        except Exception:
+            logging.exception('Failed to look for expired rooms')
+            expired = []
+        for room in expired:
             try:
-                close_room(key)
-            except AttributeError:
-                pass
+                close(room)
+            except Exception:
+                logging.exception(f'Failed to close expired room {room}')
+        sleep(interval)
 
 
 def active_rooms() -> list[int]:
-    clear_old_coop_games()
-    return [len(r.users) for r in ROOMS.values()]
+    return get_room_store().active_rooms()
 
 
 def coop_game_exists(room: str) -> bool:
-    return room in ROOMS
+    return get_room_store().exists(room)
 
 
 def coop_game_is_full(room: str) -> bool:
-    users = ROOMS[room].users
-    return len(users) >= 16
+    return get_room_store().user_count(room) >= 16
 
 
 def add_coop_game(
@@ -83,77 +81,61 @@ def add_coop_game(
     settings: Optional[dict[str, Any]] = None
 ) -> list[GUESS]:
     start = datetime.now(tz=timezone.utc) if start is None else start
-    guesses = [[lex, username, is_hint] for lex, is_hint in lexes]
-    ROOMS[room] = RoomData(
+    end = (
+        get_end_of_current()
+        if duration is None
+        else start + timedelta(hours=duration)
+    )
+    return get_room_store().create(
+        room,
         start=start,
-        end=(
-            get_end_of_current()
-            if duration is None
-            else start + timedelta(hours=duration)
-        ),
+        end=end,
         game_id=game_id,
-        users={sid: username},
-        guesses=guesses,
+        sid=sid,
+        username=username,
+        lexes=lexes,
         settings=settings if settings else {},
     )
-    return guesses
 
 
 def add_coop_user(
     room: str,
     sid: SID,
     username: str,
-) -> tuple[list[str], list[GUESS], dict[str, Any]]:
+    since: int = 0,
+    epoch: Optional[str] = None,
+) -> tuple[list[str], list[GUESS], dict[str, Any], Optional[str], int]:
     if not coop_game_exists(room):
         logging.error('Attempted to add user to a non-existing rom')
-        return [], [], {}
+        return [], [], {}, None, 0
 
-    users, guesses, settings = cast(
-        tuple[dict[SID, str], list[GUESS], dict[str, Any]],
-        dest(ROOMS[room], 'users', 'guesses', 'settings'),
-    )
-
-    # Remove others with same name
-    for key in list(users.keys()):
-        if users[key] == username:
-            del users[key]
-
-    users[sid] = username
-    return list(users.values()), guesses, settings
+    return get_room_store().add_user(room, sid, username, since, epoch)
 
 
 def remove_coop_user(room: str, sid: SID) -> tuple[Optional[str], list[str]]:
     if not coop_game_exists(room):
         return None, []
 
-    users = ROOMS[room].users
-    username = users.get(sid)
-    try:
-        del users[sid]
-    except KeyError:
+    username, users = get_room_store().remove_user(room, sid)
+    if username is None:
         logging.warning(
             f'Attempted to remove a user that didn\'t exist from room {room}',
         )
-
-    return username, list(users.values())
+    return username, users
 
 
 def rename_user(room: str, sid: SID, username: str):
     if not coop_game_exists(room):
         return
 
-    users, guesses = cast(
-        tuple[dict[SID, str], list[GUESS]],
-        dest(ROOMS[room], 'users', 'guesses'),
-    )
-    old_name = users.get('sid')
-    users[sid] = username
+    get_room_store().rename_user(room, sid, username)
 
-    if old_name is not None:
-        for guess in guesses:
-            _, user, __ = guess
-            if user == old_name:
-                guess[1] = username
+
+def get_room_epoch(room: str) -> Optional[str]:
+    if not coop_game_exists(room):
+        return None
+
+    return get_room_store().epoch(room)
 
 
 def get_room_data(
@@ -162,19 +144,11 @@ def get_room_data(
     if not coop_game_exists(room):
         raise CoopGameDoesNotExistError
 
-    return cast(
-        tuple[datetime, datetime, int],
-        dest(ROOMS[room], 'start', 'end', 'game_id'),
-    )
+    return get_room_store().room_data(room)
 
 
 def add_coop_guess(room: str, username: str, lex: str, is_hint: bool) -> int:
     if not coop_game_exists(room):
         raise CoopGameDoesNotExistError
 
-    guesses = ROOMS[room].guesses
-    if any(guess == lex for guess, _, __ in guesses):
-        return -1
-
-    guesses.append([lex, username, is_hint])
-    return len(guesses) - 1
+    return get_room_store().add_guess(room, username, lex, is_hint)
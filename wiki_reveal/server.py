@@ -1,7 +1,7 @@
-from collections import defaultdict
-from datetime import datetime
-from functools import cache, lru_cache
-from hashlib import sha256
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import cache
+import gzip
 from http import HTTPStatus
 import logging
 import os
@@ -14,22 +14,42 @@ from flask_socketio import (  # type: ignore
 from typing import Any, Optional, cast, Union
 from flask import Flask, Response, abort, jsonify, request
 from wiki_reveal.about import get_about
-from wiki_reveal.exceptions import CoopGameDoesNotExistError, WikiError
+from wiki_reveal.archive import get_archive
+from wiki_reveal.broadcast import RoomBroadcaster
+from wiki_reveal.caching import (
+    PinSet, pinnable_lru_cache, single_flight, single_flight_stats,
+)
+from wiki_reveal.codec import (
+    CODECS, JSON, base_room, client_codec, codec_room, encode_message,
+    room_variants,
+)
+from wiki_reveal.compact import COMPACT_MIMETYPE, encode_page
+from wiki_reveal.exceptions import (
+    CoopGameDoesNotExistError, OffloadError, WikiError,
+)
 from wiki_reveal.game_id import (
-    get_game_id, get_start_and_end, get_start_of_current,
+    get_game_id, get_start_and_end, get_start_of_current, get_start_of_game,
 )
 from wiki_reveal.generate_name import generate_name
 from wiki_reveal.page_options import get_number_of_options
+from wiki_reveal.lexicon import PageLexicon
+from wiki_reveal.masked import MAX_REVEAL_LEXES, MaskedPage
+from wiki_reveal.payload import PageBody, PreparedPayload, cache_until
+from wiki_reveal.prefetch import RolloverPrefetcher
+from wiki_reveal.pubsub import RespManager
 from wiki_reveal.rooms import (
     active_rooms, add_coop_game, add_coop_guess, add_coop_user,
-    clear_old_coop_games,
-    coop_game_exists, coop_game_is_full, get_room_data, remove_coop_user,
-    rename_user,
+    coop_game_exists, coop_game_is_full, get_room_data, get_room_epoch,
+    get_room_store, remove_coop_user, rename_user, sweep_rooms,
 )
+from wiki_reveal.room_journal import JournaledRoomStore
+from wiki_reveal.startup import Startup
 
 from wiki_reveal.wiki import (
-    get_game_page_name, get_page, tokenize,
+    Page, get_game_page_name, get_page, tokenize,
 )
+from wiki_reveal.offload import offloader
+from wiki_reveal.visitors import VisitorCounter
 
 logging.basicConfig(
     level=int(os.environ.get("WR_LOGLEVEL", logging.INFO)),
@@ -48,10 +68,19 @@ def coors_or_none() -> Optional[list[str]]:
     return None
 
 
+def client_manager_or_none() -> Optional[RespManager]:
+    url = os.environ.get('WR_REDIS')
+    if url:
+        logging.info(f'Sharing socket messages through {url}')
+        return RespManager(url)
+    return None
+
+
 debug_ws = os.environ.get('WR_WS_DEBUG') is not None
 if debug_ws:
     logging.info('Will debug log web-socket traffic')
 
+startup = Startup()
 app = Flask('Wiki-Reveal')
 app.config['SECRET_KEY'] = token_urlsafe(16)
 
@@ -60,9 +89,37 @@ socketio = SocketIO(
     cors_allowed_origins=coors_or_none(),
     engineio_logger=debug_ws,
     logger=debug_ws,
+    client_manager=client_manager_or_none(),
 )
 
 
+# Codec of each socket connected to this process
+socket_codecs: dict[str, str] = {}
+
+
+def send_to_sid(message: dict[str, Any], sid: str) -> None:
+    send(encode_message(message, socket_codecs.get(sid)), to=sid)
+
+
+def send_to_room(message: dict[str, Any], room: str) -> None:
+    for codec in CODECS:
+        socketio.send(
+            encode_message(message, codec),
+            to=codec_room(room, codec),
+        )
+
+
+def close_coop_room(room: str) -> None:
+    for name in room_variants(room):
+        socketio.close_room(name)
+
+
+broadcaster = RoomBroadcaster(send_to_room)
+if broadcaster.enabled:
+    logging.info(f'Batching room messages every {broadcaster.interval}s')
+    socketio.start_background_task(broadcaster.run, socketio.sleep)
+
+
 def get_or(data: dict[str, Any], key: str, default: Any) -> Any:
     value = data.get(key)
     if value is None:
@@ -76,9 +133,21 @@ def get_sid(r: Any) -> str:
     raise ValueError
 
 
+@socketio.on('connect')
+def coop_on_connect(auth: Optional[dict[str, Any]] = None):
+    socket_codecs[get_sid(request)] = client_codec(auth)
+
+
+def join_coop_room(room: str, sid: str) -> None:
+    join_room(codec_room(room, socket_codecs.get(sid, JSON)))
+
+
+def leave_coop_room(room: str, sid: str) -> None:
+    leave_room(codec_room(room, socket_codecs.get(sid, JSON)))
+
+
 @socketio.on('create game')
 def coop_on_create(data: dict[str, Any]):
-    clear_old_coop_games()
     room = token_hex(16)
     username = get_or(data, 'username', generate_name())
     is_random = data['gameType'] == 'random'
@@ -94,23 +163,23 @@ def coop_on_create(data: dict[str, Any]):
     start: Optional[datetime] = None if is_random else get_start_of_current()
     duration = None if ends_today else data['expire']
     sid = get_sid(request)
-    join_room(room)
+    join_coop_room(room, sid)
     backlog = add_coop_game(
         room, game_id, sid, username, start, duration, guesses, settings,
     )
 
     logging.info(f'Created a game with id {room} ({game_id}) for {sid}')
 
-    send(
+    send_to_sid(
         {
             "type": 'CREATE',
             "room": room,
             "username": username,
             "backlog": backlog,
             "settings": settings,
+            "epoch": get_room_epoch(room),
         },
-        to=room,
-
+        sid,
     )
 
 
@@ -128,7 +197,7 @@ def coop_on_guess(data: dict[str, Any]):
         abort(HTTPStatus.BAD_REQUEST)
 
     if idx >= 0:
-        send(
+        broadcaster.broadcast(
             {
                 "type": 'GUESS',
                 "username": username,
@@ -136,8 +205,7 @@ def coop_on_guess(data: dict[str, Any]):
                 "index": idx,
                 "isHint": is_hint,
             },
-            to=room,
-
+            room,
         )
     else:
         logging.warn(
@@ -154,21 +222,22 @@ def coop_on_rename(data: dict[str, Any]):
 
     if room is not None:
         rename_user(room, sid, to_name)
-        send(
+        broadcaster.broadcast(
             {
                 "type": 'RENAME',
                 "from": from_name,
                 "to": to_name,
+                "epoch": get_room_epoch(room),
             },
-            to=room,
+            room,
         )
 
-    send(
+    send_to_sid(
         {
             "type": 'RENAME-ME',
             "to": to_name,
         },
-        to=sid,
+        sid,
     )
 
 
@@ -177,54 +246,66 @@ def coop_on_join(data: dict[str, Any]):
     username = get_or(data, 'username', generate_name())
     room = data['room']
     sid = get_sid(request)
+    # Rejoining clients tell how many guesses they have and from which epoch
+    since = data.get('sinceIndex')
+    since = since if isinstance(since, int) else 0
+    epoch = data.get('epoch')
+    epoch = epoch if isinstance(epoch, str) else None
 
     if not coop_game_exists(room):
-        send(
+        send_to_sid(
             {
                 "type": 'JOIN-FAIL',
                 "reason": 'Room does not exist',
             },
-            to=sid,
+            sid,
         )
     elif coop_game_is_full(room):
-        send(
+        send_to_sid(
             {
                 "type": 'JOIN-FAIL',
                 "reason": 'Room is full',
             },
-            to=sid,
+            sid,
         )
     else:
-        users, backlog, settings = add_coop_user(room, sid, username)
-        send(
+        users, backlog, settings, epoch, since = add_coop_user(
+            room, sid, username, since, epoch,
+        )
+        broadcaster.broadcast(
             {
                 "type": 'JOIN',
                 "name": username,
                 "users": users,
             },
-            to=room,
+            room,
         )
+        # Whatever is queued for the room is in the backlog or is the join
+        # itself, neither of which the joiner should get again
+        broadcaster.flush_room(room)
 
-        join_room(room)
+        join_coop_room(room, sid)
 
         if username != data.get('username'):
-            send(
+            send_to_sid(
                 {
                     "type": 'RENAME-ME',
                     "to": username,
                 },
-                to=sid,
+                sid,
             )
 
-        send(
+        send_to_sid(
             {
                 "type": "JOIN-ME",
                 "room": room,
                 "users": users,
                 "backlog": backlog,
                 "settings": settings,
+                "epoch": epoch,
+                "sinceIndex": since,
             },
-            to=sid
+            sid,
         )
 
 
@@ -234,37 +315,39 @@ def coop_on_leave(data: dict[str, Any]):
     room = data['room']
     sid = get_sid(request)
 
-    leave_room(room)
+    leave_coop_room(room, sid)
 
     if (username):
-        send(
+        broadcaster.broadcast(
             {
                 "type": 'LEAVE',
                 "name": username,
                 "users": remove_coop_user(room, sid),
             },
-            to=room,
+            room,
         )
 
-    send({"type": "LEAVE-ME"}, to=sid)
+    send_to_sid({"type": "LEAVE-ME"}, sid)
 
 
 @socketio.on('disconnect')
 def coop_on_disconnect():
     sid = get_sid(request)
 
-    for room in rooms(sid):
+    for name in rooms(sid):
+        room = base_room(name)
         username, users = remove_coop_user(room, sid)
         if username is not None:
-            send(
+            broadcaster.broadcast(
                 {
                     "type": 'LEAVE',
                     "name": username,
                     "users": users,
                 },
-                to=room,
+                room,
             )
-        leave_room(room)
+        leave_room(name)
+    socket_codecs.pop(sid, None)
 
 
 @app.get('/api/test.txt')
@@ -272,14 +355,49 @@ def root():
     return Response("""Yes,\nthe server is online.\n""")
 
 
-@lru_cache(maxsize=256)
-def get_page_payload(
-    language: str,
-    game_id: int,
-) -> dict[str, Any]:
-    start, end = get_start_and_end(game_id)
+@app.get('/api/ready')
+def ready():
+    """Only ready once today's page can be served without fetching it
+
+    Warm or not, every format of the page is prepared from the cached page.
+    """
+    game_id = get_game_id()
+    is_ready = get_page.is_cached(get_game_page_name(game_id), language='en')
+    response = jsonify({
+        'ready': is_ready,
+        'gameId': game_id,
+        'prefetch': prefetcher.status.to_json(),
+    })
+    response.status_code = (
+        HTTPStatus.OK if is_ready else HTTPStatus.SERVICE_UNAVAILABLE
+    )
+    response.cache_control.no_store = True
+    return response
+
+
+PAGE_FORMATS = ('json', 'compact', 'masked')
+
+
+def wants_compact() -> bool:
+    return request.args.get('format') == 'compact' or any(
+        mimetype == COMPACT_MIMETYPE
+        for mimetype in request.accept_mimetypes.values()
+    )
+
+
+def requested_format() -> str:
+    if request.args.get('format') == 'masked':
+        return 'masked'
+    return 'compact' if wants_compact() else 'json'
+
+
+def load_game_page(language: str, game_id: int) -> tuple[str, Page]:
     try:
         page_name = get_game_page_name(game_id)
+        return page_name, get_page(page_name, language=language)
+    except OffloadError:
+        logging.exception('Could not load game page in time')
+        abort(HTTPStatus.SERVICE_UNAVAILABLE)
     except WikiError:
         logging.exception('Could not load game page')
         abort(HTTPStatus.INTERNAL_SERVER_ERROR)
@@ -287,25 +405,124 @@ def get_page_payload(
         logging.exception('Unexpected error occured')
         abort(HTTPStatus.INTERNAL_SERVER_ERROR)
 
-    return {
-      'start': start,
-      'end': end,
+
+@pinnable_lru_cache(maxsize=64)
+@single_flight()
+def get_masked_page(language: str, game_id: int) -> MaskedPage:
+    _, page = load_game_page(language, game_id)
+    return MaskedPage(page, language)
+
+
+@pinnable_lru_cache(maxsize=64)
+@single_flight()
+def get_page_lexicon(language: str, game_id: int) -> PageLexicon:
+    _, page = load_game_page(language, game_id)
+    return PageLexicon(page, language)
+
+
+@pinnable_lru_cache(maxsize=64)
+def get_prepared_lexicon(language: str, game_id: int) -> PreparedPayload:
+    return PreparedPayload(PageBody({
+        'language': language,
+        'gameId': game_id,
+        **get_page_lexicon(language, game_id).to_json(),
+    }))
+
+
+@pinnable_lru_cache(maxsize=256)
+@single_flight()
+def get_page_payload(
+    language: str,
+    game_id: int,
+    page_format: str = 'json',
+) -> PageBody:
+    if page_format == 'masked':
+        # The page name would give the game away
+        return PageBody({
+            'language': language,
+            'gameId': game_id,
+            'page': get_masked_page(language, game_id).json,
+        })
+
+    page_name, page = load_game_page(language, game_id)
+    return PageBody({
       'language': language,
       'gameId': game_id,
       'pageName': page_name,
-      'page': get_page(
-          page_name,
-          language=language,
-      ).to_json(),
-    }
+      'page': encode_page(page) if page_format == 'compact' else page.to_json(),
+    })
+
+
+@pinnable_lru_cache(maxsize=64)
+def get_prepared_page(
+    language: str,
+    game_id: int,
+    page_format: str,
+) -> PreparedPayload:
+    start, end = get_start_and_end(game_id)
+    overlay: dict[str, Any] = {'start': start, 'end': end}
+    if game_id > 0:
+        yesterday = get_game_page_name(game_id - 1)
+        overlay['yesterdaysPage'] = yesterday
+        overlay['yesterdaysTitle'] = tuple(
+            tokenize(yesterday.replace('_', ' ')),
+        )
+    return PreparedPayload(
+        get_page_payload(language, game_id, page_format),
+        overlay,
+    )
+
+
+@pinnable_lru_cache(maxsize=64)
+def get_prepared_yesterday(
+    language: str,
+    game_id: int,
+    page_format: str,
+) -> PreparedPayload:
+    start, end = get_start_and_end(game_id)
+    return PreparedPayload(
+        get_page_payload(language, game_id, page_format),
+        {'start': start, 'end': end, 'isYesterday': True},
+    )
+
+
+def warm_games(game_ids: list[int]) -> None:
+    pins = PinSet((
+        get_prepared_page, get_prepared_yesterday, get_page_payload,
+        get_masked_page, get_prepared_lexicon, get_page_lexicon, get_page,
+    ))
+    for game_id in game_ids:
+        pins.pin(get_page, get_game_page_name(game_id), language='en')
+        pins.pin(get_masked_page, 'en', game_id)
+        pins.pin(get_page_lexicon, 'en', game_id)
+        pins.pin(get_prepared_lexicon, 'en', game_id).precompress()
+        for page_format in PAGE_FORMATS:
+            pins.pin(get_page_payload, 'en', game_id, page_format)
+            pins.pin(
+                get_prepared_page, 'en', game_id, page_format,
+            ).precompress()
+            pins.pin(
+                get_prepared_yesterday, 'en', game_id, page_format,
+            ).precompress()
+    # Games no longer wanted are released only once all new ones are warm
+    pins.swap()
+
+
+prefetcher = RolloverPrefetcher(
+    warm_games,
+    timedelta(minutes=int(os.environ.get('WR_PREFETCH_MINUTES', 15))),
+    socketio.sleep,
+    startup.ready,
+)
+socketio.start_background_task(prefetcher.run)
+socketio.start_background_task(sweep_rooms, close_coop_room, socketio.sleep)
+if isinstance(room_store := get_room_store(), JournaledRoomStore):
+    socketio.start_background_task(room_store.run_journal, socketio.sleep)
 
 
 @cache
-def visitor_stats():
-    return {
-        'solo': defaultdict(set),
-        'coop': set()
-    }
+def visitor_stats() -> VisitorCounter:
+    return VisitorCounter()
 
 
 def add_visitor(
@@ -319,12 +536,19 @@ def add_visitor(
             ip = ip[0]
         else:
             ip = ''
-    digest = sha256(cast(str, ip).encode()).hexdigest()[::2]
+    visitors.add(cast(str, ip), is_coop, game_id)
 
-    if is_coop:
-        visitors['coop'].add(digest)
-    else:
-        visitors['solo'][game_id].add(digest)
+
+@app.get('/api/yesterday/lexicon')
+@app.get('/api/yesterday/lexicon/<language>')
+def yesterday_lexicon(language: str = 'en'):
+    current_id = get_game_id() - 1
+    if (current_id < 0):
+        abort(HTTPStatus.BAD_REQUEST)
+
+    return get_prepared_lexicon(language, current_id).response(
+        request, get_start_of_game(current_id + 2),
+    )
 
 
 @app.get('/api/yesterday')
@@ -345,10 +569,18 @@ def yesterday(language: str = 'en'):
         f'Request for yesterday\'s game with id {current_id} ({language})',
     )
 
-    response_data = get_page_payload(language, current_id)
-    response_data['isYesterday'] = True
+    return get_prepared_yesterday(
+        language, current_id, requested_format(),
+    ).response(request, get_start_of_game(current_id + 2))
 
-    return jsonify(response_data)
+
+@app.get('/api/page/lexicon')
+@app.get('/api/page/lexicon/<language>')
+def page_lexicon(language: str = 'en'):
+    current_id = get_game_id()
+    return get_prepared_lexicon(language, current_id).response(
+        request, get_start_of_game(current_id + 1),
+    )
 
 
 @app.get('/api/page')
@@ -361,16 +593,9 @@ def page(language: str = 'en'):
         ip = request.remote_addr
     add_visitor(ip, False, current_id)
 
-    response_data = get_page_payload(language, current_id)
-
-    if current_id > 0:
-        yesterday = get_game_page_name(current_id - 1)
-        response_data['yesterdaysPage'] = yesterday
-        response_data['yesterdaysTitle'] = tuple(
-            tokenize(yesterday.replace('_', ' ')),
-        )
-
-    return jsonify(response_data)
+    return get_prepared_page(
+        language, current_id, requested_format(),
+    ).response(request, get_start_of_game(current_id + 1))
 
 
 @app.get('/api/coop/<room>')
@@ -384,13 +609,101 @@ def coop_room(room: str):
         ip = request.remote_addr
     add_visitor(ip, True)
 
-    response_data = get_page_payload('en', game_id)
-    response_data['start'] = start.isoformat().replace(' ', 'T')
+    _, end = get_start_and_end(game_id)
     if override_end is not None:
-        response_data['end'] = override_end.isoformat().replace(' ', 'T')
+        end = override_end.isoformat().replace(' ', 'T')
+
+    return PreparedPayload(
+        get_page_payload('en', game_id, requested_format()),
+        {'start': start.isoformat().replace(' ', 'T'), 'end': end},
+        offer_brotli=False,
+    ).response(request)
+
 
-    return jsonify(response_data)
 
+@app.get('/api/coop/<room>/lexicon')
+def coop_lexicon(room: str):
+    try:
+        _, _, game_id = get_room_data(room)
+    except CoopGameDoesNotExistError:
+        abort(HTTPStatus.BAD_REQUEST)
+
+    return get_prepared_lexicon('en', game_id).response(request)
+
+
+def reveal_lexes(lexes: Any) -> list[str]:
+    if (
+        not isinstance(lexes, list)
+        or not 0 < len(lexes) <= MAX_REVEAL_LEXES
+        or not all(isinstance(lex, str) for lex in lexes)
+    ):
+        abort(HTTPStatus.BAD_REQUEST)
+    return lexes
+
+
+@app.get('/api/reveal/<int:game_id>')
+@app.get('/api/reveal/<int:game_id>/<language>')
+def reveal(game_id: int, language: str = 'en'):
+    # Coop games may be any game, those reveal through their room instead
+    if not 0 <= game_id <= get_game_id():
+        abort(HTTPStatus.NOT_FOUND)
+
+    lexes = reveal_lexes(request.args.getlist('lex'))
+    response = jsonify({
+        'gameId': game_id,
+        'reveals': get_masked_page(language, game_id).reveal(lexes),
+    })
+    cache_until(response, get_start_of_game(get_game_id() + 1))
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@socketio.on('reveal')
+def coop_on_reveal(data: dict[str, Any]):
+    try:
+        _, _, game_id = get_room_data(data['room'])
+    except CoopGameDoesNotExistError:
+        abort(HTTPStatus.BAD_REQUEST)
+
+    lexes = reveal_lexes(data.get('lexes'))
+    return {
+        'gameId': game_id,
+        'reveals': get_masked_page('en', game_id).reveal(lexes),
+    }
+
+
+# Past games never change, browsers may keep them for a year
+ARCHIVE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@app.get('/api/archive/<int:game_id>')
+@app.get('/api/archive/<int:game_id>/<language>')
+def archived_game(game_id: int, language: str = 'en'):
+    if not 0 <= game_id < get_game_id():
+        abort(HTTPStatus.NOT_FOUND)
+    archive = get_archive(language)
+    game = archive.get(game_id) if archive is not None else None
+    if game is None:
+        abort(HTTPStatus.NOT_FOUND)
+
+    encoding = 'gzip' if request.accept_encodings['gzip'] else None
+    etags = [game.variant_etag(e) for e in (None, 'gzip')]
+    if any(request.if_none_match.contains(etag) for etag in etags):
+        response = Response(status=HTTPStatus.NOT_MODIFIED)
+    elif encoding == 'gzip':
+        response = Response(game.gzip, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(
+            gzip.decompress(game.gzip),
+            mimetype='application/json',
+        )
+    response.set_etag(game.variant_etag(encoding))
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.cache_control.max_age = ARCHIVE_MAX_AGE
+    return response
 
 
 @app.get('/api/about')
@@ -403,15 +716,26 @@ boot_day = get_game_id()
 
 @app.get('/api/stats')
 def stats():
+    # Not imported before the first page had to be fetched
+    from wiki_reveal.wiki_clients import client_stats
+
     visitors = visitor_stats()
 
     return jsonify({
         'info': 'Stats since last reboot',
         'bootWas': boot_day,
         'todayIs': get_game_id(),
-        'coop': len(visitors['coop']),
+        'coop': visitors.coop_count(),
         'coopActiveGames': active_rooms(),
-        'solo': {
-            game_id: len(users) for game_id, users in visitors['solo'].items()
-        },
+        'prefetch': prefetcher.status.to_json(),
+        'startup': startup.to_json(),
+        'singleFlight': single_flight_stats(),
+        'wikiClients': client_stats(),
+        'offload': offloader.stats(),
+        'broadcast': broadcaster.stats(),
+        'socketCodecs': dict(Counter(socket_codecs.values())),
+        'solo': visitors.solo_counts(),
     })
+
+
+startup.imported()
@@ -0,0 +1,137 @@
+from argparse import ArgumentParser
+from dataclasses import dataclass
+import logging
+import os
+import re
+import subprocess
+import sys
+from time import monotonic
+from typing import Any, Callable, Optional
+
+from wiki_reveal import IMPORT_STARTED
+
+STARTUP_BUDGET = float(os.environ.get('WR_STARTUP_BUDGET_MS', 1500)) / 1000
+
+# Imported like the gunicorn eventlet worker does, since without green
+# threads the first warm of today's game blocks the import
+_PROFILED_IMPORT = (
+    'import eventlet; eventlet.monkey_patch(); '
+    'import os, wiki_reveal.server; os._exit(0)'
+)
+_IMPORT_TIME = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$',
+)
+
+
+class Startup:
+    """Times the app from its first import until it is ready to serve
+
+    Importing is checked against the budget so slow imports are noticed in
+    the logs. Ready is when the worker first has today's payloads warm.
+    """
+
+    def __init__(
+        self,
+        budget: float = STARTUP_BUDGET,
+        started: float = IMPORT_STARTED,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.budget = budget
+        self.started = started
+        self.clock = clock
+        self.import_duration: Optional[float] = None
+        self.ready_after: Optional[float] = None
+
+    def imported(self) -> float:
+        self.import_duration = self.clock() - self.started
+        if self.import_duration > self.budget:
+            logging.warning(
+                f'Imported in {self.import_duration:.2f}s,'
+                f' over the budget of {self.budget:.2f}s',
+            )
+        else:
+            logging.info(f'Imported in {self.import_duration:.2f}s')
+        return self.import_duration
+
+    def ready(self) -> None:
+        if self.ready_after is None:
+            self.ready_after = self.clock() - self.started
+            logging.info(f'Ready to serve after {self.ready_after:.2f}s')
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'budget': self.budget,
+            'imported': self.import_duration,
+            'readyAfter': self.ready_after,
+        }
+
+
+@dataclass
+class ImportTime:
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_times(output: str) -> list[ImportTime]:
+    """Reads the report of `python -X importtime`"""
+    times = []
+    for line in output.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        times.append(ImportTime(
+            module, len(indent) // 2, int(self_us), int(cumulative_us),
+        ))
+    return times
+
+
+def profile_import() -> list[ImportTime]:
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROFILED_IMPORT],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_import_times(result.stderr)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = ArgumentParser(
+        prog='python -m wiki_reveal.startup',
+        description='Profile importing the server against the startup budget',
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=15,
+        help='Number of slowest top level imports to list',
+    )
+    args = parser.parse_args(argv)
+
+    times = profile_import()
+    end = next(
+        i for i, t in enumerate(times) if t.module == 'wiki_reveal.server'
+    )
+    server = times[end]
+    # A module is reported after its imports, so the server's come right
+    # before it
+    start = max(
+        (i + 1 for i, t in enumerate(times[:end]) if t.depth == 0),
+        default=0,
+    )
+    direct = [t for t in times[start:end] if t.depth == 1]
+    for t in sorted(direct, key=lambda t: -t.cumulative_us)[:args.top]:
+        print(f'{t.cumulative_us / 1000:9.1f} ms  {t.module}')
+    print(f'{server.self_us / 1000:9.1f} ms  wiki_reveal.server itself')
+
+    total = server.cumulative_us / 1e6
+    print(f'Imported in {total:.2f}s, budget {STARTUP_BUDGET:.2f}s')
+    if total > STARTUP_BUDGET:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
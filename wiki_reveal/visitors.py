@@ -0,0 +1,114 @@
+from collections import Counter
+from hashlib import sha256
+import math
+import os
+
+ERROR_BOUND = float(os.environ.get('WR_VISITOR_ERROR', 0.01))
+KEEP_GAMES = int(os.environ.get('WR_VISITOR_GAMES', 30))
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def precision_for(error: float) -> int:
+    """Smallest precision whose standard error is within the bound"""
+    registers = (1.04 / error) ** 2
+    precision = math.ceil(math.log2(registers))
+    return min(MAX_PRECISION, max(MIN_PRECISION, precision))
+
+
+def hash_visitor(visitor: str) -> int:
+    return int.from_bytes(sha256(visitor.encode()).digest()[:8], 'big')
+
+
+class HyperLogLog:
+    """Estimates the number of distinct items in a fixed amount of memory
+
+    Uses 2 ** precision one byte registers, standard error 1.04 / sqrt(m).
+    """
+
+    def __init__(self, precision: int):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f'Precision must be in [4, 16], got {precision}')
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    @property
+    def error(self) -> float:
+        return 1.04 / math.sqrt(self.size)
+
+    def add_hash(self, value: int) -> None:
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, visitor: str) -> None:
+        self.add_hash(hash_visitor(visitor))
+
+    def count(self) -> int:
+        m = self.size
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+
+        ranks = Counter(self.registers)
+        estimate = alpha * m * m / sum(
+            count * 2.0 ** -rank for rank, count in ranks.items()
+        )
+        zeros = ranks[0]
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+class VisitorCounter:
+    """Per game and coop visitor sketches, only keeping the latest games"""
+
+    def __init__(
+        self,
+        error: float = ERROR_BOUND,
+        keep_games: int = KEEP_GAMES,
+    ):
+        self.precision = precision_for(error)
+        self.keep_games = keep_games
+        self.coop = HyperLogLog(self.precision)
+        self.solo: dict[int, HyperLogLog] = {}
+
+    def add(self, visitor: str, is_coop: bool, game_id: int = 0) -> None:
+        if is_coop:
+            self.coop.add(visitor)
+            return
+
+        sketch = self.solo.get(game_id)
+        if sketch is None:
+            if self.solo and game_id < min(self.solo) and self.full():
+                return
+            sketch = self.solo[game_id] = HyperLogLog(self.precision)
+            self.rotate()
+        sketch.add(visitor)
+
+    def full(self) -> bool:
+        return len(self.solo) >= self.keep_games
+
+    def rotate(self) -> None:
+        for game_id in sorted(self.solo)[:-self.keep_games or None]:
+            del self.solo[game_id]
+
+    def coop_count(self) -> int:
+        return self.coop.count()
+
+    def solo_counts(self) -> dict[int, int]:
+        return {
+            game_id: sketch.count() for game_id, sketch in self.solo.items()
+        }
+
+    def memory(self) -> int:
+        return (1 + len(self.solo)) * (1 << self.precision)
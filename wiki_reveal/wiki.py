@@ -1,31 +1,32 @@
 from collections.abc import Iterator
 from functools import lru_cache
-from typing import Union
+from typing import TYPE_CHECKING, Any, Union
 from dataclasses import asdict, dataclass
 import re
 import logging
-import requests
 from typing import Optional
-from requests.exceptions import JSONDecodeError
-from wikipediaapi import (  # type: ignore
-    Wikipedia, WikipediaPage, WikipediaPageSection,
-)
 
-from wiki_reveal.exceptions import (
-    FailedToSelectPageError, NoSuchPageError, ParsingFailedError,
-)
-from wiki_reveal.nicer_random import randomize_titles
+from wiki_reveal.caching import pinnable_lru_cache, single_flight
+from wiki_reveal.exceptions import NoSuchPageError
+from wiki_reveal.game_order import get_game_title
+from wiki_reveal.offload import offloader
+from wiki_reveal.page_store import get_page_store
 from wiki_reveal.parser import EQUATION_TAG, clean_lines
 
+if TYPE_CHECKING:
+    from wikipediaapi import (  # type: ignore
+        WikipediaPage, WikipediaPageSection,
+    )
+
 tokenizer = re.compile(
     r'[             \t\n\r\v\f:;,.⋯…<>/\\~`\'ˈ"!?@#$%^&*°()[\]{}|=+-\-–—− _→?\‑]+',  # noqa: E501
 )
 Token = tuple[Optional[str], bool]
 Paragraph = tuple[Token, ...]
+Extract = dict[str, Any]
 
-logging.info('Preloading ranomized articles')
-randomize_titles()
-logging.info('Article order preloaded')
+# Bump when the tokenization changes so stored pages get re-tokenized
+TOKENIZER_VERSION = 1
 
 
 @dataclass
@@ -38,6 +39,15 @@ class Section:
     def to_json(self) -> dict:
         return asdict(self)
 
+    @classmethod
+    def from_json(cls, data: dict) -> "Section":
+        return cls(
+            title=paragraph_from_json(data['title']),
+            depth=data['depth'],
+            paragraphs=paragraph_from_json(data['paragraphs']),
+            sections=tuple(cls.from_json(s) for s in data['sections']),
+        )
+
 
 @dataclass
 class Page:
@@ -48,117 +58,153 @@ class Page:
     def to_json(self) -> dict:
         return asdict(self)
 
+    @classmethod
+    def from_json(cls, data: dict) -> "Page":
+        return cls(
+            title=paragraph_from_json(data['title']),
+            summary=paragraph_from_json(data['summary']),
+            sections=tuple(Section.from_json(s) for s in data['sections']),
+        )
+
+
+@lru_cache(maxsize=1024)
+def _separator_token(non_word: str) -> Token:
+    return (non_word, False)
+
+
+def paragraph_from_json(data: list[list[Any]]) -> Paragraph:
+    return tuple(
+        _separator_token(token) if token is not None and not is_hidden
+        else (token, is_hidden)
+        for token, is_hidden in data
+    )
+
+
+def _word_tokens(word: str) -> Iterator[Token]:
+    if EQUATION_TAG == word:
+        yield (None, False)
+    elif EQUATION_TAG in word:
+        for part in word.split(EQUATION_TAG):
+            if part:
+                yield (part, True)
+            else:
+                yield (None, False)
+    else:
+        yield (word, True)
+
 
 def tokenize(data: str) -> Iterator[Token]:
     data = clean_lines(data)
-    non_words = tokenizer.findall(data)
-    i = 0
-    non_words_count = len(non_words)
-
-    while data and i < non_words_count:
-        non_word = non_words[i]
-
-        try:
-            nw_idx = data.index(non_word)
-        except (IndexError, ValueError):
-            logging.error(f'Could not find "{non_word}" in "{data}" ({i})')
-            raise ParsingFailedError
-
-        if nw_idx == 0:
-            yield (non_word, False)
-            data = data[len(non_word):]
-        else:
-            token = data[: nw_idx]
-            if EQUATION_TAG == token:
-                yield (None, False)
-            elif EQUATION_TAG in token:
-                for part in token.split(EQUATION_TAG):
-                    if part:
-                        yield (part, True)
-                    else:
-                        yield (None, False)
-            else:
-                yield (token, True)
-            yield (non_word, False)
-            data = data[nw_idx + len(non_word):]
-        i += 1
+    word_start = 0
+
+    for match in tokenizer.finditer(data):
+        nw_idx = match.start()
+        if nw_idx > word_start:
+            yield from _word_tokens(data[word_start: nw_idx])
+        yield _separator_token(match.group())
+        word_start = match.end()
+
+    if word_start < len(data):
+        yield from _word_tokens(data[word_start:])
 
-    if data:
-        if EQUATION_TAG == data:
-            yield (None, False)
-        elif EQUATION_TAG in data:
-            for part in data.split(EQUATION_TAG):
-                if part:
-                    yield (part, True)
-                else:
-                    yield (None, False)
-        else:
-            yield (data, True)
 
+AnyWikiPart = Union['WikipediaPage', 'WikipediaPageSection']
 
-AnyWikiPart = Union[WikipediaPage, WikipediaPageSection]
+
+def extract_sections(page: AnyWikiPart) -> list[Extract]:
+    return [
+        {
+            'title': section.title,
+            'text': section.text,
+            'sections': extract_sections(section),
+        }
+        for section in page.sections
+    ]
 
 
 def unwrap_sections(
-    page: AnyWikiPart,
+    sections: list[Extract],
     *,
     depth: int = 0,
 ) -> tuple[Section, ...]:
-    def parse_section(section: WikipediaPageSection) -> Section:
+    def parse_section(section: Extract) -> Section:
         return Section(
-            title=tuple(tokenize(section.title)),
+            title=tuple(tokenize(section['title'])),
             depth=depth,
-            paragraphs=tuple(tokenize(section.text)),
-            sections=unwrap_sections(section, depth=depth + 1)
+            paragraphs=tuple(tokenize(section['text'])),
+            sections=unwrap_sections(section['sections'], depth=depth + 1)
         )
 
-    return tuple(parse_section(section) for section in page.sections)
-
-
+    return tuple(parse_section(section) for section in sections)
 
-def patch_session(wiki: Wikipedia) -> bool:
-    if not hasattr(wiki, '_session'):
-        return False
 
-    if not 'requests.sessions.Session' in repr(wiki._session):
-        return False
+def parse_extract(extract: Extract) -> Page:
+    return Page(
+        title=tuple(tokenize(extract['title'].replace('_', ' '))),
+        summary=tuple(tokenize(extract['summary'])),
+        sections=unwrap_sections(extract['sections']),
+    )
 
-    logging.info('Patched in new session')
-    wiki._session = requests.session()
-    return True
 
+def fetch_extract(page_name: str, language: str) -> tuple[Extract, int]:
+    # The Wikipedia client is only needed once a page is not stored
+    from requests.exceptions import JSONDecodeError
+    from wiki_reveal.wiki_clients import get_wiki
 
-@lru_cache(maxsize=256)
-def get_page(
-    page_name: str,
-    *,
-    language: str = 'en',
-) -> Page:
-    wiki = Wikipedia(language)
-    page = wiki.page(page_name)
+    page = get_wiki(language).page(page_name)
     try:
         if not page.exists():
             raise NoSuchPageError
     except JSONDecodeError:
         logging.error(f"Failed to load '{page_name}'")
+        raise NoSuchPageError
+
+    extract = {
+        'title': page.title,
+        'summary': page.summary,
+        'sections': extract_sections(page),
+    }
+    return extract, page.lastrevid or 0
+
+
+def load_page(page_name: str, language: str) -> Page:
+    store = get_page_store()
+    if store is not None:
+        stored = store.get(page_name, language)
+        if stored is not None:
+            if (
+                stored.tokenizer_version == TOKENIZER_VERSION
+                and stored.page is not None
+            ):
+                return Page.from_json(stored.page)
+
+            logging.info(f"Re-tokenizing stored '{page_name}' ({language})")
+            page = parse_extract(stored.extract)
+            store.put(
+                page_name, language, stored.revision, stored.extract,
+                page.to_json(), TOKENIZER_VERSION,
+            )
+            return page
+
+    extract, revision = fetch_extract(page_name, language)
+    page = parse_extract(extract)
+    if store is not None:
+        store.put(
+            page_name, language, revision, extract, page.to_json(),
+            TOKENIZER_VERSION,
+        )
+    return page
 
-        if patch_session(wiki):
-            page = wiki.page(page_name)
-        else:
-            raise NoSuchPageError
 
-    return Page(
-        title=tuple(tokenize(page.title.replace('_', ' '))),
-        summary=tuple(tokenize(page.summary)),
-        sections=unwrap_sections(page)
-    )
+@pinnable_lru_cache(maxsize=256)
+@single_flight()
+def get_page(
+    page_name: str,
+    *,
+    language: str = 'en',
+) -> Page:
+    return offloader.run(load_page, page_name, language)
 
 
-@lru_cache(maxsize=256)
 def get_game_page_name(game_id: int) -> str:
-    options = randomize_titles()
-    page = options[game_id % len(options)]
-    if page is None:
-        raise FailedToSelectPageError
-
-    return page.replace(' ', '_')
+    return get_game_title(game_id).replace(' ', '_')
@@ -0,0 +1,164 @@
+from dataclasses import dataclass
+import logging
+import os
+from typing import Any, Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, JSONDecodeError
+from urllib3.util.retry import Retry
+from wikipediaapi import Wikipedia, WikipediaPage  # type: ignore
+
+from wiki_reveal.offload import native_lock
+
+WIKI_API_URL = os.environ.get(
+    'WR_WIKI_API', 'https://{language}.wikipedia.org/w/api.php',
+)
+POOL_SIZE = int(os.environ.get('WR_WIKI_POOL_SIZE', 8))
+TIMEOUT = float(os.environ.get('WR_WIKI_TIMEOUT', 10))
+RETRIES = int(os.environ.get('WR_WIKI_RETRIES', 3))
+USER_AGENT = 'Wiki-Reveal (https://github.com/local-minimum/wiki-reveal)'
+
+
+def create_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=Retry(
+            total=RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=('GET',),
+        ),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def count_connections(session: requests.Session) -> tuple[int, int]:
+    """Returns number of requests and of opened connections"""
+    requests_made = 0
+    connections = 0
+    adapters = {id(a): a for a in session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            requests_made += pool.num_requests
+            connections += pool.num_connections
+    return requests_made, connections
+
+
+@dataclass
+class ClientStats:
+    requests: int = 0
+    connections: int = 0
+    replaced_sessions: int = 0
+
+    @property
+    def reused(self) -> int:
+        return self.requests - self.connections
+
+    def to_json(self) -> dict[str, int]:
+        return {
+            'requests': self.requests,
+            'connections': self.connections,
+            'reused': self.reused,
+            'replacedSessions': self.replaced_sessions,
+        }
+
+
+class PooledWikipedia(Wikipedia):
+    """A Wikipedia client with a pooled session shared between pages
+
+    A session that fails after its own retries is replaced with a fresh
+    one and the query is tried once more.
+    """
+
+    _session: requests.Session
+
+    def __init__(
+        self,
+        language: str,
+        *,
+        api_url: str = WIKI_API_URL,
+        session_factory: Callable[[], requests.Session] = create_session,
+        timeout: float = TIMEOUT,
+    ):
+        super().__init__(language, timeout=timeout)
+        self._session.close()
+        self.api_url = api_url.format(language=self.language)
+        self._session_factory = session_factory
+        self._session = session_factory()
+        self._lock = native_lock()
+        self._retired = ClientStats()
+
+    def replace_session(self) -> None:
+        with self._lock:
+            old = self._session
+            requests_made, connections = count_connections(old)
+            self._retired.requests += requests_made
+            self._retired.connections += connections
+            self._retired.replaced_sessions += 1
+            self._session = self._session_factory()
+        old.close()
+        logging.warning(f'Replaced broken session for {self.api_url}')
+
+    def stats(self) -> ClientStats:
+        requests_made, connections = count_connections(self._session)
+        return ClientStats(
+            requests=self._retired.requests + requests_made,
+            connections=self._retired.connections + connections,
+            replaced_sessions=self._retired.replaced_sessions,
+        )
+
+    def _get(self, params: dict[str, Any]) -> Any:
+        response = self._session.get(
+            self.api_url,
+            params=params,
+            **self._request_kwargs,
+        )
+        return response.json()
+
+    def _query(self, page: WikipediaPage, params: dict[str, Any]) -> Any:
+        params['format'] = 'json'
+        params['redirects'] = 1
+        try:
+            return self._get(params)
+        except (ConnectionError, JSONDecodeError):
+            logging.exception(f"Failed to query '{page.title}'")
+            self.replace_session()
+            return self._get(params)
+
+
+_CLIENTS: dict[str, PooledWikipedia] = {}
+_CLIENTS_LOCK = native_lock()
+
+
+def get_wiki(language: str) -> PooledWikipedia:
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(language)
+        if client is None:
+            client = _CLIENTS[language] = PooledWikipedia(
+                language,
+                api_url=WIKI_API_URL,
+            )
+        return client
+
+
+def reset_clients() -> None:
+    with _CLIENTS_LOCK:
+        for client in _CLIENTS.values():
+            client._session.close()
+        _CLIENTS.clear()
+
+
+def client_stats() -> dict[str, dict[str, int]]:
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.items())
+    return {
+        language: client.stats().to_json() for language, client in clients
+    }